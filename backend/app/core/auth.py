@@ -1,10 +1,23 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
+# Solo las excepciones de jose: el resto del paquete (backends criptográficos)
+# tarda decenas de ms en importarse y el verificador HS256 no lo necesita
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
 from pydantic import BaseModel, ValidationError
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
 
 from app.core.config import settings # Importamos nuestra configuración
+from app.core import metrics
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 # Esquema Pydantic para validar el payload esperado dentro del JWT de Supabase
 # Puedes ajustar esto según lo que necesites del payload
@@ -17,11 +30,109 @@ class TokenPayload(BaseModel):
 # Usamos HTTPBearer para extraer automáticamente el token "Bearer ..."
 reusable_oauth2 = HTTPBearer(auto_error=False) # auto_error=False para manejar el error nosotros mismos
 
+# --- CACHÉ DE TOKENS VERIFICADOS ---
+# El SPA envía el mismo bearer token en cientos de peticiones por sesión. En vez
+# de repetir la verificación HMAC, las claims y la validación Pydantic cada vez,
+# guardamos el resultado indexado por el SHA-256 del token (nunca el token en sí)
+# hasta su `exp`. Un token alterado tiene otro digest, así que nunca hace hit.
+class VerifiedTokenCache:
+    """LRU acotado de tokens ya verificados que expiran con el `exp` del token."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[int, dict]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        if self.maxsize <= 0:
+            return None
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        exp, user_info = entry
+        if exp <= time.time():
+            # Expirado: se elimina y se deja que la verificación completa lo rechace
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user_info
+
+    def set(self, token: str, exp: int, user_info: dict) -> None:
+        if self.maxsize <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = (exp, user_info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+token_cache = VerifiedTokenCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE)
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+def decode_supabase_jwt(token: str) -> Dict[str, Any]:
+    """
+    Verificador HS256 directo con hmac/json de la librería estándar.
+    Hace las mismas comprobaciones que `jwt.decode(..., algorithms=["HS256"],
+    audience="authenticated")` que usamos con Supabase (firma, exp, nbf, aud)
+    y lanza las mismas excepciones de jose, pero sin su capa genérica de
+    algoritmos y claves, que es la mayor parte del coste.
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64url_decode(header_b64))
+        payload = json.loads(_b64url_decode(payload_b64))
+        signature = _b64url_decode(signature_b64)
+    except Exception as e:
+        raise JWTError("Token mal formado") from e
+
+    if not isinstance(header, dict) or header.get("alg") != "HS256":
+        raise JWTError("Algoritmo de firma no permitido")
+    expected = hmac.new(
+        settings.SUPABASE_JWT_SECRET.encode(),
+        f"{header_b64}.{payload_b64}".encode(),
+        hashlib.sha256,
+    ).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise JWTError("Firma del token inválida")
+    if not isinstance(payload, dict):
+        raise JWTError("Payload del token inválido")
+
+    now = time.time()
+    if "exp" in payload:
+        if not isinstance(payload["exp"], (int, float)) or isinstance(payload["exp"], bool):
+            raise JWTClaimsError("La claim exp debe ser numérica")
+        if payload["exp"] <= now:
+            raise ExpiredSignatureError("Signature has expired.")
+    if "nbf" in payload:
+        if not isinstance(payload["nbf"], (int, float)) or isinstance(payload["nbf"], bool):
+            raise JWTClaimsError("La claim nbf debe ser numérica")
+        if payload["nbf"] > now:
+            raise JWTClaimsError("The token is not yet valid (nbf)")
+    audience = payload.get("aud")
+    audiences = audience if isinstance(audience, list) else [audience]
+    if "authenticated" not in audiences:
+        raise JWTClaimsError("Invalid audience")
+    return payload
+
+@traced
 async def get_current_user(
     token: Optional[HTTPAuthorizationCredentials] = Depends(reusable_oauth2)
 ) -> dict: # Devolvemos un diccionario con los datos del usuario (al menos el ID)
     """
     Dependencia para obtener el usuario actual verificado a partir de un token JWT.
+    Los tokens ya verificados se sirven desde `token_cache` hasta su expiración.
     """
     if token is None:
         raise HTTPException(
@@ -30,15 +141,18 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    start = time.perf_counter()
+    cached_user = token_cache.get(token.credentials)
+    if cached_user is not None:
+        metrics.auth_token_verify_duration.observe(metrics.time_since(start), "cache_hit")
+        # Copia superficial para que la petición no pueda alterar la entrada cacheada
+        return dict(cached_user)
+
     try:
-        # Decodificar el token usando el secreto JWT de Supabase
-        # Supabase usa el algoritmo HS256 por defecto
-        payload = jwt.decode(
-            token.credentials, 
-            settings.SUPABASE_JWT_SECRET, 
-            algorithms=["HS256"],
-            audience="authenticated" # Validar que el token es para usuarios autenticados
-        )
+        # Verificar el token usando el secreto JWT de Supabase
+        # Supabase usa el algoritmo HS256 por defecto; se valida que el token
+        # es para usuarios autenticados (aud = 'authenticated')
+        payload = decode_supabase_jwt(token.credentials)
         
         # Validar el contenido del payload con Pydantic
         token_data = TokenPayload(**payload)
@@ -51,22 +165,27 @@ async def get_current_user(
         # Por ahora, devolvemos la información básica del token (incluyendo el user_id/sub)
         # Asegurándonos de devolver una estructura similar a la del placeholder (con 'id')
         user_info = {"id": token_data.sub, **payload} # Incluimos 'id' y el resto del payload
-        return user_info
+        token_cache.set(token.credentials, token_data.exp, user_info)
+        metrics.auth_token_verify_duration.observe(metrics.time_since(start), "verified")
+        return dict(user_info)
 
-    except jwt.ExpiredSignatureError:
+    except ExpiredSignatureError:
+        metrics.auth_token_verify_duration.observe(metrics.time_since(start), "rejected")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="El token ha expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except jwt.JWTClaimsError as e:
+    except JWTClaimsError as e:
+        metrics.auth_token_verify_duration.observe(metrics.time_since(start), "rejected")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Error en las claims del token: {e}",
             headers={"WWW-Authenticate": "Bearer"},
         )
     except (JWTError, ValidationError) as e: # Captura errores de JOSE y Pydantic
-        print(f"Error de validación JWT o Payload: {e}")
+        metrics.auth_token_verify_duration.observe(metrics.time_since(start), "rejected")
+        logger.warning("Error de validación JWT o Payload: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No se pudo validar el token",
@@ -74,7 +193,7 @@ async def get_current_user(
         )
     except Exception as e:
         # Captura cualquier otro error inesperado durante la verificación
-        print(f"Error inesperado en get_current_user: {e}")
+        logger.exception("Error inesperado en get_current_user")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno al procesar la autenticación",
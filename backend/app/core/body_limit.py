@@ -0,0 +1,75 @@
+from typing import Iterable
+import json
+
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_DETAIL = "El archivo supera el tamaño máximo permitido"
+
+class BodySizeLimitMiddleware:
+    """
+    Middleware ASGI que corta con 413 las peticiones cuyo cuerpo supera
+    `max_body_size` en las rutas indicadas. Revisa Content-Length antes de leer
+    nada y, si no viene (chunked), cuenta los bytes a medida que llegan, de
+    modo que el parser multipart nunca llega a volcar a disco un archivo gigante.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int, path_suffixes: Iterable[str]) -> None:
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_suffixes = tuple(path_suffixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].endswith(self.path_suffixes):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_body_size:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send)
+
+    async def _reject(self, send: Send) -> None:
+        body = json.dumps({"detail": _DETAIL}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+class _BodyTooLarge(HTTPException):
+    # Es un HTTPException para que, si salta mientras FastAPI parsea el
+    # formulario, llegue al cliente como 413 y no como "error parsing the body"
+    def __init__(self) -> None:
+        super().__init__(status_code=413, detail=_DETAIL)
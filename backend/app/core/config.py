@@ -1,11 +1,11 @@
 import os
 from pydantic_settings import BaseSettings
 from typing import List, Optional
-from dotenv import load_dotenv
 
-# Carga las variables de entorno del archivo .env
-# Es útil hacerlo aquí para que estén disponibles al importar Settings
-load_dotenv()
+# El .env de backend/ lo lee Settings (env_file) sin tocar os.environ: importar
+# la configuración no tiene efectos secundarios. run.py y gunicorn_conf.py
+# cargan el .env por su cuenta para sus propias variables (host, puerto, workers).
+_BACKEND_ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".env")
 
 class Settings(BaseSettings):
     # Supabase
@@ -23,11 +23,114 @@ class Settings(BaseSettings):
     
     # Opcional: Entorno (development/production)
     ENVIRONMENT: Optional[str] = "development"
+
+    # Backend de datos: "supabase" (el proyecto real) o "memory" (sustituto en
+    # memoria para desarrollo local y benchmarks, ver services/memory_backend.py)
+    SUPABASE_BACKEND: str = "supabase"
+    # Latencia simulada por llamada del backend en memoria, en segundos
+    MEMORY_BACKEND_LATENCY: float = 0.0
+
+    # Pool de conexiones y concurrencia hacia Supabase (por worker)
+    # Máximo de llamadas a Supabase ejecutándose a la vez en el pool de threads
+    SUPABASE_MAX_CONCURRENCY: int = 40
+    # Límites del pool HTTP (keep-alive) que comparten PostgREST y Storage
+    SUPABASE_MAX_CONNECTIONS: int = 40
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SUPABASE_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Conexiones que cada worker abre al arrancar (0 para no calentar)
+    SUPABASE_WARMUP_CONNECTIONS: int = 2
+
+    # Resiliencia de las llamadas a Supabase (ver services/resilience.py)
+    # Plazo por intento, en segundos (Storage aparte: las subidas tardan más)
+    SUPABASE_CALL_TIMEOUT: float = 5.0
+    SUPABASE_STORAGE_TIMEOUT: float = 30.0
+    # Reintentos de llamadas idempotentes (lecturas) con backoff exponencial y jitter
+    SUPABASE_READ_RETRIES: int = 2
+    SUPABASE_RETRY_BASE_DELAY: float = 0.05
+    SUPABASE_RETRY_MAX_DELAY: float = 1.0
+    # Circuit breaker: fallos seguidos para abrirlo y segundos hasta la prueba
+    SUPABASE_BREAKER_FAILURE_THRESHOLD: int = 5
+    SUPABASE_BREAKER_RESET_SECONDS: float = 30.0
+    # Lecturas "hedged": segundos de espera antes de lanzar una segunda (None = desactivado)
+    SUPABASE_HEDGE_DELAY: Optional[float] = None
+
+    # Caché de tokens JWT ya verificados (entradas por worker, 0 la desactiva)
+    AUTH_TOKEN_CACHE_SIZE: int = 4096
+
+    # Caché de lecturas de mascotas: "memory" (LRU por worker), "redis" (compartida) o "none"
+    # Con varios workers y "memory", las escrituras de un worker no invalidan a
+    # los demás: el TTL acota cuánto puede durar un dato obsoleto allí.
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL_SECONDS: float = 15.0
+    CACHE_MAX_ENTRIES: int = 10000
+    REDIS_URL: Optional[str] = None
+
+    # Subida de fotos: tamaño máximo y tamaño de bloque al leer/copiar
+    MAX_UPLOAD_SIZE_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 256 * 1024
+    # Procesado de imágenes (variantes thumb/medium/full en un pool de procesos)
+    IMAGE_PROCESS_WORKERS: int = 2
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_MAX_PIXELS: int = 40_000_000
+
+    # Paginación del listado de mascotas
+    PETS_PAGE_SIZE_DEFAULT: int = 50
+    PETS_PAGE_SIZE_MAX: int = 500
+    # Resumen del dashboard (/api/pets/summary): se actualiza con cada escritura
+    # y se reconstruye como mucho cada PETS_SUMMARY_TTL_SECONDS (con caché
+    # "memory" y varios workers, acota cuánto tarda en verse una escritura de otro worker)
+    PETS_SUMMARY_TTL_SECONDS: float = 60.0
+    # Días a vista para los próximos cumpleaños, si no se indica ?days=
+    PETS_SUMMARY_BIRTHDAY_DAYS: int = 30
+    # Búsqueda (/api/pets/search): propietarios con índice en memoria por worker
+    # y segundos máximos antes de reconstruir cada índice (igual que el resumen,
+    # acota cuánto tarda en encontrarse una escritura hecha en otro worker)
+    SEARCH_INDEX_MAX_OWNERS: int = 1000
+    SEARCH_INDEX_TTL_SECONDS: float = 60.0
+    # Sincronización incremental (/api/pets/changes): margen para transacciones
+    # confirmadas fuera de orden y días que se conservan las lápidas de borrados
+    CHANGES_SAFETY_LAG_SECONDS: float = 5.0
+    TOMBSTONE_RETENTION_DAYS: int = 30
+    # Máximo de elementos por petición en los endpoints /bulk
+    BULK_MAX_ITEMS: int = 1000
+    # Exportación/importación en streaming: filas por página leída / por insert
+    EXPORT_PAGE_SIZE: int = 500
+    IMPORT_BATCH_SIZE: int = 500
+    # Máximo de errores por fila que se devuelven en el resultado de una importación
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+
+    # Serialización de respuestas: "model" (valida con el response_model, por
+    # defecto) o "fast" (codifica las filas de la BD directamente, ver core/serialization.py)
+    RESPONSE_SERIALIZATION: str = "model"
+    # Depuración: en modo "fast", validar igualmente las filas contra el modelo
+    RESPONSE_VALIDATE_FAST: bool = False
     
+    # Logging: nivel, formato (json | text) y fracción de logs de payloads
+    # (cuerpos, respuestas de Supabase) que se registran en DEBUG
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.0
+
+    # Trazas por petición (spans en JSONL, una línea por span)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 1.0
+    TRACING_EXPORT_PATH: str = "traces.jsonl"
+
+    # Perfilado bajo demanda: solo con X-Profile-Token igual a este valor (None lo desactiva)
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_MAX_SECONDS: float = 30.0
+    PROFILING_OUTPUT_DIR: str = "profiles"
+
+    # Exponer métricas Prometheus en /metrics
+    METRICS_ENABLED: bool = True
+
     # Configuración de Pydantic Settings
     class Config:
-        # Lee las variables desde el archivo .env si existen
-        env_file = ".env"
+        # Lee las variables desde el archivo .env si existen (el de backend/ y,
+        # con prioridad, el del directorio actual)
+        env_file = (_BACKEND_ENV_FILE, ".env")
         # Permite que las variables de entorno del sistema sobrescriban las del .env
         env_file_encoding = 'utf-8'
         # No distingue mayúsculas de minúsculas para las variables de entorno
@@ -39,6 +142,3 @@ settings = Settings()
 # Validación rápida al iniciar
 if not settings.SUPABASE_URL or not settings.SUPABASE_KEY or not settings.SUPABASE_JWT_SECRET:
     raise ValueError("Faltan variables de entorno críticas de Supabase (URL, KEY, JWT_SECRET)")
-
-print(f"Configuración cargada para el entorno: {settings.ENVIRONMENT}")
-print(f"Supabase URL: {settings.SUPABASE_URL}") 
\ No newline at end of file
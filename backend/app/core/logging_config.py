@@ -0,0 +1,210 @@
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Logging estructurado y no bloqueante.
+#
+# Los módulos siguen usando `logging.getLogger(__name__)` con formato perezoso
+# (`logger.info("... %s", valor)`): el mensaje solo se construye si el nivel
+# está activo. Los registros se encolan en memoria (QueueHandler) y un thread
+# aparte (QueueListener) los formatea y escribe en stdout, así que una
+# petición nunca espera a que la salida se vacíe.
+#
+# Cada registro lleva el `request_id` de la petición en curso (ContextVar), el
+# mismo que se devuelve en la cabecera X-Request-ID para correlacionar logs.
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Atributos estándar de LogRecord: lo demás viene de `extra=` y se incluye en el JSON
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+class RequestIdFilter(logging.Filter):
+    """Añade `record.request_id`. Va en el QueueHandler, que corre en el contexto de la petición."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler que resuelve el mensaje al encolar (los argumentos podrían
+    cambiar después) pero conserva el traceback aparte en `exc_text`, en vez
+    de mezclarlo con el mensaje como hace `QueueHandler.prepare`.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_traceback_formatter = logging.Formatter()
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+_TEXT_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+
+_listener: Optional[QueueListener] = None
+_output: Optional[logging.Handler] = None
+
+def _start_listener(output: logging.Handler) -> None:
+    global _listener
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    logging.getLogger().handlers = [queue_handler]
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def _restart_after_fork() -> None:
+    # Un fork (gunicorn --preload) no copia el thread del listener: el worker
+    # arranca el suyo con una cola nueva
+    if _listener is not None and _output is not None:
+        _start_listener(_output)
+
+def setup_logging() -> None:
+    """
+    Configura el logger raíz con un QueueHandler y arranca el listener.
+    Idempotente: llamarla de nuevo no duplica handlers.
+    """
+    global _output
+    if _output is not None:
+        return
+
+    _output = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        _output.setFormatter(JsonFormatter())
+    else:
+        _output.setFormatter(logging.Formatter(_TEXT_FORMAT))
+
+    logging.getLogger().setLevel(settings.LOG_LEVEL.upper())
+    # uvicorn configura sus propios handlers: los quitamos para que todo pase
+    # por la cola. Su log de acceso se silencia: RequestIdMiddleware escribe
+    # uno propio con el request_id y la duración
+    for name in ("uvicorn", "uvicorn.error"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    uvicorn_access = logging.getLogger("uvicorn.access")
+    uvicorn_access.handlers = []
+    uvicorn_access.propagate = False
+
+    _start_listener(_output)
+    atexit.register(shutdown_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+
+def shutdown_logging() -> None:
+    """
+    Vacía la cola y detiene el listener (al apagar el proceso). Lo que se
+    registre después se escribe directamente, sin cola.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        if _output is not None:
+            _output.addFilter(RequestIdFilter())
+            logging.getLogger().handlers = [_output]
+
+# --- MUESTREO DE PAYLOADS ---
+def log_payload(logger: logging.Logger, msg: str, *args: Any) -> None:
+    """
+    Log en DEBUG de datos voluminosos (cuerpos de petición, respuestas de
+    Supabase). Solo se registra una fracción LOG_PAYLOAD_SAMPLE_RATE de las
+    llamadas y nada se formatea si DEBUG no está activo.
+    """
+    rate = settings.LOG_PAYLOAD_SAMPLE_RATE
+    if rate <= 0 or not logger.isEnabledFor(logging.DEBUG):
+        return
+    if rate >= 1 or random.random() < rate:
+        logger.debug(msg, *args, stacklevel=2)
+
+# --- REQUEST ID ---
+# Se acepta el X-Request-ID del cliente o proxy solo si tiene un formato razonable
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+access_logger = logging.getLogger("app.access")
+
+class RequestIdMiddleware:
+    """
+    Asigna un request_id a cada petición (el de X-Request-ID o uno nuevo), lo
+    deja en el contexto para los logs, lo devuelve en la respuesta y escribe
+    una línea de acceso estructurada al terminar.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+
+        token = request_id_var.set(request_id)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    "%s %s %s",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    extra={"status": status_code, "duration_ms": round((time.perf_counter() - start) * 1000, 2)},
+                )
+            request_id_var.reset(token)
@@ -0,0 +1,271 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Métricas en formato de exposición de Prometheus (texto 0.0.4), sin
+# dependencias. Pensado para el camino caliente: registrar una observación es
+# una búsqueda en un dict y unas sumas, sin locks. Todo se actualiza desde el
+# event loop; los pocos contadores que tocan threads del pool son enteros
+# (atómicos en la práctica con el GIL).
+#
+# Las métricas son por proceso: con varios workers, Prometheus debe
+# scrapear cada uno o agregarse con la etiqueta de instancia.
+
+LabelValues = Tuple[str, ...]
+
+# Buckets en segundos: del sub-milisegundo (caché, JWT) a varios segundos (Supabase lento)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: [conteos por bucket (no acumulados) + desbordamiento, suma]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class StatsCollector(_Metric):
+    """
+    Expone diccionarios de estadísticas que ya lleva otro componente
+    (`cache.stats`, `SingleFlight.stats`...) sin contarlos dos veces: cada
+    clave del diccionario se convierte en el valor de la última etiqueta.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], kind: str = "counter") -> None:
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._sources: List[Tuple[LabelValues, Callable[[], Dict[str, float]]]] = []
+
+    def add_source(self, source: Callable[[], Dict[str, float]], *labels: str) -> None:
+        self._sources.append((labels, source))
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, source in self._sources:
+            for key, value in sorted(source().items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels + (key,))} {_format_value(value)}")
+        return lines
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        # Funciones que actualizan métricas justo antes de exponerlas (valores
+        # que ya se cuentan en otro sitio, como las estadísticas de la caché)
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def stats(self, name: str, documentation: str, labelnames: Sequence[str], kind: str = "counter") -> StatsCollector:
+        return self.register(StatsCollector(name, documentation, labelnames, kind))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+# --- MÉTRICAS DE LA APLICACIÓN ---
+http_requests = registry.counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Peticiones HTTP en curso", ("method",)
+)
+supabase_request_duration = registry.histogram(
+    "supabase_request_duration_seconds",
+    "Latencia de las llamadas a Supabase por operación (incluye reintentos)",
+    ("operation",),
+)
+supabase_request_errors = registry.counter(
+    "supabase_request_errors_total", "Llamadas a Supabase fallidas por operación y tipo de error", ("operation", "error")
+)
+auth_token_verify_duration = registry.histogram(
+    "auth_token_verify_duration_seconds",
+    "Tiempo de verificación del JWT (result: cache_hit, verified o rejected)",
+    ("result",),
+    buckets=(0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+
+# Estadísticas que llevan los propios componentes (se registran desde cada módulo)
+cache_requests = registry.stats(
+    "cache_requests_total", "Lecturas de la caché por resultado (hits/misses)", ("cache", "result")
+)
+cache_hit_ratio = registry.gauge(
+    "cache_hit_ratio", "Proporción de hits de la caché desde el arranque del proceso", ("cache",)
+)
+singleflight_calls = registry.stats(
+    "singleflight_calls_total",
+    "Lecturas que pasan por single-flight: calls (total), executed (consultas reales) y coalesced",
+    ("name", "result"),
+)
+supabase_resilience_events = registry.stats(
+    "supabase_resilience_events_total",
+    "Eventos de la capa de resiliencia: reintentos, plazos agotados, hedging, breaker",
+    ("service", "event"),
+)
+supabase_circuit_state = registry.gauge(
+    "supabase_circuit_state", "Estado del circuit breaker (0 closed, 1 half_open, 2 open)", ("service",)
+)
+
+def time_since(start: float) -> float:
+    return time.perf_counter() - start
+
+# --- MIDDLEWARE ---
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide latencia, total y peticiones en curso. La ruta se
+    etiqueta con su plantilla (/api/pets/{pet_id}), no con la URL concreta,
+    para que el número de series no crezca con cada id.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_paths: Iterable[str] = ()) -> None:
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+        http_requests_in_flight.inc(method)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method)
+            route = route_template(scope)
+            http_request_duration.observe(time_since(start), method, route)
+            http_requests.inc(method, route, str(status_code))
+
+def route_template(scope: Scope) -> str:
+    # FastAPI deja la ruta resuelta en el scope (también en el de los middlewares,
+    # que es el mismo dict); sin ruta (404, CORS preflight) se agrupa aparte
+    route = scope.get("route")
+    path: Optional[str] = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return path or "unmatched"
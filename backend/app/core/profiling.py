@@ -0,0 +1,136 @@
+from collections import Counter
+from types import FrameType
+from typing import List, Optional
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging_config import request_id_var
+
+# Perfilado bajo demanda de una petición concreta, sin reiniciar el servidor.
+#
+# Si la petición trae `X-Profile-Token` igual a PROFILING_TOKEN, un thread
+# muestrea cada PROFILING_INTERVAL segundos la pila del thread del event loop
+# mientras dura la petición (ahí corren la verificación del JWT, la validación
+# Pydantic y la serialización). El resultado se guarda en formato "folded"
+# (`marco;marco;marco muestras` por línea), el que leen flamegraph.pl,
+# speedscope o inferno, y su nombre se devuelve en `X-Profile-File`.
+#
+# Las muestras son del thread del event loop, no solo de esta petición: con
+# tráfico concurrente aparecen también las demás. Se perfila una petición a la
+# vez; si ya hay una en curso, la nueva se atiende sin perfilar.
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile-token"
+
+class StackSampler:
+    """Muestrea la pila de un thread desde otro thread y acumula pilas plegadas."""
+
+    def __init__(self, thread_id: int, interval: float, max_seconds: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: "Counter[str]" = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        # Con el intervalo de cambio del GIL por defecto (5 ms) el thread que
+        # muestrea apenas llega a ejecutarse mientras el event loop trabaja:
+        # se reduce al intervalo de muestreo solo mientras dura el perfil
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.interval, self._switch_interval))
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+                self.samples += 1
+            if time.monotonic() > deadline:
+                break
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _fold(frame: Optional[FrameType]) -> str:
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+_profile_lock = threading.Lock()
+
+def _authorized(headers: List[tuple]) -> bool:
+    token = settings.PROFILING_TOKEN
+    if not token:
+        return False
+    for name, value in headers:
+        if name == PROFILE_HEADER:
+            return hmac.compare_digest(value, token.encode())
+    return False
+
+class ProfilingMiddleware:
+    """
+    Perfila las peticiones que traen un `X-Profile-Token` válido y guarda el
+    perfil en PROFILING_OUTPUT_DIR. El resto pasa sin coste adicional.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _authorized(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        if not _profile_lock.acquire(blocking=False):
+            logger.warning("Perfilado pedido con otro en curso, se atiende sin perfilar")
+            await self.app(scope, receive, send)
+            return
+
+        filename = f"{request_id_var.get()}.folded"
+        sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL, settings.PROFILING_MAX_SECONDS)
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", filename.encode())]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            sampler.stop()
+            _profile_lock.release()
+            _write_profile(filename, sampler, scope)
+
+def _write_profile(filename: str, sampler: StackSampler, scope: Scope) -> None:
+    path = os.path.join(settings.PROFILING_OUTPUT_DIR, filename)
+    try:
+        os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(sampler.folded())
+    except OSError as e:
+        logger.error("No se pudo guardar el perfil %s: %s", path, e)
+        return
+    logger.info(
+        "Perfil de %s %s guardado en %s (%s muestras)", scope["method"], scope["path"], path, sampler.samples
+    )
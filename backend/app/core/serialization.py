@@ -0,0 +1,92 @@
+from typing import Any, Iterable, Mapping, Optional, Type
+import json
+import logging
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Serialización rápida de respuestas (RESPONSE_SERIALIZATION=fast).
+#
+# Por defecto FastAPI vuelve a validar cada fila con el response_model (parsea
+# UUIDs y fechas, aplica extra="allow") y después la codifica con json estándar.
+# Las filas que devuelve la capa de datos ya vienen de PostgREST como JSON, así
+# que en modo "fast" se codifican directamente, sin pasar por el modelo. La
+# salida es equivalente pero no idéntica byte a byte: las fechas salen tal
+# como las formatea Postgres ("+00:00" en lugar de "Z").
+#
+# Con RESPONSE_VALIDATE_FAST=true (para depuración) las filas se validan igual
+# contra el modelo antes de codificarlas, y una discrepancia responde 500.
+
+try:
+    import orjson
+except ImportError:  # Opcional: sin orjson se usa json estándar compacto
+    orjson = None
+
+def fast_serialization_enabled() -> bool:
+    return settings.RESPONSE_SERIALIZATION == "fast"
+
+def dumps(content: Any) -> bytes:
+    """Codifica a JSON (bytes) con orjson si está instalado."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSONResponse que codifica con `dumps`."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def _check_rows(rows: Iterable[Any], model: Type[BaseModel]) -> None:
+    for row in rows:
+        try:
+            model.model_validate(row)
+        except ValidationError as e:
+            logger.error("Fila que no cumple %s en respuesta rápida: %s", model.__name__, e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"La respuesta no cumple el modelo {model.__name__}",
+            )
+
+def fast_response(
+    content: Any,
+    model: Type[BaseModel],
+    *,
+    many: bool = False,
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Mapping[str, str]] = None,
+) -> FastJSONResponse:
+    """
+    Respuesta con filas de la capa de datos codificadas sin pasar por el
+    response_model. `model` solo se usa si RESPONSE_VALIDATE_FAST está activo.
+    """
+    if settings.RESPONSE_VALIDATE_FAST:
+        _check_rows(content if many else [content], model)
+    return FastJSONResponse(content, status_code=status_code, headers=dict(headers or {}))
+
+def model_response(
+    content: Any,
+    model: Type[BaseModel],
+    *,
+    many: bool = False,
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Para respuestas cuyo modelo se decide en la petición (p. ej. ?fields=):
+    valida y vuelca con `model` lo mismo que haría FastAPI con response_model,
+    o usa `fast_response` si la serialización rápida está activa.
+    """
+    if fast_serialization_enabled():
+        return fast_response(content, model, many=many, status_code=status_code, headers=headers)
+    if many:
+        body = [model.model_validate(row).model_dump(mode="json") for row in content]
+    else:
+        body = model.model_validate(content).model_dump(mode="json")
+    return JSONResponse(body, status_code=status_code, headers=dict(headers or {}))
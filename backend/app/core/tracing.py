@@ -0,0 +1,253 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging_config import request_id_var
+from app.core.metrics import route_template
+
+# Trazas por petición, sin dependencias: spans anidados (middleware HTTP, auth,
+# funciones de pet_service, llamadas a Supabase) que comparten un trace_id y
+# se escriben como una línea JSON por span en TRACING_EXPORT_PATH. Con
+# `trace_id` y `parent_span_id` se reconstruye la cascada de cada petición.
+#
+# El contexto entra con la cabecera W3C `traceparent` (si la manda un proxy o
+# el frontend) y se hereda por ContextVar, también en las tareas y threads que
+# lanza la petición. Desactivado (TRACING_ENABLED=False) o sin muestrear, abrir
+# un span es una comprobación y nada más.
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "sampled", "attributes", "status", "_start_ns")
+
+    def __init__(self, trace_id: str, parent_span_id: Optional[str], name: str, sampled: bool) -> None:
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.sampled = sampled
+        self.attributes: Dict[str, Any] = {}
+        self.status = "ok"
+        self._start_ns = time.time_ns()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_record(self, end_ns: int) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self._start_ns,
+            "end_time_unix_nano": end_ns,
+            "duration_ms": round((end_ns - self._start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+def _new_id(size: int) -> str:
+    return random.getrandbits(size * 8).to_bytes(size, "big").hex()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+# --- EXPORTACIÓN ---
+class _FileExporter:
+    """
+    Escribe spans en un archivo JSONL desde un thread propio: quien cierra un
+    span solo encola el registro. El thread arranca con el primer span.
+    """
+
+    _BATCH_SIZE = 256
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        # El thread no sobrevive al fork: el worker arranca el suyo con el primer span
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any]) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(record)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as output:
+            while True:
+                record = self._queue.get()
+                batch: List[Optional[Dict[str, Any]]] = [record]
+                while len(batch) < self._BATCH_SIZE:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in batch
+                lines = [json.dumps(item, ensure_ascii=False, default=str) + "\n" for item in batch if item is not None]
+                try:
+                    output.writelines(lines)
+                    output.flush()
+                except OSError as e:
+                    logger.warning("No se pudieron escribir %s spans en %s: %s", len(lines), self.path, e)
+                if stop:
+                    return
+
+    def shutdown(self) -> None:
+        """Escribe lo pendiente y detiene el thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+_exporter = _FileExporter(settings.TRACING_EXPORT_PATH)
+
+def shutdown_tracing() -> None:
+    _exporter.shutdown()
+
+# --- SPANS ---
+@contextmanager
+def start_span(
+    name: str, attributes: Optional[Dict[str, Any]] = None, parent: Optional[Tuple[str, str, bool]] = None
+) -> Iterator[Optional[Span]]:
+    """
+    Abre un span hijo del span actual (o raíz de una traza nueva, muestreada
+    con TRACING_SAMPLE_RATE). `parent` es el contexto remoto (trace_id,
+    span_id, sampled) de un `traceparent` entrante. Devuelve None si el
+    tracing está desactivado.
+    """
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+
+    current = _current_span.get()
+    if parent is not None:
+        trace_id, parent_span_id, sampled = parent
+    elif current is not None:
+        trace_id, parent_span_id, sampled = current.trace_id, current.span_id, current.sampled
+    else:
+        trace_id, parent_span_id = _new_id(16), None
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+
+    span = Span(trace_id, parent_span_id, name, sampled)
+    if sampled and attributes:
+        span.attributes.update(attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        if sampled:
+            span.status = "error"
+            span.attributes["error.type"] = type(e).__name__
+            span.attributes["error.message"] = str(e)[:200]
+        raise
+    finally:
+        _current_span.reset(token)
+        if sampled:
+            _exporter.export(span.to_record(time.time_ns()))
+
+def traced(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Decorador para funciones async: un span por llamada con el nombre `modulo.funcion`."""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        if not settings.TRACING_ENABLED:
+            return await func(*args, **kwargs)
+        with start_span(name):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+# --- PROPAGACIÓN (W3C Trace Context) ---
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+def parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+    """Devuelve (trace_id, span_id, sampled) o None si la cabecera no es válida."""
+    match = _TRACEPARENT.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 0x01)
+
+class TracingMiddleware:
+    """
+    Span raíz de cada petición HTTP, con el contexto del `traceparent`
+    entrante si lo hay. El nombre usa la plantilla de la ruta, que FastAPI
+    resuelve durante la petición.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        method = scope["method"]
+        with start_span(f"{method} {scope['path']}", parent=parent) as span:
+            span.set_attribute("http.method", method)
+            span.set_attribute("http.target", scope["path"])
+            span.set_attribute("request_id", request_id_var.get())
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                span.name = f"{method} {route}"
+                span.set_attribute("http.route", route)
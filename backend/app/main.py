@@ -1,14 +1,65 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+from fastapi import FastAPI, Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 # Importamos el router de mascotas
 from app.routers import pets
 # Importamos la configuración para usar el prefijo API
 from app.core.config import settings
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.core import metrics
+from app.core.logging_config import RequestIdMiddleware, setup_logging, shutdown_logging
+from app.core.tracing import TracingMiddleware, shutdown_tracing
+from app.core.profiling import ProfilingMiddleware
+from app.services import image_processing, supabase_client
+from app.services.cache import cache
+
+# Logging estructurado (cola en memoria + listener) antes de crear la app
+setup_logging()
+logger = logging.getLogger(__name__)
+
+async def _start_supabase_client() -> None:
+    db = await run_in_threadpool(supabase_client.init_supabase_client)
+    if db is not None and settings.SUPABASE_WARMUP_CONNECTIONS > 0:
+        await supabase_client.warm_up_supabase_client(db, settings.SUPABASE_WARMUP_CONNECTIONS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de cada worker. El cliente Supabase se crea aquí y no al
+    importar, para que con gunicorn --preload cada worker tenga sus propias
+    conexiones (el proceso maestro no abre ninguna). Se crea y calienta en
+    segundo plano: el worker acepta peticiones sin esperar, y una petición
+    que llegue antes espera al cliente en get_db.
+    """
+    logger.info("Iniciando worker (entorno: %s, backend: %s)", settings.ENVIRONMENT, settings.SUPABASE_BACKEND)
+    startup = asyncio.create_task(_start_supabase_client())
+    yield
+    if not startup.done():
+        startup.cancel()
+    # uvicorn ya esperó a las peticiones en curso: cerramos conexiones y pools
+    supabase_client.close_supabase_client()
+    await run_in_threadpool(image_processing.shutdown_pool)
+    await cache.close()
+    shutdown_tracing()
+    shutdown_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API para la gestión de mascotas y más",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+)
+
+# Limitar el tamaño del cuerpo en la subida de fotos antes de parsear el formulario
+# (margen de 64 KB para las cabeceras multipart). Se registra antes que CORS
+# para que CORS quede por fuera y también sus respuestas 413 lleven cabeceras CORS.
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=settings.MAX_UPLOAD_SIZE_BYTES + 64 * 1024,
+    path_suffixes=["/upload_photo"],
 )
 
 # Configuración de CORS
@@ -25,8 +76,26 @@ app.add_middleware(
     allow_credentials=True,   # Permite cookies y cabeceras de autenticación
     allow_methods=["*"],      # Permite todos los métodos HTTP (GET, POST, PUT, etc.)
     allow_headers=["*"],      # Permite todas las cabeceras
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Request-ID", "X-Profile-File"], # Cabeceras legibles desde el navegador
 )
 
+# Métricas: se añade al final para quedar por fuera de todo y medir la
+# petición completa (incluidos CORS y el límite de tamaño)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, exclude_paths=["/metrics"])
+
+# Trazas: span raíz de cada petición (dentro del request ID para poder anotarlo)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
+# Perfilado bajo demanda (X-Profile-Token), solo si hay un token configurado
+if settings.PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+
+# Request ID: el más externo, para que todo lo que se registre durante la
+# petición (también desde los middlewares) lleve su identificador
+app.add_middleware(RequestIdMiddleware)
+
 # Incluir el router de mascotas con su prefijo
 app.include_router(pets.router, prefix=settings.API_V1_STR + "/pets")
 
@@ -38,4 +107,10 @@ async def root():
 # Endpoint de salud para verificar que la API está corriendo
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"} 
\ No newline at end of file
+    return {"status": "ok"}
+
+# Métricas en formato Prometheus (por worker)
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
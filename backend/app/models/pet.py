@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, create_model
+from typing import Dict, List, Optional, Tuple, Type
+from functools import lru_cache
 from datetime import date, datetime
 import uuid # Para el tipo de ID
 
@@ -47,4 +48,74 @@ class PetInDBBase(PetBase):
 
 # Modelo final para respuestas de la API (puede ser igual a PetInDBBase o añadir/quitar campos)
 class Pet(PetInDBBase):
-    pass 
\ No newline at end of file
+    pass 
+
+# Modelo con solo algunos campos de Pet (respuestas con ?fields=). Se cachea
+# por combinación de campos para no recrear la clase en cada petición.
+@lru_cache(maxsize=256)
+def pet_fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    return create_model(
+        f"PetFields_{'_'.join(fields)}",
+        **{name: (Pet.model_fields[name].annotation, Pet.model_fields[name]) for name in fields},
+    )
+
+# Respuesta de la subida de fotos: URL principal y todas sus variantes
+class PetPhotoUpload(BaseModel):
+    photo_url: str = Field(..., description="URL de la variante 'full' (la que se guarda en la mascota)")
+    variants: Dict[str, str] = Field(default_factory=dict, description="URLs por variante: thumb, medium, full")
+
+# --- RESUMEN (dashboard) ---
+class UpcomingBirthday(BaseModel):
+    id: uuid.UUID
+    name: str
+    species: str
+    birthdate: date
+    next_birthday: date
+    days_until: int = Field(..., description="Días que faltan (0 = hoy)")
+    age: int = Field(..., description="Años que cumple")
+
+class PetSummary(BaseModel):
+    total: int
+    by_species: Dict[str, int] = Field(default_factory=dict, description="Mascotas por especie, de más a menos")
+    by_gender: Dict[str, int] = Field(default_factory=dict, description="Mascotas por género, de más a menos")
+    upcoming_birthdays: List[UpcomingBirthday] = Field(default_factory=list, description="Cumpleaños próximos, del más cercano al más lejano")
+
+# --- SINCRONIZACIÓN INCREMENTAL ---
+class PetTombstone(BaseModel):
+    id: uuid.UUID
+    deleted_at: datetime
+
+class PetChanges(BaseModel):
+    changed: List[Pet] = Field(default_factory=list, description="Mascotas creadas o modificadas desde la marca de agua")
+    deleted: List[PetTombstone] = Field(default_factory=list, description="Mascotas eliminadas desde la marca de agua")
+    watermark: str = Field(..., description="Marca de agua para la próxima llamada (?since=)")
+    has_more: bool = Field(False, description="Quedan cambios: volver a llamar con la nueva marca de agua")
+
+# --- OPERACIONES EN LOTE ---
+# Elemento de una actualización en lote: los campos de PetUpdate más el id
+class PetBulkUpdateItem(PetUpdate):
+    id: uuid.UUID
+
+# Resultado de cada elemento de un lote, en el mismo orden que la petición
+class BulkItemResult(BaseModel):
+    index: int = Field(..., description="Posición del elemento en la petición")
+    id: Optional[uuid.UUID] = Field(None, description="ID de la mascota (si se conoce)")
+    status: int = Field(..., description="Código HTTP que habría tenido la operación individual")
+    error: Optional[str] = None
+    pet: Optional[Pet] = None
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+    succeeded: int
+    failed: int
+
+# --- IMPORTACIÓN ---
+class ImportRowError(BaseModel):
+    line: int = Field(..., description="Línea del archivo (0 si el error afecta al archivo completo)")
+    error: str
+
+class PetImportResult(BaseModel):
+    created: int
+    failed: int
+    errors: List[ImportRowError] = Field(default_factory=list, description="Primeros errores por fila")
+    completed: bool = Field(True, description="False si la lectura del archivo se interrumpió")
@@ -1,21 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response, File, UploadFile
-from typing import List, Optional, Dict # Aseguramos Optional para PetUpdate
-from supabase import Client # Para type hinting
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Request, Response, File, UploadFile, Query
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Any, List, Optional, Dict, Literal # Aseguramos Optional para PetUpdate
+import logging
 import uuid # Para validar el owner_id
 from datetime import date # Necesario para la conversión de fecha en update
 
-from app.models.pet import Pet, PetCreate, PetUpdate # Añadimos PetUpdate
-from app.services.supabase_client import get_db # Importamos el proveedor del cliente Supabase
+from app.models.pet import Pet, PetCreate, PetUpdate, PetPhotoUpload, PetBulkUpdateItem, BulkItemResult, BulkResult, PetImportResult, PetSummary, PetChanges, pet_fields_model
+from app.services.supabase_client import Client, get_db, postgrest_policy, storage_policy # Importamos el proveedor del cliente Supabase
 # Importamos la dependencia de autenticación real
 from app.core.auth import get_current_user 
+from app.core.config import settings
+from app.core.logging_config import log_payload
+from app.core.serialization import fast_response, fast_serialization_enabled, model_response
 # Importar el nuevo servicio y las excepciones personalizadas
-from app.services import pet_service
-from app.services.pet_service import PetNotFoundError, PetAccessForbiddenError, PetDatabaseError, StorageUploadError
+from app.services import pet_service, pet_transfer
+from app.services.pet_transfer import validation_message
+from app.services.pet_service import PetNotFoundError, PetAccessForbiddenError, PetDatabaseError, StorageUploadError, PhotoTooLargeError, InvalidCursorError, InvalidFieldsError, PetServiceUnavailableError, WatermarkExpiredError
+
+logger = logging.getLogger(__name__)
 
 # Ya no necesitamos el placeholder
 # async def get_current_user_placeholder():
 #     ...
 
+# --- PETICIONES CONDICIONALES (ETag / If-None-Match) ---
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110), la que corresponde a GET."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+_FIELDS_DESCRIPTION = (
+    "Campos a incluir, separados por comas (ej: id,name,photo_url). "
+    f"Disponibles: {', '.join(pet_service.PET_FIELDS)}"
+)
+
+def _service_unavailable(error: Exception) -> HTTPException:
+    """503 con Retry-After cuando Supabase no está disponible (circuit breaker abierto)."""
+    retry_after = max(
+        postgrest_policy.breaker.retry_after(), storage_policy.breaker.retry_after(), 1
+    )
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(error), headers={"Retry-After": str(retry_after)}
+    )
+
 router = APIRouter(
     # El prefijo se definirá al incluir el router en main.py
     tags=["Pets"], # Etiqueta para agrupar endpoints en la documentación
@@ -27,73 +63,176 @@ router = APIRouter(
     }
 )
 
-# --- FUNCIÓN AUXILIAR PARA VERIFICAR PROPIEDAD --- 
-async def _get_pet_and_verify_owner(pet_id: uuid.UUID, user_id: str, db: Client) -> dict:
-    """
-    Obtiene una mascota por ID y verifica que pertenezca al user_id proporcionado.
-    Lanza HTTPException 404 si no se encuentra o 403 si no pertenece al usuario.
-    Devuelve los datos de la mascota si la verificación es exitosa.
-    """
-    print(f"_get_pet_and_verify_owner: Verificando mascota ID: {pet_id} para user_id: {user_id}")
-    try:
-        # Seleccionamos todos los datos, no solo owner_id, para devolverlos si éxito
-        response = db.table("pets").select("*").eq("id", str(pet_id)).maybe_single().execute()
-        
-        # print("Respuesta cruda (verificación owner):", response)
-
-        if hasattr(response, 'error') and response.error:
-             print(f"Error Supabase (verificación owner): {response.error}")
-             # Usar 500 aquí, ya que es un error inesperado de la BD al verificar
-             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error de BD al verificar mascota")
-
-        if not response.data:
-            print(f"Mascota {pet_id} no encontrada.")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Mascota con ID {pet_id} no encontrada")
-        
-        pet_data = response.data
-        if str(pet_data.get("owner_id")) != str(user_id):
-            print(f"Conflicto propietario: Mascota {pet_id} pertenece a {pet_data.get('owner_id')}, no a {user_id}")
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes permiso para acceder/modificar esta mascota")
-        
-        print(f"Verificación de propiedad OK para mascota {pet_id}")
-        return pet_data # Devuelve los datos completos de la mascota encontrada
-
-    except HTTPException as http_exc:
-        # Re-lanzar las excepciones HTTP que generamos nosotros mismos
-        raise http_exc
-    except Exception as e:
-        # Capturar otros errores inesperados durante la verificación
-        print(f"Error inesperado en _get_pet_and_verify_owner: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al verificar la mascota")
-
 @router.get("/", response_model=List[Pet])
 async def read_pets(
     *, # Hace que los siguientes argumentos sean solo por nombre
     db: Client = Depends(get_db), # Inyecta el cliente Supabase
     # Usamos la dependencia real para obtener el usuario verificado
-    current_user: dict = Depends(get_current_user) 
+    current_user: dict = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.PETS_PAGE_SIZE_DEFAULT, ge=1, le=settings.PETS_PAGE_SIZE_MAX, description="Máximo de mascotas por página"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor de la página anterior"),
+    count: Optional[Literal["exact", "planned", "estimated"]] = Query(None, description="Incluir el total en X-Total-Count (planned/estimated son aproximados y más baratos)"),
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION)
 ):
     """
-    Obtiene una lista de todas las mascotas pertenecientes al usuario actual.
+    Obtiene una página de las mascotas pertenecientes al usuario actual.
+    Si hay más resultados, la cabecera `X-Next-Cursor` trae el cursor para pedir
+    la página siguiente; con `count` se añade el total en `X-Total-Count`.
+    Con `fields` cada mascota trae solo esos campos.
+    Responde 304 si `If-None-Match` coincide con el ETag de la página.
     """
     user_id = current_user.get("id") # El ID viene del token verificado ('sub' claim)
     if not user_id:
         # Esto no debería ocurrir si get_current_user funciona, pero es una salvaguarda
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado después de la autenticación")
 
-    print(f"Endpoint read_pets: Obteniendo mascotas para user_id: {user_id}")
+    logger.debug("Endpoint read_pets: Obteniendo mascotas para user_id: %s", user_id)
     
     try:
-        pets = await pet_service.get_pets_by_owner(db=db, owner_id=str(user_id))
-        return pets
+        selected_fields = pet_service.parse_fields(fields)
+        page = await pet_service.get_pets_by_owner(
+            db=db, owner_id=str(user_id), limit=limit, cursor=cursor, count=count, fields=selected_fields
+        )
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
     except PetDatabaseError as e:
         # Captura errores de BD del servicio
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     except Exception as e:
         # Otros errores inesperados
-        print(f"Error inesperado en router read_pets: {e}")
+        logger.exception("Error inesperado en router read_pets")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno")
+
+    # El ETag viene calculado con la página: no hace falta construir el cuerpo
+    if _etag_matches(request, page["etag"]):
+        return _not_modified(page["etag"])
+
+    response.headers["ETag"] = page["etag"]
+    response.headers["Cache-Control"] = "private, no-cache"
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    if page["total"] is not None:
+        response.headers["X-Total-Count"] = str(page["total"])
+    if selected_fields:
+        items = [pet_service.project_fields(row, selected_fields) for row in page["items"]]
+        return model_response(items, pet_fields_model(selected_fields), many=True, headers=response.headers)
+    if fast_serialization_enabled():
+        return fast_response(page["items"], Pet, many=True, headers=response.headers)
+    return page["items"]
+
+@router.get("/summary", response_model=PetSummary)
+async def read_pets_summary(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    days: int = Query(settings.PETS_SUMMARY_BIRTHDAY_DAYS, ge=0, le=366, description="Días a vista para los próximos cumpleaños")
+):
+    """
+    Resumen de las mascotas del usuario para el dashboard: total, conteo por
+    especie y por género y próximos cumpleaños. Se calcula en el servidor sin
+    devolver el listado. Responde 304 si `If-None-Match` coincide con su ETag.
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+
+    try:
+        result = await pet_service.get_pets_summary(db=db, owner_id=str(user_id), days=days)
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
+    except PetDatabaseError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    except Exception as e:
+        logger.exception("Error inesperado en router read_pets_summary")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno")
+
+    if _etag_matches(request, result["etag"]):
+        return _not_modified(result["etag"])
+    response.headers["ETag"] = result["etag"]
+    response.headers["Cache-Control"] = "private, no-cache"
+    return result["summary"]
+
+@router.get("/search", response_model=List[Pet])
+async def search_pets(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100, description="Texto a buscar en nombre, especie y raza"),
+    limit: int = Query(settings.PETS_PAGE_SIZE_DEFAULT, ge=1, le=settings.PETS_PAGE_SIZE_MAX, description="Máximo de resultados por página"),
+    offset: int = Query(0, ge=0, description="Resultados a saltar (paginación)"),
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION)
+):
+    """
+    Busca entre las mascotas del usuario por nombre, especie y raza. Admite
+    prefijos ("pel" encuentra "Peluche") y errores de tipeo ("peluhce"). Los
+    resultados vienen ordenados por relevancia; el total de coincidencias va en
+    la cabecera `X-Total-Count`.
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+
+    try:
+        selected_fields = pet_service.parse_fields(fields)
+        result = await pet_service.search_pets(
+            db=db, owner_id=str(user_id), query=q, limit=limit, offset=offset, fields=selected_fields
+        )
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
+    except PetDatabaseError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    except Exception as e:
+        logger.exception("Error inesperado en router search_pets")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno")
+
+    response.headers["X-Total-Count"] = str(result["total"])
+    if selected_fields:
+        items = [pet_service.project_fields(row, selected_fields) for row in result["items"]]
+        return model_response(items, pet_fields_model(selected_fields), many=True, headers=response.headers)
+    if fast_serialization_enabled():
+        return fast_response(result["items"], Pet, many=True, headers=response.headers)
+    return result["items"]
+
+@router.get("/changes", response_model=PetChanges)
+async def read_pet_changes(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    since: Optional[str] = Query(None, description="Marca de agua de la sincronización anterior (sin ella, todas las mascotas)"),
+    limit: int = Query(settings.PETS_PAGE_SIZE_MAX, ge=1, le=settings.PETS_PAGE_SIZE_MAX, description="Máximo de cambios de cada tipo por respuesta")
+):
+    """
+    Sincronización incremental: devuelve solo las mascotas creadas o
+    modificadas y las eliminadas desde `since`, con la marca de agua para la
+    próxima llamada. Mientras `has_more` sea true hay que volver a llamar con
+    la nueva marca de agua. Responde 410 si la marca de agua es más antigua
+    que la retención de borrados: el cliente debe sincronizar desde cero.
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+
+    try:
+        return await pet_service.get_pet_changes(db=db, owner_id=str(user_id), since=since, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except WatermarkExpiredError as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
+    except PetDatabaseError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    except Exception as e:
+        logger.exception("Error inesperado en router read_pet_changes")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno")
 
 # --- NUEVO ENDPOINT --- 
@@ -115,11 +254,10 @@ async def create_pet(
     try:
         uuid.UUID(user_id)
     except ValueError:
-         print(f"Error: user_id obtenido del token no es un UUID válido: {user_id}")
+         logger.warning("user_id obtenido del token no es un UUID válido: %s", user_id)
          raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Identificador de usuario inválido")
 
-    print(f"Endpoint create_pet: Creando mascota para user_id: {user_id}")
-    print(f"Datos recibidos (antes de convertir fecha): {pet_in.model_dump()}")
+    logger.debug("Endpoint create_pet: Creando mascota para user_id: %s", user_id)
 
     # Preparamos los datos para insertar, añadiendo el owner_id
     pet_data_to_insert = pet_in.model_dump()
@@ -128,26 +266,244 @@ async def create_pet(
     # --- CORRECCIÓN: Convertir 'date' a string 'YYYY-MM-DD' --- 
     if pet_data_to_insert.get("birthdate"):
         # Verificar si es un objeto date (podría ser None)
-        from datetime import date
         if isinstance(pet_data_to_insert["birthdate"], date):
-            print(f"Convirtiendo birthdate ({type(pet_data_to_insert['birthdate'])}) a string ISO")
             pet_data_to_insert["birthdate"] = pet_data_to_insert["birthdate"].isoformat()
         # Si ya es string (poco probable con Pydantic), asumimos formato correcto
     # ----------------------------------------------------------
 
-    print(f"Datos a insertar en Supabase: {pet_data_to_insert}")
+    log_payload(logger, "Datos a insertar en Supabase: %s", pet_data_to_insert)
     
     try:
         # Insertar en Supabase
         created_pet = await pet_service.create_new_pet(db=db, owner_id=str(user_id), pet_data=pet_data_to_insert)
+        if fast_serialization_enabled():
+            return fast_response(created_pet, Pet, status_code=status.HTTP_201_CREATED)
         return created_pet
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
     except PetDatabaseError as e:
         # Puede ser un 400 Bad Request si Supabase devolvió error (ej: constraint)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(f"Error inesperado en router create_pet: {e}")
+        logger.exception("Error inesperado en router create_pet")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al crear mascota")
 
+# --- OPERACIONES EN LOTE ---
+# Cada elemento se valida por separado: uno inválido no invalida el lote, se
+# informa en su posición con 422 y el resto se procesa. La respuesta es 200
+# con el resultado de cada elemento (BulkResult).
+def _check_bulk_size(items: List[Any]) -> None:
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El lote está vacío")
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El lote supera el máximo de {settings.BULK_MAX_ITEMS} elementos",
+        )
+
+def _bulk_outcome_status(outcome: Any, success_status: int) -> int:
+    if isinstance(outcome, PetServiceUnavailableError):
+        return status.HTTP_503_SERVICE_UNAVAILABLE
+    if isinstance(outcome, PetNotFoundError):
+        return status.HTTP_404_NOT_FOUND
+    if isinstance(outcome, PetAccessForbiddenError):
+        return status.HTTP_403_FORBIDDEN
+    if isinstance(outcome, PetDatabaseError):
+        return status.HTTP_400_BAD_REQUEST
+    if isinstance(outcome, Exception):
+        return status.HTTP_500_INTERNAL_SERVER_ERROR
+    return success_status
+
+def _bulk_result(results: List[BulkItemResult]) -> BulkResult:
+    results.sort(key=lambda result: result.index)
+    succeeded = sum(1 for result in results if result.status < 400)
+    return BulkResult(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+def _collect_outcomes(
+    results: List[BulkItemResult],
+    indexes: List[int],
+    ids: List[Optional[uuid.UUID]],
+    outcomes: List[Any],
+    success_status: int,
+    include_pet: bool = True,
+) -> None:
+    for index, pet_id, outcome in zip(indexes, ids, outcomes):
+        code = _bulk_outcome_status(outcome, success_status)
+        if code < 400:
+            results.append(BulkItemResult(
+                index=index, id=outcome.get("id", pet_id), status=code, pet=outcome if include_pet else None
+            ))
+        else:
+            results.append(BulkItemResult(index=index, id=pet_id, status=code, error=str(outcome) or "Error interno"))
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_pets_bulk(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    items: List[Dict[str, Any]] = Body(..., description="Lista de mascotas con el formato de PetCreate")
+):
+    """
+    Crea varias mascotas para el usuario actual con un único insert.
+    Cada elemento se informa con 201 si se creó o con su error (422, 400...).
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+    _check_bulk_size(items)
+
+    results: List[BulkItemResult] = []
+    valid_indexes: List[int] = []
+    valid_data: List[Dict[str, Any]] = []
+    for index, item in enumerate(items):
+        try:
+            # mode="json" deja birthdate como 'YYYY-MM-DD', listo para Supabase
+            valid_data.append(PetCreate.model_validate(item).model_dump(mode="json"))
+            valid_indexes.append(index)
+        except ValidationError as e:
+            results.append(BulkItemResult(index=index, status=status.HTTP_422_UNPROCESSABLE_ENTITY, error=validation_message(e)))
+
+    logger.debug("Endpoint create_pets_bulk: %s/%s mascotas válidas para user_id: %s", len(valid_data), len(items), user_id)
+
+    if valid_data:
+        outcomes = await pet_service.create_pets_bulk(db=db, owner_id=str(user_id), pets_data=valid_data)
+        _collect_outcomes(results, valid_indexes, [None] * len(valid_indexes), outcomes, status.HTTP_201_CREATED)
+    return _bulk_result(results)
+
+@router.patch("/bulk", response_model=BulkResult)
+async def update_pets_bulk(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    items: List[Dict[str, Any]] = Body(..., description="Lista de cambios con el formato de PetUpdate más el 'id' de la mascota")
+):
+    """
+    Actualiza varias mascotas del usuario actual: un UPDATE por cada conjunto distinto de cambios.
+    Cada elemento se informa con 200 o con su error (422, 404, 403...).
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+    _check_bulk_size(items)
+
+    results: List[BulkItemResult] = []
+    valid_indexes: List[int] = []
+    valid_ids: List[Optional[uuid.UUID]] = []
+    updates = []
+    for index, item in enumerate(items):
+        try:
+            update_in = PetBulkUpdateItem.model_validate(item)
+        except ValidationError as e:
+            results.append(BulkItemResult(index=index, status=status.HTTP_422_UNPROCESSABLE_ENTITY, error=validation_message(e)))
+            continue
+        # Solo columnas de PetUpdate: PetUpdate admite extras y aquí no deben llegar
+        # owner_id, created_at ni columnas desconocidas a la escritura
+        update_data = update_in.model_dump(mode="json", exclude_unset=True, include=set(PetUpdate.model_fields))
+        if not update_data:
+            results.append(BulkItemResult(
+                index=index, id=update_in.id, status=status.HTTP_400_BAD_REQUEST,
+                error="No se proporcionaron datos para actualizar",
+            ))
+            continue
+        valid_indexes.append(index)
+        valid_ids.append(update_in.id)
+        updates.append((str(update_in.id), update_data))
+
+    logger.debug("Endpoint update_pets_bulk: %s/%s cambios válidos para user_id: %s", len(updates), len(items), user_id)
+
+    if updates:
+        outcomes = await pet_service.update_pets_bulk(db=db, owner_id=str(user_id), updates=updates)
+        _collect_outcomes(results, valid_indexes, valid_ids, outcomes, status.HTTP_200_OK)
+    return _bulk_result(results)
+
+@router.delete("/bulk", response_model=BulkResult)
+async def delete_pets_bulk(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    ids: List[uuid.UUID] = Body(..., description="IDs de las mascotas a eliminar")
+):
+    """
+    Elimina varias mascotas del usuario actual con un único DELETE.
+    Cada elemento se informa con 204 o con su error (404, 403...).
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+    _check_bulk_size(ids)
+
+    logger.debug("Endpoint delete_pets_bulk: Eliminando %s mascotas para user_id: %s", len(ids), user_id)
+
+    outcomes = await pet_service.delete_pets_bulk(db=db, owner_id=str(user_id), pet_ids=[str(pet_id) for pet_id in ids])
+    results: List[BulkItemResult] = []
+    _collect_outcomes(results, list(range(len(ids))), list(ids), outcomes, status.HTTP_204_NO_CONTENT, include_pet=False)
+    return _bulk_result(results)
+
+# --- EXPORTACIÓN / IMPORTACIÓN EN STREAMING ---
+@router.get("/export")
+async def export_pets(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Formato de salida")
+):
+    """
+    Exporta todas las mascotas del usuario actual como NDJSON (una por línea)
+    o CSV. Se lee de Supabase por páginas y se envía a medida que llega, con
+    memoria constante sin importar cuántas mascotas haya.
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+
+    logger.debug("Endpoint export_pets: Exportando mascotas (%s) para user_id: %s", format, user_id)
+
+    try:
+        chunks = await pet_transfer.open_export(db=db, owner_id=str(user_id), export_format=format)
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
+    except PetDatabaseError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    return StreamingResponse(
+        chunks,
+        media_type=pet_transfer.EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="pets.{format}"',
+            "Cache-Control": "private, no-store",
+        },
+    )
+
+@router.post("/import", response_model=PetImportResult)
+async def import_pets(
+    *,
+    db: Client = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = Query(None, description="Formato del cuerpo; por defecto se deduce del Content-Type")
+):
+    """
+    Importa mascotas enviadas en el cuerpo como NDJSON (objetos con los campos
+    de PetCreate) o CSV con cabecera, por ejemplo un archivo de /export.
+    El cuerpo se parsea a medida que llega y se inserta en lotes; las filas
+    inválidas se informan con su número de línea sin detener la importación.
+    """
+    user_id = current_user.get("id")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
+
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    logger.debug("Endpoint import_pets: Importando mascotas (%s) para user_id: %s", format, user_id)
+
+    parse = pet_transfer.iter_csv_records if format == "csv" else pet_transfer.iter_ndjson_records
+    try:
+        return await pet_transfer.import_pets(db=db, owner_id=str(user_id), records=parse(request.stream()))
+    except Exception as e:
+        logger.exception("Error inesperado en router import_pets")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al importar mascotas")
+
 # --- NUEVO ENDPOINT --- 
 @router.put("/{pet_id}", response_model=Pet)
 async def update_pet(
@@ -164,14 +520,10 @@ async def update_pet(
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
 
-    print(f"Endpoint update_pet: Actualizando mascota ID: {pet_id} para user_id: {user_id}")
-    print(f"Datos de actualización recibidos: {pet_in.model_dump(exclude_unset=True)}")
+    logger.debug("Endpoint update_pet: Actualizando mascota ID: %s para user_id: %s", pet_id, user_id)
 
-    # 1. Verificar propiedad usando la función auxiliar
-    # La función ya lanza 404 o 403 si es necesario
-    await _get_pet_and_verify_owner(pet_id=pet_id, user_id=user_id, db=db)
-    
-    # 2. Preparar datos para la actualización
+    # 1. Preparar datos para la actualización
+    # La propiedad se verifica en el servicio, en la misma llamada que actualiza
     # Usamos exclude_unset=True para obtener solo los campos que el cliente envió
     update_data = pet_in.model_dump(exclude_unset=True)
     
@@ -182,29 +534,31 @@ async def update_pet(
     # --- Convertir 'date' a string 'YYYY-MM-DD' si está presente --- 
     if "birthdate" in update_data and update_data["birthdate"] is not None:
         if isinstance(update_data["birthdate"], date):
-            print(f"Convirtiendo birthdate en actualización a string ISO")
             update_data["birthdate"] = update_data["birthdate"].isoformat()
     # ----------------------------------------------------------
     
-    # Añadir timestamp de actualización (opcional, depende de tu esquema/triggers)
-    # update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    # El timestamp updated_at lo añade el servicio (lo usan los ETags)
     
-    print(f"Datos a actualizar en Supabase: {update_data}")
+    log_payload(logger, "Datos a actualizar en Supabase: %s", update_data)
 
-    # 3. Realizar la actualización en Supabase
+    # 2. Realizar la actualización en Supabase (404/403 los resuelve el servicio)
     try:
         updated_pet = await pet_service.update_existing_pet(
             db=db, pet_id=pet_id, user_id=str(user_id), update_data=update_data
         )
+        if fast_serialization_enabled():
+            return fast_response(updated_pet, Pet)
         return updated_pet
     except PetNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except PetAccessForbiddenError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
     except PetDatabaseError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(f"Error inesperado en router update_pet: {e}")
+        logger.exception("Error inesperado en router update_pet")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al actualizar mascota")
 
 # --- NUEVO ENDPOINT --- 
@@ -213,22 +567,52 @@ async def read_pet(
     *, 
     db: Client = Depends(get_db),
     current_user: dict = Depends(get_current_user),
-    pet_id: uuid.UUID # Obtiene el ID de la mascota de la ruta y valida que sea UUID
+    request: Request,
+    response: Response,
+    pet_id: uuid.UUID, # Obtiene el ID de la mascota de la ruta y valida que sea UUID
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION)
 ):
     """
     Obtiene los detalles de una mascota específica perteneciente al usuario actual.
+    Con `fields` la respuesta trae solo esos campos.
+    Responde 304 si `If-None-Match` coincide con el ETag de la mascota.
     """
     user_id = current_user.get("id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
 
-    print(f"Endpoint read_pet: Obteniendo mascota ID: {pet_id} para user_id: {user_id}")
+    logger.debug("Endpoint read_pet: Obteniendo mascota ID: %s para user_id: %s", pet_id, user_id)
 
-    # Usamos la función auxiliar para obtener y verificar
-    # Ya maneja 404 y 403
-    pet_data = await _get_pet_and_verify_owner(pet_id=pet_id, user_id=user_id, db=db)
-    
-    # Si la función anterior no lanzó excepción, pet_data es válido
+    # El servicio verifica la propiedad (404/403) y sirve desde caché si puede
+    try:
+        selected_fields = pet_service.parse_fields(fields)
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        pet_data = await pet_service.get_pet_by_id(db=db, pet_id=pet_id, user_id=str(user_id), fields=selected_fields)
+    except PetNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except PetAccessForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
+    except PetDatabaseError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    except Exception as e:
+        logger.exception("Error inesperado en router read_pet")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al obtener mascota")
+
+    etag = pet_service.pet_etag(pet_data, selected_fields)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if selected_fields:
+        return model_response(
+            pet_service.project_fields(pet_data, selected_fields), pet_fields_model(selected_fields), headers=response.headers
+        )
+    if fast_serialization_enabled():
+        return fast_response(pet_data, Pet, headers=response.headers)
     return pet_data
 
 # --- NUEVO ENDPOINT --- 
@@ -246,16 +630,13 @@ async def delete_pet(
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
 
-    print(f"Endpoint delete_pet: Eliminando mascota ID: {pet_id} para user_id: {user_id}")
+    logger.debug("Endpoint delete_pet: Eliminando mascota ID: %s para user_id: %s", pet_id, user_id)
 
-    # 1. Verificar propiedad usando la función auxiliar
-    # La función ya lanza 404 o 403 si es necesario
-    await _get_pet_and_verify_owner(pet_id=pet_id, user_id=user_id, db=db)
-    
-    # 2. Realizar la eliminación en Supabase
+    # Realizar la eliminación en Supabase; el servicio filtra por id y owner_id
+    # y solo si no elimina nada consulta si corresponde 404 o 403
     try:
         await pet_service.delete_pet_by_id(db=db, pet_id=pet_id, user_id=str(user_id))
-        # Si no hay excepción, la eliminación fue exitosa (o la mascota no existía y pertenecía al usuario)
+        # Si no hay excepción, la eliminación fue exitosa
         # Devolvemos 204
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except PetNotFoundError as e:
@@ -263,14 +644,16 @@ async def delete_pet(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except PetAccessForbiddenError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
     except PetDatabaseError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(f"Error inesperado en router delete_pet: {e}")
+        logger.exception("Error inesperado en router delete_pet")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al eliminar mascota")
 
 # --- NUEVO ENDPOINT PARA SUBIDA DE FOTOS --- 
-@router.post("/upload_photo", response_model=Dict[str, str])
+@router.post("/upload_photo", response_model=PetPhotoUpload)
 async def upload_pet_photo(
     *, 
     db: Client = Depends(get_db),
@@ -278,7 +661,8 @@ async def upload_pet_photo(
     file: UploadFile = File(...) # Recibe el archivo como parte de form-data
 ):
     """
-    Sube una foto para una mascota al almacenamiento y devuelve la URL pública.
+    Sube una foto para una mascota al almacenamiento y devuelve la URL pública
+    (`photo_url`, variante "full") y las de todas sus variantes (`variants`).
     Nota: Esta versión simple solo sube la foto. No la asocia automáticamente
     a una mascota específica en la base de datos. Se podría extender para
     recibir un `pet_id` y actualizar el campo `photo_url` de esa mascota.
@@ -287,21 +671,22 @@ async def upload_pet_photo(
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no identificado")
 
-    print(f"Endpoint upload_pet_photo: Recibido archivo: {file.filename}, tipo: {file.content_type}, para user: {user_id}")
+    logger.debug("Endpoint upload_pet_photo: Recibido archivo: %s, tipo: %s, para user: %s", file.filename, file.content_type, user_id)
 
     try:
-        public_url = await pet_service.upload_photo_to_storage(
+        variant_urls = await pet_service.upload_photo_to_storage(
             db=db, user_id=str(user_id), file=file
         )
-        # Devuelve un diccionario simple con la URL
-        return {"photo_url": public_url}
+        return {"photo_url": variant_urls["full"], "variants": variant_urls}
         
+    except PetServiceUnavailableError as e:
+        raise _service_unavailable(e)
+    except PhotoTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except StorageUploadError as e:
         # Errores específicos de la subida (ej. tipo inválido, error de lectura, error de storage)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         # Otros errores inesperados
-        print(f"Error inesperado en router upload_pet_photo: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error inesperado en router upload_pet_photo")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al subir la foto") 
\ No newline at end of file
@@ -0,0 +1,156 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import json
+import logging
+import time
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Caché de lectura para la capa de servicio. Los valores son filas (dicts/listas)
+# tal como vienen de PostgREST y deben tratarse como solo lectura: el backend en
+# memoria devuelve el mismo objeto que se guardó.
+
+class CacheBackend(ABC):
+    """
+    Interfaz mínima que usa pet_service. Todas las operaciones son async.
+    Un backend al que le falte alguna falla al instanciarse (al arrancar), no
+    en la primera petición que la use.
+    """
+
+    def __init__(self) -> None:
+        # Contadores para medir la efectividad de la caché
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def _record(self, hit: bool) -> None:
+        self.stats["hits" if hit else "misses"] += 1
+
+
+class NullCache(CacheBackend):
+    """Caché desactivada (CACHE_BACKEND=none): todo es un fallo."""
+
+    async def get(self, key: str) -> Optional[Any]:
+        self._record(False)
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """LRU en proceso con TTL por entrada. Propio de cada worker."""
+
+    def __init__(self, max_entries: int, default_ttl: float) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._record(False)
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._record(False)
+            return None
+        self._entries.move_to_end(key)
+        self._record(True)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Backend compartido entre workers/instancias (CACHE_BACKEND=redis).
+    Requiere el paquete opcional `redis` (>= 4.2, con soporte asyncio).
+    """
+
+    def __init__(self, url: str, default_ttl: float) -> None:
+        super().__init__()
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requiere instalar el paquete 'redis'") from e
+        self.default_ttl = default_ttl
+        # from_url no abre conexiones hasta la primera operación
+        self._client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(key)
+        self._record(raw is not None)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl_ms = int((self.default_ttl if ttl is None else ttl) * 1000)
+        await self._client.set(key, json.dumps(value, default=str), px=max(ttl_ms, 1))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*keys)
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+def create_cache() -> CacheBackend:
+    """Crea el backend de caché configurado en CACHE_BACKEND."""
+    backend = (settings.CACHE_BACKEND or "none").lower()
+    if backend == "memory":
+        return MemoryCache(max_entries=settings.CACHE_MAX_ENTRIES, default_ttl=settings.CACHE_TTL_SECONDS)
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("CACHE_BACKEND=redis requiere definir REDIS_URL")
+        return RedisCache(url=settings.REDIS_URL, default_ttl=settings.CACHE_TTL_SECONDS)
+    if backend != "none":
+        logger.warning("CACHE_BACKEND desconocido '%s', se desactiva la caché", backend)
+    return NullCache()
+
+# Instancia global, igual que el cliente Supabase
+cache: CacheBackend = create_cache()
+
+def get_cache() -> CacheBackend:
+    return cache
+
+def _collect_cache_metrics() -> None:
+    lookups = cache.stats["hits"] + cache.stats["misses"]
+    metrics.cache_hit_ratio.set(cache.stats["hits"] / lookups if lookups else 0.0, "pets")
+
+metrics.cache_requests.add_source(lambda: cache.stats, "pets")
+metrics.registry.add_collector(_collect_cache_metrics)
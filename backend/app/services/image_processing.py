@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import warnings
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Variantes que se generan de cada foto: nombre -> lado mayor máximo en píxeles
+PHOTO_VARIANTS: Dict[str, int] = {
+    "thumb": 256,
+    "medium": 1024,
+    "full": 2048,
+}
+VARIANT_CONTENT_TYPE = "image/webp"
+VARIANT_EXTENSION = "webp"
+
+class ImageProcessingError(Exception):
+    """La imagen no se pudo decodificar o procesar."""
+    pass
+
+def is_available() -> bool:
+    """Pillow es una dependencia opcional: sin ella se guarda solo el original."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def build_variants(source_path: str, variants: Dict[str, int], quality: int, max_pixels: int) -> Dict[str, str]:
+    """
+    Genera las variantes de una imagen. Se ejecuta en un proceso del pool:
+    recibe y devuelve rutas de archivos (no bytes) para no copiar imágenes
+    entre procesos.
+
+    Cada variante se normaliza (orientación EXIF aplicada), se reescala sin
+    ampliar, se recomprime a WEBP y se guarda sin metadatos (EXIF/GPS).
+    Devuelve {nombre_variante: ruta_temporal}.
+    """
+    from PIL import Image, ImageOps
+
+    # Protección contra "bombas de descompresión": por encima de max_pixels se rechaza
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    outputs: Dict[str, str] = {}
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            original = Image.open(source_path)
+        with original:
+            image = ImageOps.exif_transpose(original)
+            # WEBP admite transparencia; el resto se pasa a RGB
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            # De mayor a menor, reescalando sobre la anterior (más barato)
+            current = image
+            for name, max_side in sorted(variants.items(), key=lambda item: item[1], reverse=True):
+                resized = current.copy()
+                resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                fd, path = tempfile.mkstemp(prefix=f"pet_photo_{name}_", suffix=f".{VARIANT_EXTENSION}")
+                with os.fdopen(fd, "wb") as target:
+                    resized.save(target, format="WEBP", quality=quality, method=4)
+                outputs[name] = path
+                current = resized
+        return outputs
+    except Exception as e:
+        for path in outputs.values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise ImageProcessingError(f"No se pudo procesar la imagen: {e}") from e
+
+# --- POOL DE PROCESOS ---
+# El trabajo de CPU (decodificar, reescalar, comprimir) se hace fuera del
+# event loop y fuera del GIL, en un pool de procesos creado bajo demanda.
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # "spawn" evita heredar por fork los threads y sockets del worker
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+async def generate_variants(source_path: str) -> Dict[str, str]:
+    """Genera las variantes de `source_path` en el pool de procesos."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pool(),
+        build_variants,
+        source_path,
+        PHOTO_VARIANTS,
+        settings.IMAGE_VARIANT_QUALITY,
+        settings.IMAGE_MAX_PIXELS,
+    )
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
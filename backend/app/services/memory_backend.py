@@ -0,0 +1,409 @@
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+import uuid
+
+import httpx
+from postgrest.exceptions import APIError
+from storage3.utils import StorageException
+
+# Sustituto en memoria de Supabase (SUPABASE_BACKEND=memory) para desarrollo
+# local y benchmarks sin un proyecto real.
+#
+# Implementa la parte del cliente supabase-py v1 que usan los servicios:
+# `db.table(...)` con select/insert/upsert/update/delete, los filtros eq/in_,
+# el filtro `or` que añade la paginación keyset, order/limit/maybe_single y
+# `count`; y `db.storage.from_(bucket)` con upload/list/get_public_url/remove.
+# Como el builder real, los filtros se guardan como parámetros PostgREST
+# (`query.params`) y se interpretan al ejecutar, así que `_apply_keyset` y
+# `_query_operation` funcionan sin cambios.
+#
+# `latency` añade una espera por llamada (bloqueante, como la E/S real, que se
+# ejecuta en el pool de threads) para simular la red hasta Supabase.
+
+def _now() -> str:
+    # Microsegundos fijos: el orden de los timestamps como texto es el cronológico
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+# Columnas de las tablas conocidas, con las obligatorias y los valores por defecto de la BD
+_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "pets": {
+        "columns": ("id", "owner_id", "name", "species", "breed", "birthdate", "gender", "photo_url", "created_at", "updated_at"),
+        "required": ("owner_id", "name", "species"),
+    },
+    "pet_tombstones": {
+        "columns": ("pet_id", "owner_id", "deleted_at"),
+        "required": ("pet_id", "owner_id"),
+    },
+}
+
+class MemoryResponse:
+    """Equivalente a `APIResponse` de postgrest: `data` y `count`."""
+
+    def __init__(self, data: Any, count: Optional[int] = None) -> None:
+        self.data = data
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"MemoryResponse(data={self.data!r}, count={self.count!r})"
+
+# --- FILTROS POSTGREST ---
+def _split_top_level(text: str) -> List[str]:
+    """Separa por comas que no estén dentro de paréntesis ni comillas."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+Row = Dict[str, Any]
+Predicate = Callable[[Row], bool]
+
+def _compare(op: str, left: Any, right: str) -> bool:
+    if op == "is":
+        return (left is None) if right == "null" else str(left).lower() == right
+    if left is None:
+        return False
+    left = str(left)
+    if op == "eq":
+        return left == right
+    if op == "neq":
+        return left != right
+    if op == "gt":
+        return left > right
+    if op == "gte":
+        return left >= right
+    if op == "lt":
+        return left < right
+    if op == "lte":
+        return left <= right
+    raise APIError({"message": f"Operador no soportado por el backend en memoria: {op}", "code": "PGRST100"})
+
+def _column_predicate(column: str, expression: str) -> Predicate:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, value = expression.partition(".")
+    if op == "in":
+        values = {_unquote(item) for item in _split_top_level(value[1:-1])} if len(value) > 2 else set()
+        predicate: Predicate = lambda row: row.get(column) is not None and str(row.get(column)) in values
+    else:
+        value = _unquote(value)
+        predicate = lambda row: _compare(op, row.get(column), value)
+    return (lambda row: not predicate(row)) if negate else predicate
+
+def _logic_predicate(operator: str, body: str) -> Predicate:
+    """`or`/`and` con condiciones `col.op.valor` o grupos anidados `and(...)`/`or(...)`."""
+    predicates = []
+    for part in _split_top_level(body[1:-1]):
+        part = part.strip()
+        nested, _, rest = part.partition("(")
+        if nested in ("and", "or") and rest:
+            predicates.append(_logic_predicate(nested, "(" + rest))
+        else:
+            column, _, expression = part.partition(".")
+            predicates.append(_column_predicate(column, expression))
+    combine = any if operator == "or" else all
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+# --- TABLAS ---
+class MemoryQuery:
+    """Query builder con la interfaz del de postgrest (la parte que usa la app)."""
+
+    def __init__(self, database: "MemoryDatabase", table: str) -> None:
+        self._database = database
+        self.table = table
+        self.path = f"/{table}"
+        self.http_method = "GET"
+        self.headers: Dict[str, str] = {}
+        self.params = httpx.QueryParams()
+        self.json: Any = None
+        self._count: Optional[str] = None
+        self._single = False
+
+    # Acciones
+    def select(self, *columns: str, count: Optional[str] = None) -> "MemoryQuery":
+        self.http_method = "GET"
+        self.params = self.params.set("select", ",".join(columns) or "*")
+        self._count = count
+        return self
+
+    def insert(self, json: Any, *, count: Optional[str] = None, returning: str = "representation", upsert: bool = False) -> "MemoryQuery":
+        self.http_method = "POST"
+        self.json = json
+        self.headers["Prefer"] = f"return={returning}" + (",resolution=merge-duplicates" if upsert else "")
+        self._count = count
+        return self
+
+    def upsert(self, json: Any, *, count: Optional[str] = None, returning: str = "representation", ignore_duplicates: bool = False, on_conflict: str = "") -> "MemoryQuery":
+        self.insert(json, count=count, returning=returning, upsert=True)
+        if on_conflict:
+            self.params = self.params.set("on_conflict", on_conflict)
+        return self
+
+    def update(self, json: Dict[str, Any], *, count: Optional[str] = None, returning: str = "representation") -> "MemoryQuery":
+        self.http_method = "PATCH"
+        self.json = json
+        self._count = count
+        return self
+
+    def delete(self, *, count: Optional[str] = None, returning: str = "representation") -> "MemoryQuery":
+        self.http_method = "DELETE"
+        self._count = count
+        return self
+
+    # Filtros y modificadores
+    def filter(self, column: str, operator: str, criteria: str) -> "MemoryQuery":
+        self.params = self.params.add(column, f"{operator}.{criteria}")
+        return self
+
+    def eq(self, column: str, value: Any) -> "MemoryQuery":
+        return self.filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "MemoryQuery":
+        return self.filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "MemoryQuery":
+        return self.filter(column, "gt", value)
+
+    def lt(self, column: str, value: Any) -> "MemoryQuery":
+        return self.filter(column, "lt", value)
+
+    def in_(self, column: str, values: Iterable[Any]) -> "MemoryQuery":
+        quoted = [f'"{value}"' if any(c in str(value) for c in ',()"') else str(value) for value in values]
+        return self.filter(column, "in", f"({','.join(quoted)})")
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: bool = False) -> "MemoryQuery":
+        entry = f"{column}.{'desc' if desc else 'asc'}" + (".nullsfirst" if nullsfirst else "")
+        current = self.params.get("order")
+        self.params = self.params.set("order", f"{current},{entry}" if current else entry)
+        return self
+
+    def limit(self, size: int) -> "MemoryQuery":
+        self.params = self.params.set("limit", size)
+        return self
+
+    def maybe_single(self) -> "MemoryQuery":
+        self._single = True
+        return self
+
+    def execute(self) -> Optional[MemoryResponse]:
+        return self._database.execute(self)
+
+    # Interpretación de los parámetros
+    def predicate(self) -> Predicate:
+        predicates = []
+        for key, value in self.params.multi_items():
+            if key in _RESERVED_PARAMS:
+                continue
+            if key in ("or", "and"):
+                predicates.append(_logic_predicate(key, value))
+            else:
+                predicates.append(_column_predicate(key, value))
+        return lambda row: all(predicate(row) for predicate in predicates)
+
+    def id_lookup(self) -> Optional[List[str]]:
+        """Ids a los que se limita la consulta con `id=eq.`/`id=in.`, para no recorrer la tabla."""
+        for key, value in self.params.multi_items():
+            if key == "id" and value.startswith("eq."):
+                return [value[3:]]
+            if key == "id" and value.startswith("in.(") and value.endswith(")"):
+                return [_unquote(item) for item in _split_top_level(value[4:-1])]
+        return None
+
+    def columns(self) -> Optional[List[str]]:
+        selected = self.params.get("select", "*")
+        return None if selected == "*" else [column.strip() for column in selected.split(",")]
+
+    def sort_keys(self) -> List[Tuple[str, bool]]:
+        order = self.params.get("order")
+        if not order:
+            return []
+        keys = []
+        for entry in order.split(","):
+            column, _, direction = entry.partition(".")
+            keys.append((column, direction.startswith("desc")))
+        return keys
+
+class MemoryDatabase:
+    """Tablas como diccionarios por id (en orden de inserción), protegidas por un lock."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.tables: Dict[str, Dict[str, Row]] = {}
+        self._lock = threading.Lock()
+
+    def execute(self, query: MemoryQuery) -> Optional[MemoryResponse]:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            table = self.tables.setdefault(query.table, {})
+            if query.http_method == "POST":
+                return self._insert(query, table)
+            rows = self._matching(query, table)
+            if query.http_method == "PATCH":
+                return self._update(query, table, rows)
+            if query.http_method == "DELETE":
+                for row in rows:
+                    del table[str(row["id"])]
+                if query.table == "pets":
+                    self._record_tombstones(rows)
+                return MemoryResponse([dict(row) for row in rows], len(rows) if query._count else None)
+            return self._select(query, rows)
+
+    def _matching(self, query: MemoryQuery, table: Dict[str, Row]) -> List[Row]:
+        predicate = query.predicate()
+        ids = query.id_lookup()
+        candidates = (table[i] for i in ids if i in table) if ids is not None else table.values()
+        return [row for row in candidates if predicate(row)]
+
+    def _select(self, query: MemoryQuery, rows: List[Row]) -> Optional[MemoryResponse]:
+        total = len(rows) if query._count else None
+        for column, descending in reversed(query.sort_keys()):
+            rows.sort(key=lambda row: (row.get(column) is None, str(row.get(column) or "")), reverse=descending)
+        limit = query.params.get("limit")
+        if limit is not None:
+            rows = rows[: int(limit)]
+        columns = query.columns()
+        data = [dict(row) if columns is None else {column: row.get(column) for column in columns} for row in rows]
+        if query._single:
+            if len(data) > 1:
+                raise APIError({"message": "JSON object requested, multiple rows returned", "code": "PGRST116"})
+            return MemoryResponse(data[0]) if data else None
+        return MemoryResponse(data, total)
+
+    def _check_columns(self, table_name: str, row: Row, inserting: bool) -> None:
+        schema = _SCHEMAS.get(table_name)
+        if schema is None:
+            return
+        unknown = set(row) - set(schema["columns"])
+        if unknown:
+            raise APIError({"message": f"Could not find the '{sorted(unknown)[0]}' column of '{table_name}'", "code": "PGRST204"})
+        if inserting:
+            for column in schema["required"]:
+                if row.get(column) is None:
+                    raise APIError({"message": f'null value in column "{column}" violates not-null constraint', "code": "23502"})
+
+    def _insert(self, query: MemoryQuery, table: Dict[str, Row]) -> MemoryResponse:
+        payload = query.json if isinstance(query.json, list) else [query.json]
+        merge = "merge-duplicates" in query.headers.get("Prefer", "")
+        # Se valida todo antes de escribir: un insert múltiple es una transacción
+        prepared: List[Tuple[Optional[Row], Row]] = []
+        for item in payload:
+            row = dict(item)
+            row_id = str(row["id"]) if row.get("id") is not None else None
+            existing = table.get(row_id) if row_id else None
+            if existing is not None and not merge:
+                raise APIError({"message": 'duplicate key value violates unique constraint "pets_pkey"', "code": "23505"})
+            self._check_columns(query.table, row, inserting=existing is None)
+            prepared.append((existing, row))
+        results = []
+        now = _now()
+        for existing, row in prepared:
+            if existing is not None:
+                existing.update(row)
+                existing["updated_at"] = now
+                results.append(dict(existing))
+                continue
+            row["id"] = str(row.get("id") or uuid.uuid4())
+            row.setdefault("created_at", now)
+            # Como el trigger set_updated_at de sql/003 (también al insertar)
+            row["updated_at"] = now
+            table[row["id"]] = row
+            results.append(dict(row))
+        return MemoryResponse(results, len(results) if query._count else None)
+
+    def _update(self, query: MemoryQuery, table: Dict[str, Row], rows: List[Row]) -> MemoryResponse:
+        self._check_columns(query.table, query.json, inserting=False)
+        now = _now()
+        for row in rows:
+            row.update(query.json)
+            # Como el trigger set_updated_at de sql/002
+            row["updated_at"] = now
+        return MemoryResponse([dict(row) for row in rows], len(rows) if query._count else None)
+
+    def _record_tombstones(self, rows: List[Row]) -> None:
+        # Como el trigger record_pet_tombstone de sql/003 (clave: pet_id)
+        tombstones = self.tables.setdefault("pet_tombstones", {})
+        now = _now()
+        for row in rows:
+            pet_id = str(row["id"])
+            tombstones.pop(pet_id, None)
+            tombstones[pet_id] = {"pet_id": pet_id, "owner_id": row["owner_id"], "deleted_at": now}
+
+# --- STORAGE ---
+class MemoryBucket:
+    def __init__(self, storage: "MemoryStorage", bucket: str) -> None:
+        self._storage = storage
+        self.bucket = bucket
+
+    def upload(self, path: str, file: Any, file_options: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        content = file.read() if hasattr(file, "read") else bytes(file)
+        options = file_options or {}
+        self._storage.wait()
+        with self._storage.lock:
+            objects = self._storage.objects.setdefault(self.bucket, {})
+            if path in objects and options.get("x-upsert") != "true":
+                raise StorageException({"statusCode": 400, "error": "Duplicate", "message": "The resource already exists"})
+            objects[path] = (content, options.get("content-type", "application/octet-stream"))
+        return {"Key": f"{self.bucket}/{path}"}
+
+    def list(self, path: Optional[str] = None, options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        self._storage.wait()
+        prefix = f"{path.strip('/')}/" if path else ""
+        with self._storage.lock:
+            objects = dict(self._storage.objects.get(self.bucket, {}))
+        listing = []
+        for key, (content, content_type) in sorted(objects.items()):
+            if key.startswith(prefix) and "/" not in key[len(prefix):]:
+                listing.append({"name": key[len(prefix):], "metadata": {"size": len(content), "mimetype": content_type}})
+        return listing
+
+    def remove(self, paths: List[str]) -> List[Dict[str, str]]:
+        self._storage.wait()
+        with self._storage.lock:
+            objects = self._storage.objects.get(self.bucket, {})
+            return [{"name": path} for path in paths if objects.pop(path, None) is not None]
+
+    def get_public_url(self, path: str) -> str:
+        return f"{self._storage.url}/storage/v1/object/public/{self.bucket}/{path}"
+
+class MemoryStorage:
+    def __init__(self, url: str, latency: float = 0.0) -> None:
+        self.url = url.rstrip("/")
+        self.latency = latency
+        self.objects: Dict[str, Dict[str, Tuple[bytes, str]]] = {}
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def from_(self, bucket: str) -> MemoryBucket:
+        return MemoryBucket(self, bucket)
+
+class MemorySupabaseClient:
+    """Cliente con la forma de `supabase.Client` que usa la app: `table()` y `storage`."""
+
+    def __init__(self, url: str, latency: float = 0.0) -> None:
+        self.database = MemoryDatabase(latency)
+        self.storage = MemoryStorage(url, latency)
+
+    def table(self, name: str) -> MemoryQuery:
+        return MemoryQuery(self.database, name)
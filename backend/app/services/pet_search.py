@@ -0,0 +1,198 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import re
+import unicodedata
+
+# --- BÚSQUEDA DE MASCOTAS ---
+# Índice invertido por propietario sobre name, species y breed, en memoria de
+# cada worker. Los términos se normalizan (minúsculas, sin tildes) y cada
+# término de la consulta se compara con el vocabulario del propietario, que es
+# pequeño: coincidencia exacta, por prefijo (búsqueda mientras se escribe) o
+# con errores de tipeo (distancia de edición acotada según el largo).
+# Todos los términos de la consulta deben coincidir con algún campo.
+
+SEARCH_COLUMNS = ("id", "name", "species", "breed")
+
+# El nombre pesa más que la raza y la especie al ordenar
+FIELD_WEIGHTS = {"name": 3.0, "breed": 1.5, "species": 1.0}
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+TYPO_SCORE = 0.6
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+
+def normalize_terms(text: Optional[str]) -> List[str]:
+    """'Pequeño Peluche' -> ['pequeno', 'peluche']"""
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _TERM_RE.findall(stripped)
+
+def char_mask(term: str) -> int:
+    """Conjunto de caracteres del término como bits (a-z, 0-9)."""
+    mask = 0
+    for char in term:
+        mask |= 1 << (ord(char) - 97 if char >= "a" else ord(char) - 22)
+    return mask
+
+def max_typos(term: str) -> int:
+    """Errores admitidos: ninguno en términos cortos, 1 desde 4 letras, 2 desde 8."""
+    if len(term) >= 8:
+        return 2
+    if len(term) >= 4:
+        return 1
+    return 0
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distancia de Damerau-Levenshtein (con transposiciones adyacentes) entre
+    `a` y `b`; en cuanto supera `limit` devuelve limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_row: List[int] = []
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous_row, row = previous_row, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return row[-1]
+
+
+class SearchIndex:
+    """
+    Índice de las mascotas de un propietario. `generation` es la generación de
+    caché del propietario con la que está al día y `expires_at` (epoch) cuándo
+    hay que reconstruirlo aunque siga al día (ver pet_service).
+    """
+
+    def __init__(self, generation: str, expires_at: float) -> None:
+        self.generation = generation
+        self.expires_at = expires_at
+        # pet_id -> nombre normalizado (desempate al ordenar) y términos por campo
+        self._docs: Dict[str, Tuple[str, Dict[str, List[str]]]] = {}
+        # término -> {pet_id: campos donde aparece}
+        self._postings: Dict[str, Dict[str, Set[str]]] = {}
+        # término -> char_mask, para descartar rápido los que no pueden estar a k errores
+        self._masks: Dict[str, int] = {}
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        pet_id = str(row["id"])
+        self.remove(pet_id)
+        fields = {field: normalize_terms(row.get(field)) for field in FIELD_WEIGHTS}
+        self._docs[pet_id] = (" ".join(fields["name"]), fields)
+        for field, terms in fields.items():
+            for term in terms:
+                if term not in self._postings:
+                    self._sorted_terms = None
+                    self._masks[term] = char_mask(term)
+                self._postings.setdefault(term, {}).setdefault(pet_id, set()).add(field)
+
+    def remove(self, pet_id: str) -> None:
+        doc = self._docs.pop(pet_id, None)
+        if doc is None:
+            return
+        for terms in doc[1].values():
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(pet_id, None)
+                if not postings:
+                    del self._postings[term]
+                    del self._masks[term]
+                    self._sorted_terms = None
+
+    def apply_changes(self, upserted: Iterable[Dict[str, Any]] = (), deleted: Iterable[str] = ()) -> None:
+        for pet_id in deleted:
+            self.remove(str(pet_id))
+        for row in upserted:
+            self.add(row)
+
+    def _matching_terms(self, query_term: str) -> Dict[str, float]:
+        """Términos del vocabulario que coinciden con `query_term` y su puntuación."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        matches: Dict[str, float] = {}
+        # Exacta y por prefijo: los términos que empiezan por query_term son contiguos
+        position = bisect_left(self._sorted_terms, query_term)
+        while position < len(self._sorted_terms) and self._sorted_terms[position].startswith(query_term):
+            term = self._sorted_terms[position]
+            matches[term] = EXACT_SCORE if term == query_term else PREFIX_SCORE
+            position += 1
+        # Con errores: contra el término completo o contra su comienzo (prefijo con errores)
+        limit = max_typos(query_term)
+        if limit:
+            query_mask = char_mask(query_term)
+            for term, mask in self._masks.items():
+                # Cada error aporta como mucho un carácter que no está en el término:
+                # si faltan más de `limit` caracteres distintos no hace falta calcular la distancia
+                if term in matches or bin(query_mask & ~mask).count("1") > limit:
+                    continue
+                distance = min(
+                    edit_distance(query_term, term, limit),
+                    edit_distance(query_term, term[:len(query_term)], limit),
+                )
+                if distance <= limit:
+                    matches[term] = TYPO_SCORE - 0.1 * (distance - 1)
+        return matches
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """Ids de las mascotas que coinciden con la consulta y su puntuación, de más a menos relevante."""
+        query_terms = list(dict.fromkeys(normalize_terms(query)))
+        if not query_terms:
+            return []
+        scores: Optional[Dict[str, float]] = None
+        for query_term in query_terms:
+            # Mejor coincidencia de este término en cada mascota
+            best: Dict[str, float] = {}
+            for term, term_score in self._matching_terms(query_term).items():
+                for pet_id, fields in self._postings[term].items():
+                    score = term_score * max(FIELD_WEIGHTS[field] for field in fields)
+                    if score > best.get(pet_id, 0.0):
+                        best[pet_id] = score
+            if scores is None:
+                scores = best
+            else:
+                scores = {pet_id: scores[pet_id] + score for pet_id, score in best.items() if pet_id in scores}
+            if not scores:
+                return []
+        return sorted(scores.items(), key=lambda item: (-item[1], self._docs[item[0]][0], item[0]))
+
+
+class SearchIndexRegistry:
+    """Índices por propietario de este worker, con desalojo LRU."""
+
+    def __init__(self, max_owners: int) -> None:
+        self.max_owners = max_owners
+        self._indexes: "OrderedDict[str, SearchIndex]" = OrderedDict()
+
+    def get(self, owner_id: str) -> Optional[SearchIndex]:
+        index = self._indexes.get(owner_id)
+        if index is not None:
+            self._indexes.move_to_end(owner_id)
+        return index
+
+    def put(self, owner_id: str, index: SearchIndex) -> None:
+        self._indexes[owner_id] = index
+        self._indexes.move_to_end(owner_id)
+        while len(self._indexes) > self.max_owners:
+            self._indexes.popitem(last=False)
+
+    def discard(self, owner_id: str) -> None:
+        self._indexes.pop(owner_id, None)
+
+    def __len__(self) -> int:
+        return len(self._indexes)
@@ -1,10 +1,29 @@
-from supabase import Client
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence, Tuple, Union
 import uuid
-from datetime import date
+import json
+import base64
+from datetime import date, datetime, timedelta, timezone
+import hashlib
+import asyncio
 import logging
+import re
+import time
 from fastapi import UploadFile
-import shutil
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging_config import log_payload
+from app.core.tracing import traced
+from app.models.pet import Pet
+from app.services.supabase_client import Client, execute_query, run_storage_call
+from app.services.resilience import DeadlineExceededError, ServiceUnavailableError, is_transient
+from app.services.cache import cache
+from app.services.singleflight import SingleFlight
+from app.services import image_processing, pet_search, pet_summary
+from app.services.photo_storage import (
+    spool_upload_to_disk, discard_spooled_file, public_url, UnsupportedImageError, UploadTooLargeError
+)
 
 # Podríamos definir excepciones personalizadas para la capa de servicio
 class PetNotFoundError(Exception):
@@ -19,27 +38,509 @@ class PetDatabaseError(Exception):
 class StorageUploadError(Exception):
     pass
 
+class PhotoTooLargeError(StorageUploadError):
+    pass
+
+class InvalidCursorError(Exception):
+    pass
+
+class InvalidFieldsError(Exception):
+    pass
+
+class WatermarkExpiredError(Exception):
+    """La marca de agua es anterior a la retención de lápidas: hay que sincronizar desde cero."""
+    pass
+
+class PetServiceUnavailableError(PetDatabaseError):
+    """Supabase no responde (circuit breaker abierto o plazos agotados): 503."""
+    pass
+
+def _database_error(error: Exception, message: str) -> PetDatabaseError:
+    """Envuelve un error de la capa de datos en la excepción del servicio que le corresponde."""
+    # Breaker abierto, o fallos de red/plazos que persistieron tras los reintentos
+    if isinstance(error, ServiceUnavailableError) or is_transient(error):
+        return PetServiceUnavailableError("Servicio de base de datos no disponible temporalmente. Inténtalo de nuevo en unos segundos.")
+    return PetDatabaseError(message)
+
 logger = logging.getLogger(__name__)
 
-async def get_pets_by_owner(db: Client, owner_id: str) -> List[Dict[str, Any]]:
-    """Obtiene todas las mascotas para un owner_id específico."""
-    logger.info(f"Service: Obteniendo mascotas para owner_id: {owner_id}")
+# Coalescencia de lecturas de mascotas (listados e individuales), por worker
+pet_reads = SingleFlight("pet_reads")
+metrics.singleflight_calls.add_source(lambda: pet_reads.stats, "pet_reads")
+
+# --- CACHÉ DE LECTURA POR PROPIETARIO ---
+# Cada propietario tiene una "generación" en la caché que forma parte de todas
+# las claves de sus lecturas (listado e individuales). Cualquier escritura
+# reemplaza la generación, con lo que todas sus entradas dejan de alcanzarse de
+# golpe (y caducan solas por TTL). Si la generación se pierde (LRU/TTL) se crea
+# una nueva: el peor caso es un fallo de caché, nunca un dato obsoleto.
+def _generation_key(owner_id: str) -> str:
+    return f"pets:gen:{owner_id}"
+
+def _new_generation() -> str:
+    return uuid.uuid4().hex[:12]
+
+def _generation_ttl() -> float:
+    # Debe sobrevivir a las entradas que dependen de ella
+    return settings.CACHE_TTL_SECONDS * 10
+
+async def _owner_generation(owner_id: str) -> str:
+    generation = await cache.get(_generation_key(owner_id))
+    if generation is None:
+        generation = _new_generation()
+        await cache.set(_generation_key(owner_id), generation, ttl=_generation_ttl())
+    return generation
+
+# --- ETAGS ---
+# El ETag de una lectura se deriva de la identidad y la marca de agua
+# (updated_at, o created_at si nunca se actualizó) de cada fila, más los
+# parámetros que cambian la representación. Así se calcula sin serializar la
+# respuesta y, para listados, se guarda junto a la página cacheada.
+def _row_version(row: Dict[str, Any]) -> str:
+    return f"{row.get('id')}@{row.get('updated_at') or row.get('created_at')}"
+
+def compute_etag(rows: List[Dict[str, Any]], *variant: Any) -> str:
+    """ETag fuerte (entre comillas) para un conjunto de filas y sus parámetros."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(variant).encode())
+    for row in rows:
+        digest.update(b"|")
+        digest.update(_row_version(row).encode())
+    return f'"{digest.hexdigest()}"'
+
+def pet_etag(pet: Dict[str, Any], fields: Optional[Tuple[str, ...]] = None) -> str:
+    return compute_etag([pet], fields) if fields else compute_etag([pet])
+
+@traced
+async def invalidate_owner_cache(
+    owner_id: str, upserted: Sequence[Dict[str, Any]] = (), deleted: Sequence[str] = ()
+) -> None:
+    """
+    Invalida todas las lecturas cacheadas de un propietario tras una escritura y
+    aplica la escritura a su resumen: `upserted` son las filas creadas o
+    actualizadas y `deleted` los ids eliminados. Sin ellos el resumen se
+    descarta y se reconstruye en la próxima lectura.
+    """
+    previous = await cache.get(_generation_key(owner_id))
+    generation = _new_generation()
+    await cache.set(_generation_key(owner_id), generation, ttl=_generation_ttl())
+    await _update_summary(owner_id, previous, generation, upserted, deleted)
+    _update_search_index(owner_id, previous, generation, upserted, deleted)
+
+# --- SELECCIÓN DE CAMPOS (?fields=) ---
+# Los lectores pueden pedir solo algunos campos del modelo Pet. El select de
+# PostgREST se reduce a esos campos más las columnas que el servicio necesita
+# (cursor, ETag, verificación de propiedad); el router recorta la respuesta con
+# `project_fields`.
+PET_FIELDS: Tuple[str, ...] = tuple(Pet.model_fields)
+_LIST_COLUMNS = ("id", "created_at", "updated_at")
+_ITEM_COLUMNS = ("id", "owner_id", "created_at", "updated_at")
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Convierte "id,name,photo_url" en una tupla de campos válidos de Pet, sin
+    duplicados y en el orden del modelo. None (o vacío) significa todos.
+    Lanza InvalidFieldsError si algún campo no existe.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(PET_FIELDS)
+    if unknown:
+        raise InvalidFieldsError(
+            f"Campos no válidos: {', '.join(sorted(unknown))}. Disponibles: {', '.join(PET_FIELDS)}"
+        )
+    return tuple(name for name in PET_FIELDS if name in requested) or None
+
+def _select_columns(fields: Optional[Tuple[str, ...]], required: Tuple[str, ...]) -> str:
+    if fields is None:
+        return "*"
+    return ",".join(dict.fromkeys(required + fields))
+
+def project_fields(row: Dict[str, Any], fields: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    """Deja en la fila solo los campos pedidos (todas si fields es None)."""
+    if fields is None:
+        return row
+    return {name: row.get(name) for name in fields}
+
+# --- PAGINACIÓN POR CURSOR (KEYSET) ---
+# Las mascotas se recorren ordenadas por (created_at, id). El cursor codifica
+# la última fila devuelta, de modo que cada página es un "WHERE (created_at, id) > cursor
+# ORDER BY created_at, id LIMIT n" que usa el índice (owner_id, created_at, id)
+# y cuesta lo mismo en la página 1 que en la 100.
+_FRACTION_RE = re.compile(r"\.(\d+)")
+
+def _parse_timestamp(value: Any) -> datetime:
+    """Timestamp de PostgREST (o de un cursor/marca de agua) como datetime con zona."""
+    text = str(value).replace("Z", "+00:00").replace(" ", "T")
+    # fromisoformat antes de Python 3.11 solo acepta 6 decimales
+    text = _FRACTION_RE.sub(lambda match: "." + match.group(1)[:6].ljust(6, "0"), text, count=1)
+    parsed = datetime.fromisoformat(text)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _canonical_timestamp(value: Any) -> str:
+    """
+    Timestamp validado y reescrito en ISO (UTC, microsegundos). Los cursores
+    vienen del cliente y el valor va dentro del filtro `or` de PostgREST:
+    así no puede llevar comillas, comas ni paréntesis que alteren el filtro.
+    """
+    return _parse_timestamp(value).astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Codifica la posición de una fila (created_at, id) como cursor opaco."""
+    raw = json.dumps([row["created_at"], str(row["id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decodifica un cursor generado por `encode_cursor`. Lanza InvalidCursorError si no es válido."""
     try:
-        response = db.table("pets").select("*", count='exact').eq("owner_id", owner_id).execute()
-        logger.debug(f"Service: Respuesta get_pets_by_owner: {response}")
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pet_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _canonical_timestamp(created_at), str(uuid.UUID(str(pet_id)))
+    except Exception as e:
+        raise InvalidCursorError("Cursor de paginación inválido") from e
+
+def _add_keyset_filter(query: Any, column: str, value: str, id_column: str, row_id: str) -> Any:
+    """Añade a la consulta el filtro (column, id_column) > (value, row_id)."""
+    # Comillas dobles porque el timestamp contiene ':' y '+', reservados en PostgREST
+    condition = f'({column}.gt."{value}",and({column}.eq."{value}",{id_column}.gt.{row_id}))'
+    query.params = query.params.add("or", condition)
+    return query
+
+def _apply_keyset(query: Any, cursor: str) -> Any:
+    """Añade a la consulta el filtro (created_at, id) > cursor."""
+    created_at, pet_id = decode_cursor(cursor)
+    return _add_keyset_filter(query, "created_at", created_at, "id", pet_id)
+
+@traced
+async def get_pets_by_owner(
+    db: Client,
+    owner_id: str,
+    limit: int = settings.PETS_PAGE_SIZE_DEFAULT,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> Dict[str, Any]:
+    """
+    Obtiene una página de mascotas para un owner_id específico.
+    Devuelve un diccionario con `items`, `next_cursor` (None en la última página),
+    `total` (solo si se pidió `count`: exact, planned o estimated) y `etag`.
+    Con `fields` (ver `parse_fields`) solo se leen esos campos de la BD.
+    """
+    logger.info("Service: Obteniendo mascotas para owner_id: %s (limit=%s, cursor=%s)", owner_id, limit, cursor)
+
+    generation = await _owner_generation(owner_id)
+    cache_key = f"pets:list:{owner_id}:{generation}:{limit}:{cursor or ''}:{count or ''}:{','.join(fields or ())}"
+    cached_page = await cache.get(cache_key)
+    if cached_page is not None:
+        return cached_page
+
+    # Lecturas idénticas concurrentes (varias pestañas, dashboard + listado)
+    # comparten una sola consulta a Supabase
+    return await pet_reads.do(
+        cache_key, lambda: _load_pets_page(db, owner_id, limit, cursor, count, fields, cache_key)
+    )
+
+@traced
+async def _load_pets_page(
+    db: Client,
+    owner_id: str,
+    limit: int,
+    cursor: Optional[str],
+    count: Optional[str],
+    fields: Optional[Tuple[str, ...]],
+    cache_key: str,
+) -> Dict[str, Any]:
+    query = db.table("pets").select(_select_columns(fields, _LIST_COLUMNS), count=count).eq("owner_id", owner_id)
+    if cursor:
+        query = _apply_keyset(query, cursor)
+    # Pedimos una fila extra para saber si hay página siguiente sin contar
+    query = query.order("created_at").order("id").limit(limit + 1)
+
+    try:
+        response = await execute_query(query)
+        log_payload(logger, "Service: Respuesta get_pets_by_owner: %s", response)
         
         if hasattr(response, 'error') and response.error:
-            logger.error(f"Service: Error Supabase en get_pets_by_owner: {response.error}")
+            logger.error("Service: Error Supabase en get_pets_by_owner: %s", response.error)
             raise PetDatabaseError(f"Error al consultar mascotas: {response.error.message}")
         
-        return response.data if hasattr(response, 'data') else []
+        rows = response.data if hasattr(response, 'data') and response.data else []
+    except PetDatabaseError as e:
+        raise e
+    except Exception as e:
+        logger.error("Service: Excepción inesperada en get_pets_by_owner: %s", e, exc_info=True)
+        raise _database_error(e, f"Error inesperado al obtener mascotas: {e}") from e
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    total = getattr(response, "count", None) if count else None
+    page = {
+        "items": rows,
+        "next_cursor": next_cursor,
+        "total": total,
+        "etag": compute_etag(rows, next_cursor, total, fields),
+    }
+    await cache.set(cache_key, page)
+    return page
+
+async def iter_pets_by_owner(
+    db: Client, owner_id: str, page_size: int, columns: str = "*"
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Recorre todas las mascotas de un propietario página a página (keyset),
+    sin pasar por la caché. Para exportaciones: en memoria solo hay una página.
+    `columns` debe incluir id y created_at (el cursor).
+    """
+    cursor: Optional[str] = None
+    while True:
+        query = db.table("pets").select(columns).eq("owner_id", owner_id)
+        if cursor:
+            query = _apply_keyset(query, cursor)
+        query = query.order("created_at").order("id").limit(page_size)
+        try:
+            response = await execute_query(query)
+        except Exception as e:
+            logger.error("Service: Excepción inesperada en iter_pets_by_owner: %s", e, exc_info=True)
+            raise _database_error(e, f"Error inesperado al obtener mascotas: {e}") from e
+        rows = response.data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        cursor = encode_cursor(rows[-1])
+
+# --- RESUMEN POR PROPIETARIO ---
+# El agregado (ver pet_summary) se guarda en la caché fuera de la generación:
+# las escrituras lo actualizan de forma incremental en `invalidate_owner_cache`
+# y lo pasan a la nueva generación. Si al leerlo su generación no es la actual,
+# alguna escritura no se le aplicó (o se perdió la generación) y se reconstruye
+# con un recorrido completo. `expires_at` no se renueva al actualizarlo: con
+# caché "memory" y varios workers acota cuánto puede faltarle una escritura
+# hecha en otro worker.
+def _summary_key(owner_id: str) -> str:
+    return f"pets:summary:{owner_id}"
+
+async def _update_summary(
+    owner_id: str,
+    previous_generation: Optional[str],
+    generation: str,
+    upserted: Sequence[Dict[str, Any]],
+    deleted: Sequence[str],
+) -> None:
+    summary = await cache.get(_summary_key(owner_id))
+    if summary is None:
+        return
+    remaining = summary["expires_at"] - time.time()
+    if summary["generation"] != previous_generation or remaining <= 0 or not (upserted or deleted):
+        await cache.delete(_summary_key(owner_id))
+        return
+    updated = pet_summary.apply_changes(summary, upserted, deleted)
+    updated["generation"] = generation
+    await cache.set(_summary_key(owner_id), updated, ttl=remaining)
+
+@traced
+async def get_pets_summary(db: Client, owner_id: str, days: int = settings.PETS_SUMMARY_BIRTHDAY_DAYS) -> Dict[str, Any]:
+    """
+    Resumen de las mascotas de un propietario (total, por especie, por género y
+    cumpleaños en los próximos `days` días). Devuelve `summary` y su `etag`.
+    """
+    generation = await _owner_generation(owner_id)
+    summary = await cache.get(_summary_key(owner_id))
+    if summary is None or summary["generation"] != generation:
+        summary = await pet_reads.do(
+            f"pets:summary:{owner_id}:{generation}", lambda: _build_summary(db, owner_id, generation)
+        )
+    result = pet_summary.render_summary(summary, days)
+    return {"summary": result, "etag": compute_etag([], result)}
+
+@traced
+async def _build_summary(db: Client, owner_id: str, generation: str) -> Dict[str, Any]:
+    logger.info("Service: Calculando resumen de mascotas para owner_id: %s", owner_id)
+    summary = pet_summary.empty_summary()
+    columns = ",".join(pet_summary.SUMMARY_COLUMNS + ("created_at",))
+    async for rows in iter_pets_by_owner(db, owner_id, page_size=settings.EXPORT_PAGE_SIZE, columns=columns):
+        summary = pet_summary.apply_changes(summary, rows)
+    ttl = settings.PETS_SUMMARY_TTL_SECONDS
+    summary.update(generation=generation, expires_at=time.time() + ttl)
+    await cache.set(_summary_key(owner_id), summary, ttl=ttl)
+    return summary
+
+# --- BÚSQUEDA ---
+# Índice por propietario en memoria del worker (ver pet_search), al día con una
+# generación de caché igual que el resumen: las escrituras lo actualizan en
+# `invalidate_owner_cache` y, si su generación no es la actual, se reconstruye.
+# Como el resumen, también se reconstruye pasado SEARCH_INDEX_TTL_SECONDS: con
+# caché "memory" y varios workers, las escrituras de otro worker no cambian la
+# generación que ve este.
+search_indexes = pet_search.SearchIndexRegistry(settings.SEARCH_INDEX_MAX_OWNERS)
+
+def _update_search_index(
+    owner_id: str,
+    previous_generation: Optional[str],
+    generation: str,
+    upserted: Sequence[Dict[str, Any]],
+    deleted: Sequence[str],
+) -> None:
+    index = search_indexes.get(owner_id)
+    if index is None:
+        return
+    if index.generation != previous_generation or index.expires_at <= time.time() or not (upserted or deleted):
+        search_indexes.discard(owner_id)
+        return
+    index.apply_changes(upserted, deleted)
+    index.generation = generation
+
+@traced
+async def _build_search_index(db: Client, owner_id: str, generation: str) -> pet_search.SearchIndex:
+    logger.info("Service: Construyendo índice de búsqueda para owner_id: %s", owner_id)
+    index = pet_search.SearchIndex(generation, expires_at=time.time() + settings.SEARCH_INDEX_TTL_SECONDS)
+    columns = ",".join(pet_search.SEARCH_COLUMNS + ("created_at",))
+    async for rows in iter_pets_by_owner(db, owner_id, page_size=settings.EXPORT_PAGE_SIZE, columns=columns):
+        index.apply_changes(rows)
+    search_indexes.put(owner_id, index)
+    return index
+
+@traced
+async def search_pets(
+    db: Client,
+    owner_id: str,
+    query: str,
+    limit: int = settings.PETS_PAGE_SIZE_DEFAULT,
+    offset: int = 0,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> Dict[str, Any]:
+    """
+    Busca mascotas del propietario por nombre, especie y raza (por prefijo y
+    tolerando errores de tipeo). Devuelve `items` de la página pedida, en orden
+    de relevancia, y `total` de coincidencias.
+    """
+    logger.info("Service: Buscando mascotas para owner_id: %s (q=%r, offset=%s)", owner_id, query, offset)
+    generation = await _owner_generation(owner_id)
+    index = search_indexes.get(owner_id)
+    if index is None or index.generation != generation or index.expires_at <= time.time():
+        index = await pet_reads.do(
+            f"pets:search:{owner_id}:{generation}", lambda: _build_search_index(db, owner_id, generation)
+        )
+    matches = index.search(query)
+    page_ids = [pet_id for pet_id, _ in matches[offset:offset + limit]]
+    if not page_ids:
+        return {"items": [], "total": len(matches)}
+
+    # El índice solo da el orden: las filas de la página se leen en una consulta
+    try:
+        response = await execute_query(
+            db.table("pets").select(_select_columns(fields, _ITEM_COLUMNS)).eq("owner_id", owner_id).in_("id", page_ids)
+        )
+    except Exception as e:
+        logger.error("Service: Excepción inesperada en search_pets: %s", e, exc_info=True)
+        raise _database_error(e, f"Error inesperado al buscar mascotas: {e}") from e
+    rows = {str(row["id"]): row for row in (response.data or [])}
+    return {"items": [rows[pet_id] for pet_id in page_ids if pet_id in rows], "total": len(matches)}
+
+# --- SINCRONIZACIÓN INCREMENTAL (GET /changes?since=) ---
+# Dos flujos por propietario, cada uno recorrido por keyset: las filas creadas
+# o modificadas por (updated_at, id) y las lápidas de las borradas por
+# (deleted_at, pet_id) (ver sql/003). La marca de agua guarda la posición en
+# ambos. Una transacción puede confirmarse después de otra con un timestamp
+# anterior: al agotar un flujo, su posición no pasa de "ahora menos
+# CHANGES_SAFETY_LAG_SECONDS", así lo reciente se vuelve a entregar en la
+# siguiente sincronización (el cliente aplica por id, repetir no hace daño).
+_NIL_ID = "00000000-0000-0000-0000-000000000000"
+Position = Tuple[str, str]
+
+def _position_key(position: Position) -> Tuple[datetime, str]:
+    return _parse_timestamp(position[0]), position[1]
+
+def encode_watermark(changes: Position, deletions: Position) -> str:
+    raw = json.dumps([list(changes), list(deletions)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_watermark(watermark: str) -> Tuple[Position, Position]:
+    """Decodifica una marca de agua de `encode_watermark`. Lanza InvalidCursorError si no es válida."""
+    try:
+        padded = watermark + "=" * (-len(watermark) % 4)
+        changes, deletions = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        positions = tuple((_canonical_timestamp(ts), str(uuid.UUID(str(row_id)))) for ts, row_id in (changes, deletions))
+        return positions[0], positions[1]
     except Exception as e:
-        logger.error(f"Service: Excepción inesperada en get_pets_by_owner: {e}", exc_info=True)
-        raise PetDatabaseError(f"Error inesperado al obtener mascotas: {e}") from e
+        raise InvalidCursorError("Marca de agua de sincronización inválida") from e
 
+def _next_position(previous: Optional[Position], last: Optional[Position], has_more: bool, safe_until: Position) -> Position:
+    if has_more and last is not None:
+        return last
+    # Flujo agotado: todo lo anterior a safe_until ya se entregó
+    if previous is not None and _position_key(previous) > _position_key(safe_until):
+        return previous
+    return safe_until
+
+@traced
+async def get_pet_changes(db: Client, owner_id: str, since: Optional[str], limit: int) -> Dict[str, Any]:
+    """
+    Cambios en las mascotas de un propietario desde la marca de agua `since`
+    (None = sincronización completa). Devuelve `changed` (filas creadas o
+    modificadas), `deleted` (id y deleted_at), la nueva `watermark` y
+    `has_more` (quedan cambios: volver a llamar con la nueva marca de agua).
+    Lanza InvalidCursorError o WatermarkExpiredError si la marca de agua no sirve.
+    """
+    logger.info("Service: Obteniendo cambios para owner_id: %s (since=%s)", owner_id, since)
+    now = datetime.now(timezone.utc)
+    safe_until = ((now - timedelta(seconds=settings.CHANGES_SAFETY_LAG_SECONDS)).isoformat(timespec="microseconds"), _NIL_ID)
+    if since:
+        changes_from, deletions_from = decode_watermark(since)
+        if _parse_timestamp(deletions_from[0]) < now - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS):
+            raise WatermarkExpiredError("La marca de agua es demasiado antigua: sincroniza desde cero (sin since)")
+    else:
+        # Un cliente sin copia local no necesita las lápidas anteriores
+        changes_from, deletions_from = None, safe_until
+
+    changes_query = db.table("pets").select("*").eq("owner_id", owner_id)
+    if changes_from:
+        changes_query = _add_keyset_filter(changes_query, "updated_at", changes_from[0], "id", changes_from[1])
+    changes_query = changes_query.order("updated_at").order("id").limit(limit + 1)
+    deletions_query = _add_keyset_filter(
+        db.table("pet_tombstones").select("pet_id,deleted_at").eq("owner_id", owner_id),
+        "deleted_at", deletions_from[0], "pet_id", deletions_from[1],
+    ).order("deleted_at").order("pet_id").limit(limit + 1)
+
+    try:
+        changes_response, deletions_response = await asyncio.gather(
+            execute_query(changes_query), execute_query(deletions_query)
+        )
+    except Exception as e:
+        logger.error("Service: Excepción inesperada en get_pet_changes: %s", e, exc_info=True)
+        raise _database_error(e, f"Error inesperado al obtener cambios: {e}") from e
+
+    changed = (changes_response.data if changes_response else None) or []
+    tombstones = (deletions_response.data if deletions_response else None) or []
+    changes_more, deletions_more = len(changed) > limit, len(tombstones) > limit
+    changed, tombstones = changed[:limit], tombstones[:limit]
+    last_change = (str(changed[-1].get("updated_at") or changed[-1]["created_at"]), str(changed[-1]["id"])) if changed else None
+    last_deletion = (str(tombstones[-1]["deleted_at"]), str(tombstones[-1]["pet_id"])) if tombstones else None
+
+    # Las dos consultas no son una instantánea: si una mascota aparece en ambas
+    # (modificada y borrada, o recreada por un upsert) gana el evento más reciente
+    deleted_at = {str(row["pet_id"]): _parse_timestamp(row["deleted_at"]) for row in tombstones}
+    updated_at = {str(row["id"]): _parse_timestamp(row.get("updated_at") or row["created_at"]) for row in changed}
+    changed = [row for row in changed if str(row["id"]) not in deleted_at or updated_at[str(row["id"])] > deleted_at[str(row["id"])]]
+    deleted = [
+        {"id": row["pet_id"], "deleted_at": row["deleted_at"]}
+        for row in tombstones
+        if str(row["pet_id"]) not in updated_at or deleted_at[str(row["pet_id"])] >= updated_at[str(row["pet_id"])]
+    ]
+
+    watermark = encode_watermark(
+        _next_position(changes_from, last_change, changes_more, safe_until),
+        _next_position(deletions_from, last_deletion, deletions_more, safe_until),
+    )
+    return {"changed": changed, "deleted": deleted, "watermark": watermark, "has_more": changes_more or deletions_more}
+
+@traced
 async def create_new_pet(db: Client, owner_id: str, pet_data: Dict[str, Any]) -> Dict[str, Any]:
     """Crea una nueva mascota en la base de datos."""
-    logger.info(f"Service: Creando mascota para owner_id: {owner_id}")
+    logger.info("Service: Creando mascota para owner_id: %s", owner_id)
     
     # Preparar datos: añadir owner_id y convertir fecha
     data_to_insert = pet_data.copy()
@@ -48,171 +549,452 @@ async def create_new_pet(db: Client, owner_id: str, pet_data: Dict[str, Any]) ->
         logger.debug("Service: Convirtiendo birthdate a ISO string")
         data_to_insert["birthdate"] = data_to_insert["birthdate"].isoformat()
         
-    logger.debug(f"Service: Datos a insertar: {data_to_insert}")
+    log_payload(logger, "Service: Datos a insertar: %s", data_to_insert)
     
     try:
-        response = db.table("pets").insert(data_to_insert).execute()
-        logger.debug(f"Service: Respuesta create_new_pet: {response}")
+        response = await execute_query(db.table("pets").insert(data_to_insert))
+        log_payload(logger, "Service: Respuesta create_new_pet: %s", response)
 
         if hasattr(response, 'error') and response.error:
-            logger.error(f"Service: Error Supabase en create_new_pet: {response.error}")
+            logger.error("Service: Error Supabase en create_new_pet: %s", response.error)
             raise PetDatabaseError(f"Error al crear mascota: {response.error.message}")
         
         if hasattr(response, 'data') and response.data:
+            await invalidate_owner_cache(owner_id, upserted=response.data)
             return response.data[0]
         else:
              logger.error("Service: Respuesta inesperada de Supabase al crear (sin data)")
              raise PetDatabaseError("Respuesta inesperada del servicio de BD al crear")
              
     except Exception as e:
-        logger.error(f"Service: Excepción inesperada en create_new_pet: {e}", exc_info=True)
-        raise PetDatabaseError(f"Error inesperado al crear mascota: {e}") from e
+        logger.error("Service: Excepción inesperada en create_new_pet: %s", e, exc_info=True)
+        raise _database_error(e, f"Error inesperado al crear mascota: {e}") from e
+
+@traced
+async def get_pet_by_id(
+    db: Client, pet_id: uuid.UUID, user_id: str, fields: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Any]:
+    """
+    Obtiene una mascota por ID, verificando la propiedad.
+    Con `fields` solo se leen esos campos (más los necesarios para verificar la
+    propiedad y el ETag): recortar la respuesta con `project_fields`.
+    """
+    logger.info("Service: Obteniendo mascota ID: %s para user_id: %s", pet_id, user_id)
+
+    # Solo se cachean mascotas propias, bajo la generación del usuario
+    generation = await _owner_generation(str(user_id))
+    cache_key = f"pets:item:{user_id}:{generation}:{pet_id}:{','.join(fields or ())}"
+    cached_pet = await cache.get(cache_key)
+    if cached_pet is not None:
+        return cached_pet
 
-async def get_pet_by_id(db: Client, pet_id: uuid.UUID, user_id: str) -> Dict[str, Any]:
-    """Obtiene una mascota por ID, verificando la propiedad."""
-    logger.info(f"Service: Obteniendo mascota ID: {pet_id} para user_id: {user_id}")
+    return await pet_reads.do(cache_key, lambda: _load_pet(db, pet_id, user_id, fields, cache_key))
+
+@traced
+async def _load_pet(
+    db: Client, pet_id: uuid.UUID, user_id: str, fields: Optional[Tuple[str, ...]], cache_key: str
+) -> Dict[str, Any]:
     try:
-        response = db.table("pets").select("*").eq("id", str(pet_id)).maybe_single().execute()
-        logger.debug(f"Service: Respuesta get_pet_by_id: {response}")
+        response = await execute_query(
+            db.table("pets").select(_select_columns(fields, _ITEM_COLUMNS)).eq("id", str(pet_id)).maybe_single()
+        )
+        log_payload(logger, "Service: Respuesta get_pet_by_id: %s", response)
 
         if hasattr(response, 'error') and response.error:
-            logger.error(f"Service: Error Supabase en get_pet_by_id: {response.error}")
+            logger.error("Service: Error Supabase en get_pet_by_id: %s", response.error)
             raise PetDatabaseError(f"Error al obtener mascota por ID: {response.error.message}")
 
-        if not response.data:
-            logger.warning(f"Service: Mascota {pet_id} no encontrada.")
+        # maybe_single() devuelve None cuando no hay filas
+        if response is None or not response.data:
+            logger.warning("Service: Mascota %s no encontrada.", pet_id)
             raise PetNotFoundError(f"Mascota con ID {pet_id} no encontrada")
         
         pet_data = response.data
         if str(pet_data.get("owner_id")) != str(user_id):
-            logger.warning(f"Service: Intento de acceso no autorizado a mascota {pet_id} por usuario {user_id}")
+            logger.warning("Service: Intento de acceso no autorizado a mascota %s por usuario %s", pet_id, user_id)
             raise PetAccessForbiddenError("No tienes permiso para acceder a esta mascota")
         
-        logger.info(f"Service: Verificación de propiedad OK para mascota {pet_id}")
+        logger.info("Service: Verificación de propiedad OK para mascota %s", pet_id)
+        await cache.set(cache_key, pet_data)
         return pet_data
 
     except (PetNotFoundError, PetAccessForbiddenError) as e:
         raise e # Re-lanzar excepciones personalizadas
     except Exception as e:
-        logger.error(f"Service: Excepción inesperada en get_pet_by_id: {e}", exc_info=True)
-        raise PetDatabaseError(f"Error inesperado al obtener mascota por ID: {e}") from e
+        logger.error("Service: Excepción inesperada en get_pet_by_id: %s", e, exc_info=True)
+        raise _database_error(e, f"Error inesperado al obtener mascota por ID: {e}") from e
 
+@traced
+async def _raise_not_found_or_forbidden(db: Client, pet_id: uuid.UUID, user_id: str) -> None:
+    """
+    Se llama solo cuando una escritura filtrada por `id` y `owner_id` no afectó
+    ninguna fila: hace una única consulta ligera para distinguir 404 de 403.
+    """
+    response = await execute_query(db.table("pets").select("id").eq("id", str(pet_id)).limit(1))
+    if response is not None and response.data:
+        logger.warning("Service: Intento de modificación no autorizada de mascota %s por usuario %s", pet_id, user_id)
+        raise PetAccessForbiddenError("No tienes permiso para acceder/modificar esta mascota")
+    logger.warning("Service: Mascota %s no encontrada.", pet_id)
+    raise PetNotFoundError(f"Mascota con ID {pet_id} no encontrada")
+
+@traced
 async def update_existing_pet(db: Client, pet_id: uuid.UUID, user_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Actualiza una mascota existente, verificando la propiedad."""
-    logger.info(f"Service: Actualizando mascota ID: {pet_id} para user_id: {user_id}")
-    
-    # 1. Verificar propiedad (reutiliza la lógica de get_pet_by_id)
-    await get_pet_by_id(db=db, pet_id=pet_id, user_id=user_id) 
-    # Si no lanza excepción, la mascota existe y pertenece al usuario
+    """
+    Actualiza una mascota existente, verificando la propiedad.
+    El filtro por `id` y `owner_id` hace la verificación y la actualización en
+    una sola llamada; solo si no se actualizó nada se consulta el motivo.
+    """
+    logger.info("Service: Actualizando mascota ID: %s para user_id: %s", pet_id, user_id)
     
-    # 2. Preparar datos para actualizar (solo fecha, el resto ya viene filtrado del router)
+    # 1. Preparar datos para actualizar (solo fecha, el resto ya viene filtrado del router)
     data_to_update = update_data.copy()
     if data_to_update.get("birthdate") and isinstance(data_to_update["birthdate"], date):
         logger.debug("Service: Convirtiendo birthdate a ISO string en update")
         data_to_update["birthdate"] = data_to_update["birthdate"].isoformat()
+    # updated_at es la marca de agua de los ETags: siempre se avanza al actualizar
+    data_to_update["updated_at"] = datetime.now(timezone.utc).isoformat()
         
-    logger.debug(f"Service: Datos a actualizar: {data_to_update}")
+    log_payload(logger, "Service: Datos a actualizar: %s", data_to_update)
 
-    # 3. Ejecutar actualización
+    # 2. Ejecutar actualización restringida al propietario
     try:
-        response = db.table("pets").update(data_to_update).eq("id", str(pet_id)).execute()
-        logger.debug(f"Service: Respuesta update_existing_pet: {response}")
+        response = await execute_query(
+            db.table("pets").update(data_to_update).eq("id", str(pet_id)).eq("owner_id", str(user_id))
+        )
+        log_payload(logger, "Service: Respuesta update_existing_pet: %s", response)
 
         if hasattr(response, 'error') and response.error:
-            logger.error(f"Service: Error Supabase en update_existing_pet: {response.error}")
+            logger.error("Service: Error Supabase en update_existing_pet: %s", response.error)
             raise PetDatabaseError(f"Error al actualizar mascota: {response.error.message}")
         
         if hasattr(response, 'data') and response.data:
+            await invalidate_owner_cache(str(user_id), upserted=response.data)
             return response.data[0]
-        else:
-            logger.error("Service: Respuesta inesperada de Supabase al actualizar (sin data)")
-            raise PetDatabaseError("Respuesta inesperada del servicio de BD al actualizar")
 
+        # 3. Ninguna fila actualizada: no existe o no pertenece al usuario
+        await _raise_not_found_or_forbidden(db=db, pet_id=pet_id, user_id=user_id)
+
+    except (PetNotFoundError, PetAccessForbiddenError, PetDatabaseError) as e:
+        raise e
     except Exception as e:
-        logger.error(f"Service: Excepción inesperada en update_existing_pet: {e}", exc_info=True)
-        raise PetDatabaseError(f"Error inesperado al actualizar mascota: {e}") from e
+        logger.error("Service: Excepción inesperada en update_existing_pet: %s", e, exc_info=True)
+        raise _database_error(e, f"Error inesperado al actualizar mascota: {e}") from e
 
+@traced
 async def delete_pet_by_id(db: Client, pet_id: uuid.UUID, user_id: str) -> None:
-    """Elimina una mascota por ID, verificando la propiedad."""
-    logger.info(f"Service: Eliminando mascota ID: {pet_id} para user_id: {user_id}")
-    
-    # 1. Verificar propiedad (reutiliza la lógica de get_pet_by_id)
-    await get_pet_by_id(db=db, pet_id=pet_id, user_id=user_id)
-    # Si no lanza excepción, la mascota existe y pertenece al usuario
+    """
+    Elimina una mascota por ID, verificando la propiedad en la misma llamada
+    (filtro por `id` y `owner_id`).
+    """
+    logger.info("Service: Eliminando mascota ID: %s para user_id: %s", pet_id, user_id)
     
-    # 2. Ejecutar eliminación
     try:
-        response = db.table("pets").delete().eq("id", str(pet_id)).execute()
-        logger.debug(f"Service: Respuesta delete_pet_by_id: {response}")
+        response = await execute_query(
+            db.table("pets").delete().eq("id", str(pet_id)).eq("owner_id", str(user_id))
+        )
+        log_payload(logger, "Service: Respuesta delete_pet_by_id: %s", response)
 
         if hasattr(response, 'error') and response.error:
-            logger.error(f"Service: Error Supabase en delete_pet_by_id: {response.error}")
+            logger.error("Service: Error Supabase en delete_pet_by_id: %s", response.error)
             raise PetDatabaseError(f"Error al eliminar mascota: {response.error.message}")
-            
-        logger.info(f"Service: Mascota {pet_id} eliminada exitosamente.")
+
+        # El DELETE devuelve las filas eliminadas; si no hay ninguna averiguamos por qué
+        if not (hasattr(response, 'data') and response.data):
+            await _raise_not_found_or_forbidden(db=db, pet_id=pet_id, user_id=user_id)
+
+        await invalidate_owner_cache(str(user_id), deleted=[str(pet_id)])
+        logger.info("Service: Mascota %s eliminada exitosamente.", pet_id)
         # No retorna nada en caso de éxito
 
+    except (PetNotFoundError, PetAccessForbiddenError, PetDatabaseError) as e:
+        raise e
     except Exception as e:
-        logger.error(f"Service: Excepción inesperada en delete_pet_by_id: {e}", exc_info=True)
-        raise PetDatabaseError(f"Error inesperado al eliminar mascota: {e}") from e
+        logger.error("Service: Excepción inesperada en delete_pet_by_id: %s", e, exc_info=True)
+        raise _database_error(e, f"Error inesperado al eliminar mascota: {e}") from e
+
+# --- OPERACIONES EN LOTE ---
+# Cada operación hace una sola escritura en PostgREST para todo el lote (o una
+# por grupo de columnas o de cambios, ver `_group_by_columns` y `_group_by_patch`). El resultado es una lista
+# alineada con la entrada: la fila afectada, o la excepción de ese elemento
+# (PetNotFoundError, PetAccessForbiddenError o PetDatabaseError).
+BulkOutcome = Union[Dict[str, Any], Exception]
+
+# Máximo de ids por filtro `in` para no superar el largo de URL de PostgREST
+_IN_FILTER_CHUNK = 200
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _group_by_columns(rows: List[Tuple[int, Dict[str, Any]]]) -> List[List[Tuple[int, Dict[str, Any]]]]:
+    """
+    PostgREST exige que todas las filas de un insert/upsert múltiple tengan las
+    mismas columnas: agrupamos por conjunto de columnas (normalmente uno solo).
+    """
+    groups: Dict[Tuple[str, ...], List[Tuple[int, Dict[str, Any]]]] = {}
+    for index, row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append((index, row))
+    return list(groups.values())
+
+async def _classify_missing(db: Client, pet_ids: List[str]) -> Dict[str, Exception]:
+    """Para ids que no se encontraron entre las mascotas del usuario, distingue 404 de 403 en una consulta."""
+    existing = set()
+    for chunk in _chunks(pet_ids, _IN_FILTER_CHUNK):
+        response = await execute_query(db.table("pets").select("id").in_("id", chunk))
+        existing.update(str(row["id"]) for row in (response.data or []))
+    return {
+        pet_id: (
+            PetAccessForbiddenError("No tienes permiso para acceder/modificar esta mascota")
+            if pet_id in existing else PetNotFoundError(f"Mascota con ID {pet_id} no encontrada")
+        )
+        for pet_id in pet_ids
+    }
+
+@traced
+async def create_pets_bulk(db: Client, owner_id: str, pets_data: List[Dict[str, Any]]) -> List[BulkOutcome]:
+    """Crea varias mascotas con un insert multi-fila."""
+    logger.info("Service: Creando %s mascotas en lote para owner_id: %s", len(pets_data), owner_id)
+    outcomes: List[BulkOutcome] = [PetDatabaseError("Elemento no procesado")] * len(pets_data)
+    rows = [(index, {**data, "owner_id": owner_id}) for index, data in enumerate(pets_data)]
+
+    for group in _group_by_columns(rows):
+        try:
+            response = await execute_query(db.table("pets").insert([row for _, row in group]))
+            inserted = response.data or []
+            if len(inserted) != len(group):
+                raise PetDatabaseError("Respuesta inesperada del servicio de BD al crear en lote")
+            # PostgREST devuelve las filas en el mismo orden en que se insertaron
+            for (index, _), created in zip(group, inserted):
+                outcomes[index] = created
+        except Exception as e:
+            # El insert es atómico: si falla, falla todo el grupo
+            logger.error("Service: Error en insert en lote: %s", e, exc_info=True)
+            error = e if isinstance(e, PetDatabaseError) else _database_error(e, f"Error al crear mascotas: {e}")
+            for index, _ in group:
+                outcomes[index] = error
+
+    await invalidate_owner_cache(owner_id, upserted=[outcome for outcome in outcomes if isinstance(outcome, dict)])
+    return outcomes
+
+def _group_by_patch(patches: Dict[str, Dict[str, Any]]) -> List[Tuple[Dict[str, Any], List[str]]]:
+    """Agrupa los ids que reciben exactamente los mismos cambios (lo normal en un lote)."""
+    groups: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+    for pet_id, patch in patches.items():
+        key = json.dumps(patch, sort_keys=True, default=str)
+        groups.setdefault(key, (patch, []))[1].append(pet_id)
+    return list(groups.values())
+
+@traced
+async def update_pets_bulk(db: Client, owner_id: str, updates: List[Tuple[str, Dict[str, Any]]]) -> List[BulkOutcome]:
+    """
+    Actualiza varias mascotas del usuario. `updates` es una lista de (pet_id, campos).
+    Como `update_existing_pet`, escribe solo las columnas cambiadas con un UPDATE
+    filtrado por owner_id e ids: uno por cada conjunto distinto de cambios (los
+    grupos van en paralelo). Nunca un upsert, que pisaría escrituras concurrentes
+    y volvería a insertar mascotas borradas entre medias.
+    """
+    logger.info("Service: Actualizando %s mascotas en lote para owner_id: %s", len(updates), owner_id)
+    now = datetime.now(timezone.utc).isoformat()
+
+    # Un id repetido acumula sus cambios en orden
+    patches: Dict[str, Dict[str, Any]] = {}
+    for pet_id, data in updates:
+        patches[pet_id] = {**patches.get(pet_id, {}), **data}
+
+    async def write(patch: Dict[str, Any], pet_ids: List[str]) -> Dict[str, BulkOutcome]:
+        # updated_at es la marca de agua de los ETags y de /changes
+        data_to_update = {**patch, "updated_at": now}
+        try:
+            written: Dict[str, BulkOutcome] = {}
+            for chunk in _chunks(pet_ids, _IN_FILTER_CHUNK):
+                response = await execute_query(
+                    db.table("pets").update(data_to_update).eq("owner_id", owner_id).in_("id", chunk)
+                )
+                written.update({str(row["id"]): row for row in (response.data or [])})
+            return written
+        except Exception as e:
+            logger.error("Service: Error en update en lote: %s", e, exc_info=True)
+            error = _database_error(e, f"Error al actualizar mascotas: {e}")
+            return {pet_id: error for pet_id in pet_ids}
+
+    written: Dict[str, BulkOutcome] = {}
+    for result in await asyncio.gather(*(write(patch, pet_ids) for patch, pet_ids in _group_by_patch(patches))):
+        written.update(result)
 
-async def upload_photo_to_storage(db: Client, user_id: str, file: UploadFile) -> str:
-    """Sube un archivo a Supabase Storage y devuelve la URL pública."""
-    logger.info(f"Service: Subiendo foto para usuario {user_id}, archivo: {file.filename}, tipo: {file.content_type}")
-    
-    # Validaciones básicas (podrían ser más extensas)
-    if not file.content_type or not file.content_type.startswith("image/"):
-        logger.warning(f"Service: Intento de subir archivo no imagen: {file.content_type}")
-        raise StorageUploadError("Tipo de archivo no permitido. Solo se aceptan imágenes.")
-        
-    # Crear un nombre de archivo único para evitar colisiones
-    # Podríamos usar parte del user_id o pet_id si quisiéramos organizar por carpetas
-    file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg' # Extensión por defecto
-    unique_filename = f"user_{user_id}/{uuid.uuid4()}.{file_extension}"
-    
-    logger.debug(f"Service: Nombre de archivo único generado: {unique_filename}")
-    
-    # Leer el contenido del archivo. UploadFile tiene un método read()
     try:
-        contents = await file.read()
+        missing = await _classify_missing(db, [pet_id for pet_id in patches if pet_id not in written])
     except Exception as e:
-         logger.error(f"Service: Error al leer el archivo subido: {e}")
-         raise StorageUploadError("No se pudo leer el archivo enviado.")
-    finally:
-         await file.close() # Siempre cerrar el archivo
+        logger.error("Service: Error al clasificar mascotas no actualizadas: %s", e, exc_info=True)
+        error = _database_error(e, f"Error al actualizar mascotas: {e}")
+        missing = {pet_id: error for pet_id in patches if pet_id not in written}
+
+    await invalidate_owner_cache(owner_id, upserted=[row for row in written.values() if isinstance(row, dict)])
+    return [written.get(pet_id) or missing[pet_id] for pet_id, _ in updates]
+
+@traced
+async def delete_pets_bulk(db: Client, owner_id: str, pet_ids: List[str]) -> List[BulkOutcome]:
+    """Elimina varias mascotas del usuario con un DELETE filtrado por owner_id e ids."""
+    logger.info("Service: Eliminando %s mascotas en lote para owner_id: %s", len(pet_ids), owner_id)
+    unique_ids = list(dict.fromkeys(pet_ids))
+    try:
+        deleted: Dict[str, Dict[str, Any]] = {}
+        for chunk in _chunks(unique_ids, _IN_FILTER_CHUNK):
+            response = await execute_query(
+                db.table("pets").delete().eq("owner_id", owner_id).in_("id", chunk)
+            )
+            deleted.update({str(row["id"]): row for row in (response.data or [])})
+        missing = await _classify_missing(db, [pet_id for pet_id in unique_ids if pet_id not in deleted])
+    except Exception as e:
+        logger.error("Service: Error en delete en lote: %s", e, exc_info=True)
+        return [_database_error(e, f"Error al eliminar mascotas: {e}")] * len(pet_ids)
 
-    # Subir a Supabase Storage
+    await invalidate_owner_cache(owner_id, deleted=list(deleted))
+    return [deleted.get(pet_id) or missing[pet_id] for pet_id in pet_ids]
+
+@traced
+async def upload_photo_to_storage(db: Client, user_id: str, file: UploadFile) -> Dict[str, str]:
+    """
+    Sube una foto a Supabase Storage y devuelve las URLs públicas de sus
+    variantes ({"thumb": ..., "medium": ..., "full": ...}).
+    El archivo se procesa por bloques: se copia a un temporal en disco con un
+    tamaño máximo y el formato se decide por sus magic bytes (no por el
+    content_type declarado). Las variantes se generan en un pool de procesos
+    (sin EXIF, recomprimidas) y se suben en streaming desde disco.
+
+    El almacenamiento es direccionado por contenido: la carpeta de la foto es
+    el SHA-256 del original, así que volver a subir la misma foto no procesa
+    ni sube nada y devuelve las URLs existentes.
+    """
+    logger.info("Service: Subiendo foto para usuario %s, archivo: %s, tipo declarado: %s", user_id, file.filename, file.content_type)
+
+    spooled = None
+    files_to_upload: Dict[str, Tuple[str, str, str]] = {}
     storage_bucket = "pet_photos" # Nombre del bucket en Supabase
     try:
-        # La v1.x de supabase-py usa `storage.from_(bucket).upload(...)`
-        # Devuelve {'Key': 'path/to/file'} en éxito
-        # Necesitamos pasar bytes al método upload
-        upload_response = db.storage.from_(storage_bucket).upload(
-            path=unique_filename, 
-            file=contents, 
-            file_options={"content-type": file.content_type} # Especificar content type
-        )
-        logger.debug(f"Service: Respuesta de Supabase Storage (upload): {upload_response}")
-        
-        # Verificar si hubo error (en v1, el error se lanza como excepción)
-        # La respuesta exitosa no tiene un campo 'error' explícito
-        # Si llegamos aquí sin excepción, la subida fue probablemente exitosa
+        try:
+            spooled = await run_in_threadpool(
+                spool_upload_to_disk, file.file, settings.MAX_UPLOAD_SIZE_BYTES
+            )
+        except UnsupportedImageError as e:
+            logger.warning("Service: Intento de subir archivo no imagen (declarado: %s)", file.content_type)
+            raise StorageUploadError(str(e)) from e
+        except UploadTooLargeError as e:
+            logger.warning("Service: Foto demasiado grande para usuario %s", user_id)
+            raise PhotoTooLargeError(str(e)) from e
+        except Exception as e:
+            logger.error("Service: Error al leer el archivo subido: %s", e)
+            raise StorageUploadError("No se pudo leer el archivo enviado.") from e
+        finally:
+            await file.close() # Siempre cerrar el archivo
 
-        # Obtener la URL pública
-        public_url_response = db.storage.from_(storage_bucket).get_public_url(unique_filename)
-        logger.debug(f"Service: Respuesta de Supabase Storage (get_public_url): {public_url_response}")
-        
-        # En v1.x, get_public_url devuelve la URL directamente como string
-        if isinstance(public_url_response, str):
-            logger.info(f"Service: Foto subida exitosamente a: {public_url_response}")
-            return public_url_response
+        # Cada foto tiene su carpeta, nombrada por el hash de su contenido
+        photo_folder = f"user_{user_id}/{spooled.sha256}"
+        logger.debug("Service: Carpeta de la foto: %s (%s bytes, %s)", photo_folder, spooled.size, spooled.content_type)
+
+        # 1. ¿Ya existe? Una sola consulta de listado antes de gastar CPU y ancho de banda
+        try:
+            existing = await _existing_photo_variants(db, storage_bucket, photo_folder)
+        except Exception as e:
+            logger.warning("Service: No se pudo comprobar si la foto ya existe, se sube igualmente: %s", e)
+            existing = None
+        if existing:
+            logger.info("Service: Foto %s ya almacenada, se omite la subida", spooled.sha256)
+            return existing
+
+        # 2. Generar las variantes (thumb/medium/full) en el pool de procesos.
+        # Sin Pillow, o con formatos que no sabe decodificar (HEIC), se guarda el original.
+        files_to_upload = {"full": (spooled.path, spooled.content_type, spooled.extension)}
+        if image_processing.is_available():
+            try:
+                variant_paths = await image_processing.generate_variants(spooled.path)
+                files_to_upload = {
+                    name: (path, image_processing.VARIANT_CONTENT_TYPE, image_processing.VARIANT_EXTENSION)
+                    for name, path in variant_paths.items()
+                }
+            except image_processing.ImageProcessingError as e:
+                if spooled.content_type not in ("image/heic", "image/heif"):
+                    logger.warning("Service: Imagen no procesable para usuario %s: %s", user_id, e)
+                    raise StorageUploadError("La imagen está dañada o no se puede procesar.") from e
+                logger.info("Service: %s no soportado por Pillow, se guarda el original", spooled.content_type)
         else:
-            # Si no es string, algo falló al obtener la URL pública
-            logger.error(f"Service: No se pudo obtener la URL pública después de subir. Respuesta: {public_url_response}")
-            raise StorageUploadError("Archivo subido pero no se pudo obtener la URL pública.")
+            logger.warning("Service: Pillow no está instalado, se guarda la foto sin variantes")
 
-    except Exception as e:
-        # Capturar cualquier excepción durante la subida o la obtención de URL
-        logger.error(f"Service: Error durante la operación de Supabase Storage: {e}", exc_info=True)
-        # Podríamos intentar extraer un mensaje más específico del error si es posible
-        raise StorageUploadError(f"Error al interactuar con el almacenamiento: {e}") from e 
\ No newline at end of file
+        # 3. Subir a Supabase Storage: primero las variantes en paralelo y al
+        # final "full", que actúa de marca de foto completa para el paso 1
+        try:
+            storage_paths = {
+                name: f"{photo_folder}/{name}.{extension}"
+                for name, (_, _, extension) in files_to_upload.items()
+            }
+            secondary = [name for name in files_to_upload if name != "full"]
+            await asyncio.gather(*(
+                run_storage_call(
+                    _upload_file_from_disk, db, storage_bucket, storage_paths[name], *files_to_upload[name][:2],
+                    operation="storage_upload", idempotent=True,
+                )
+                for name in secondary
+            ))
+            # Rutas por contenido y x-upsert: repetir una subida es idempotente
+            await run_storage_call(
+                _upload_file_from_disk, db, storage_bucket, storage_paths["full"], *files_to_upload["full"][:2],
+                operation="storage_upload", idempotent=True,
+            )
+
+            # URLs públicas calculadas localmente (sin una llamada por archivo)
+            public_urls = {name: public_url(storage_bucket, path) for name, path in storage_paths.items()}
+            logger.info("Service: Foto subida exitosamente a: %s", public_urls['full'])
+            return public_urls
+
+        except StorageUploadError:
+            raise
+        except (ServiceUnavailableError, DeadlineExceededError) as e:
+            # Siempre 503, sin pasar por _database_error: el endpoint de fotos no
+            # espera un PetDatabaseError genérico (acabaría en un 500 sin detalle)
+            logger.error("Service: Storage no disponible: %s", e)
+            raise PetServiceUnavailableError(
+                "Servicio de almacenamiento no disponible temporalmente. Inténtalo de nuevo en unos segundos."
+            ) from e
+        except Exception as e:
+            # Capturar cualquier excepción durante la subida
+            logger.error("Service: Error durante la operación de Supabase Storage: %s", e, exc_info=True)
+            raise StorageUploadError(f"Error al interactuar con el almacenamiento: {e}") from e
+    finally:
+        if spooled is not None:
+            discard_spooled_file(spooled.path)
+        for local_path, _, _ in files_to_upload.values():
+            if spooled is None or local_path != spooled.path:
+                discard_spooled_file(local_path)
+
+@traced
+async def _existing_photo_variants(db: Client, bucket: str, folder: str) -> Optional[Dict[str, str]]:
+    """
+    Devuelve las URLs de las variantes ya almacenadas en `folder`, o None si
+    la foto no está completa (la variante "full" se sube siempre la última).
+    """
+    listing = await run_storage_call(
+        db.storage.from_(bucket).list, folder, operation="storage_list", idempotent=True
+    )
+    variants = {}
+    for item in listing or []:
+        name = item.get("name") or ""
+        variant, _, extension = name.partition(".")
+        if variant and extension:
+            variants[variant] = public_url(bucket, f"{folder}/{name}")
+    return variants if "full" in variants else None
+
+def _upload_file_from_disk(db: Client, bucket: str, path: str, local_path: str, content_type: str) -> Any:
+    """
+    Sube un archivo local a Storage. Se le pasa un archivo abierto (no bytes)
+    para que httpx lo envíe por bloques. Bloqueante: ejecutar en el pool.
+    """
+    with open(local_path, "rb") as local_file:
+        return db.storage.from_(bucket).upload(
+            path=path,
+            file=local_file,
+            file_options={
+                "content-type": content_type, # Content type detectado, no el declarado
+                # El contenido de una ruta no cambia nunca (va por hash): caché de un año
+                "cache-control": "31536000",
+                # Dos subidas simultáneas de la misma foto escriben los mismos bytes
+                "x-upsert": "true",
+            }
+        )
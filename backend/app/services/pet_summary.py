@@ -0,0 +1,112 @@
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+# --- RESUMEN POR PROPIETARIO (dashboard) ---
+# El agregado guarda, además de los contadores, los pocos campos de cada mascota
+# que los alimentan. Así una escritura se aplica restando la versión anterior de
+# la mascota y sumando la nueva, sin volver a leer la tabla. Todo es JSON
+# (sirve tal cual para la caché en Redis) y se trata como solo lectura:
+# `apply_changes` devuelve un agregado nuevo.
+#
+#   {"pets": {id: {"name", "species", "gender", "birthdate"}},
+#    "by_species": {especie: n}, "by_gender": {género: n}}
+
+SUMMARY_COLUMNS = ("id", "name", "species", "gender", "birthdate")
+
+# Clave para las mascotas sin género en `by_gender`
+UNSPECIFIED_GENDER = "No especificado"
+
+def _entry(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": row.get("name"),
+        "species": row.get("species"),
+        "gender": row.get("gender") or UNSPECIFIED_GENDER,
+        "birthdate": str(row["birthdate"])[:10] if row.get("birthdate") else None,
+    }
+
+def _add(counter: Counter, key: Any, delta: int) -> None:
+    counter[key] += delta
+    if counter[key] <= 0:
+        del counter[key]
+
+def empty_summary() -> Dict[str, Any]:
+    return {"pets": {}, "by_species": {}, "by_gender": {}}
+
+def apply_changes(
+    summary: Dict[str, Any], upserted: Iterable[Dict[str, Any]] = (), deleted: Iterable[str] = ()
+) -> Dict[str, Any]:
+    """
+    Devuelve el agregado con las escrituras aplicadas: `upserted` son filas
+    creadas o actualizadas (con al menos SUMMARY_COLUMNS) y `deleted` ids eliminados.
+    """
+    pets = dict(summary["pets"])
+    by_species = Counter(summary["by_species"])
+    by_gender = Counter(summary["by_gender"])
+
+    def remove(pet_id: str) -> None:
+        previous = pets.pop(pet_id, None)
+        if previous is not None:
+            _add(by_species, previous["species"], -1)
+            _add(by_gender, previous["gender"], -1)
+
+    for pet_id in deleted:
+        remove(str(pet_id))
+    for row in upserted:
+        pet_id = str(row["id"])
+        remove(pet_id)
+        entry = _entry(row)
+        pets[pet_id] = entry
+        _add(by_species, entry["species"], 1)
+        _add(by_gender, entry["gender"], 1)
+
+    return {**summary, "pets": pets, "by_species": dict(by_species), "by_gender": dict(by_gender)}
+
+def _next_birthday(birthdate: date, today: date) -> date:
+    for year in (today.year, today.year + 1):
+        try:
+            candidate = birthdate.replace(year=year)
+        except ValueError:
+            # Nacidas un 29 de febrero: en años no bisiestos lo celebran el 28
+            candidate = date(year, 2, 28)
+        if candidate >= today:
+            return candidate
+    return candidate
+
+def upcoming_birthdays(summary: Dict[str, Any], days: int, today: date) -> List[Dict[str, Any]]:
+    """Cumpleaños de hoy a `days` días vista, del más cercano al más lejano."""
+    upcoming = []
+    for pet_id, entry in summary["pets"].items():
+        if not entry["birthdate"]:
+            continue
+        try:
+            birthdate = date.fromisoformat(entry["birthdate"])
+        except ValueError:
+            continue
+        next_birthday = _next_birthday(birthdate, today)
+        days_until = (next_birthday - today).days
+        age = next_birthday.year - birthdate.year
+        if days_until <= days and age > 0:
+            upcoming.append({
+                "id": pet_id,
+                "name": entry["name"],
+                "species": entry["species"],
+                "birthdate": birthdate,
+                "next_birthday": next_birthday,
+                "days_until": days_until,
+                "age": age,
+            })
+    upcoming.sort(key=lambda item: (item["days_until"], item["name"] or ""))
+    return upcoming
+
+def _by_count(counts: Dict[str, int]) -> Dict[str, int]:
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+def render_summary(summary: Dict[str, Any], days: int, today: Optional[date] = None) -> Dict[str, Any]:
+    """Respuesta de GET /api/pets/summary (modelo PetSummary) a partir del agregado."""
+    return {
+        "total": len(summary["pets"]),
+        "by_species": _by_count(summary["by_species"]),
+        "by_gender": _by_count(summary["by_gender"]),
+        "upcoming_birthdays": upcoming_birthdays(summary, days, today or date.today()),
+    }
@@ -0,0 +1,221 @@
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union
+import codecs
+import csv
+import io
+import json
+import logging
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.serialization import dumps, fast_serialization_enabled
+from app.models.pet import Pet, PetCreate
+from app.services import pet_service
+from app.services.supabase_client import Client
+
+logger = logging.getLogger(__name__)
+
+# Exportación e importación de las mascotas de un propietario en streaming.
+# Ninguna de las dos direcciones mantiene el conjunto completo en memoria: la
+# exportación lee de Supabase página a página (keyset) y la importación parsea
+# el cuerpo de la petición a medida que llega y escribe en inserts por lotes.
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Columnas del CSV: los campos del modelo Pet, en su orden de declaración
+CSV_COLUMNS: List[str] = list(Pet.model_fields)
+
+# Campos que se aceptan al importar. id, owner_id y timestamps se ignoran, de
+# modo que un archivo exportado se puede volver a importar tal cual.
+IMPORT_FIELDS = set(PetCreate.model_fields)
+
+class ImportFormatError(Exception):
+    """El cuerpo de la importación no se puede leer (codificación o cabecera CSV)."""
+    pass
+
+# Un registro parseado: (número de línea, datos o mensaje de error de esa línea)
+ParsedRecord = Tuple[int, Union[Dict[str, Any], str]]
+
+def validation_message(error: ValidationError) -> str:
+    """Resume un ValidationError de Pydantic en una línea legible."""
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in item['loc']) or 'body'}: {item['msg']}" for item in error.errors()
+    )
+
+# --- EXPORTACIÓN ---
+def _export_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Misma representación que devuelve la API (response_model=Pet, o la fila
+    # tal cual en modo de serialización rápida)
+    if fast_serialization_enabled():
+        return row
+    return Pet.model_validate(row).model_dump(mode="json")
+
+def _ndjson_page(rows: List[Dict[str, Any]]) -> str:
+    return "".join(dumps(_export_row(row)).decode("utf-8") + "\n" for row in rows)
+
+def _csv_page(rows: List[Dict[str, Any]], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore", lineterminator="\n")
+    if header:
+        writer.writeheader()
+    for row in rows:
+        writer.writerow({key: ("" if value is None else value) for key, value in _export_row(row).items()})
+    return buffer.getvalue()
+
+async def open_export(db: Client, owner_id: str, export_format: str) -> AsyncIterator[str]:
+    """
+    Prepara la exportación y devuelve un iterador de fragmentos de texto.
+    La primera página se lee aquí, antes de empezar a responder, para que un
+    error de BD todavía pueda devolverse como código HTTP (PetDatabaseError).
+    """
+    pages = pet_service.iter_pets_by_owner(db, owner_id, page_size=settings.EXPORT_PAGE_SIZE)
+    try:
+        first_page = await pages.__anext__()
+    except StopAsyncIteration:
+        first_page = []
+
+    async def generate() -> AsyncIterator[str]:
+        exported = len(first_page)
+        if export_format == "csv":
+            yield _csv_page(first_page, header=True)
+        else:
+            yield _ndjson_page(first_page)
+        try:
+            async for page in pages:
+                exported += len(page)
+                yield _csv_page(page, header=False) if export_format == "csv" else _ndjson_page(page)
+        except Exception as e:
+            # La respuesta ya empezó: solo queda cortarla y dejar constancia
+            logger.error("Exportación interrumpida para owner_id %s tras %s filas: %s", owner_id, exported, e, exc_info=True)
+            raise
+        logger.info("Exportación completada para owner_id %s: %s filas (%s)", owner_id, exported, export_format)
+
+    return generate()
+
+# --- IMPORTACIÓN: PARSEO INCREMENTAL ---
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decodifica (UTF-8, con o sin BOM) y parte en líneas un flujo de bytes."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            lines = pending.split("\n")
+            # El último trozo puede ser una línea incompleta
+            pending = lines.pop()
+            for line in lines:
+                yield line.removesuffix("\r")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"El archivo no está codificado en UTF-8: {e}") from e
+    if pending:
+        yield pending.removesuffix("\r")
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """Un objeto JSON por línea; las líneas vacías se ignoran."""
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"JSON inválido: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "Cada línea debe ser un objeto JSON"
+            continue
+        yield line_number, record
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """
+    CSV con cabecera. Las celdas vacías se omiten (el campo queda sin valor).
+    Admite campos entre comillas con saltos de línea: un registro se da por
+    completo cuando sus comillas están cerradas.
+    """
+    header: List[str] = []
+    pending: List[str] = []
+    start_line = line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not pending:
+            start_line = line_number
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            continue
+        pending = []
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            yield start_line, f"CSV inválido: {e}"
+            continue
+        if not header:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) > len(header):
+            yield start_line, f"La fila tiene {len(values)} columnas y la cabecera {len(header)}"
+            continue
+        yield start_line, {name: value for name, value in zip(header, values) if value != ""}
+    if pending:
+        yield start_line, "CSV inválido: comillas sin cerrar al final del archivo"
+    if not header and line_number:
+        raise ImportFormatError("El CSV no tiene cabecera")
+
+# --- IMPORTACIÓN: ESCRITURA POR LOTES ---
+async def import_pets(db: Client, owner_id: str, records: AsyncIterator[ParsedRecord]) -> Dict[str, Any]:
+    """
+    Valida cada registro contra PetCreate y los inserta en lotes de
+    IMPORT_BATCH_SIZE con `create_pets_bulk`. Los registros inválidos no
+    detienen la importación: se cuentan y se informan (hasta
+    IMPORT_MAX_REPORTED_ERRORS) con su número de línea.
+    """
+    result: Dict[str, Any] = {"created": 0, "failed": 0, "errors": [], "completed": True}
+    batch: List[Dict[str, Any]] = []
+    batch_lines: List[int] = []
+
+    def record_error(line: int, message: str) -> None:
+        result["failed"] += 1
+        if len(result["errors"]) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            result["errors"].append({"line": line, "error": message})
+
+    async def flush() -> None:
+        outcomes = await pet_service.create_pets_bulk(db=db, owner_id=owner_id, pets_data=batch)
+        for line, outcome in zip(batch_lines, outcomes):
+            if isinstance(outcome, Exception):
+                record_error(line, str(outcome) or "Error interno")
+            else:
+                result["created"] += 1
+        batch.clear()
+        batch_lines.clear()
+
+    try:
+        async for line, record in records:
+            if isinstance(record, str):
+                record_error(line, record)
+                continue
+            try:
+                batch.append(PetCreate.model_validate(record).model_dump(mode="json", include=IMPORT_FIELDS))
+            except ValidationError as e:
+                record_error(line, validation_message(e))
+                continue
+            batch_lines.append(line)
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                await flush()
+    except ImportFormatError as e:
+        # Lo ya insertado se queda: se informa que la importación quedó a medias
+        result["completed"] = False
+        record_error(0, str(e))
+    if batch:
+        await flush()
+
+    logger.info(
+        "Importación para owner_id %s: %s creadas, %s con error", owner_id, result["created"], result["failed"]
+    )
+    return result
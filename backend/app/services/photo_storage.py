@@ -0,0 +1,109 @@
+from typing import BinaryIO, NamedTuple, Optional, Tuple
+import hashlib
+import logging
+import os
+import tempfile
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Firmas (magic bytes) de los formatos de imagen aceptados.
+# No confiamos en el content_type que declara el cliente: se decide por el contenido.
+# Cada entrada: (offset, firma, content_type, extensión)
+_IMAGE_SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (0, b"GIF87a", "image/gif", "gif"),
+    (0, b"GIF89a", "image/gif", "gif"),
+    (4, b"ftypheic", "image/heic", "heic"),
+    (4, b"ftypheix", "image/heic", "heic"),
+    (4, b"ftypmif1", "image/heif", "heif"),
+)
+
+# Bytes necesarios para identificar cualquiera de los formatos anteriores
+SNIFF_BYTES = 16
+
+class UnsupportedImageError(Exception):
+    """El archivo no es una imagen soportada."""
+    pass
+
+class UploadTooLargeError(Exception):
+    """El archivo supera MAX_UPLOAD_SIZE_BYTES."""
+    pass
+
+def sniff_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """Devuelve (content_type, extensión) según los primeros bytes, o None si no es una imagen soportada."""
+    # WEBP: "RIFF" + tamaño (4 bytes) + "WEBP"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    for offset, signature, content_type, extension in _IMAGE_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return content_type, extension
+    return None
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    content_type: str
+    extension: str
+    sha256: str
+
+def spool_upload_to_disk(source: BinaryIO, max_size: int) -> SpooledUpload:
+    """
+    Copia el archivo subido a un temporal en disco por bloques, sin cargarlo
+    entero en memoria. Identifica el formato por sus magic bytes, calcula el
+    SHA-256 del contenido al vuelo y corta en cuanto se supera `max_size`.
+    Es bloqueante: ejecutar en un thread.
+
+    El llamador debe borrar `path` con `discard_spooled_file`.
+    """
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    fd, path = tempfile.mkstemp(prefix="pet_photo_")
+    size = 0
+    digest = hashlib.sha256()
+    detected = None
+    head = b""
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                if detected is None:
+                    # El primer bloque puede ser más corto que SNIFF_BYTES
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES:
+                        detected = sniff_image_type(head)
+                        if detected is None:
+                            raise UnsupportedImageError("Tipo de archivo no permitido. Solo se aceptan imágenes.")
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"La foto supera el tamaño máximo de {max_size // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                target.write(chunk)
+        if detected is None:
+            # Archivo más pequeño que SNIFF_BYTES
+            detected = sniff_image_type(head)
+            if detected is None:
+                raise UnsupportedImageError("Tipo de archivo no permitido. Solo se aceptan imágenes.")
+        return SpooledUpload(path, size, detected[0], detected[1], digest.hexdigest())
+    except Exception:
+        discard_spooled_file(path)
+        raise
+
+def public_url(bucket: str, path: str) -> str:
+    """
+    URL pública de un objeto de un bucket público, calculada localmente con el
+    mismo formato que `storage.from_(bucket).get_public_url(path)`.
+    """
+    return f"{settings.SUPABASE_URL.rstrip('/')}/storage/v1/object/public/{bucket}/{path}"
+
+def discard_spooled_file(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("No se pudo eliminar el temporal %s: %s", path, e)
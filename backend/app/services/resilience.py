@@ -0,0 +1,202 @@
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+import logging
+import random
+import sys
+import time
+
+import anyio
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Capa de resiliencia para las llamadas a Supabase (PostgREST y Storage):
+#   - plazo por intento (SUPABASE_CALL_TIMEOUT / SUPABASE_STORAGE_TIMEOUT)
+#   - reintentos con backoff exponencial y jitter, solo para llamadas idempotentes
+#   - circuit breaker: tras varios fallos seguidos se falla al instante (503)
+#     en lugar de acumular peticiones esperando a un Supabase caído o lento
+#   - lecturas "hedged" opcionales: si la primera no responde en
+#     SUPABASE_HEDGE_DELAY segundos se lanza una segunda y gana la primera
+#
+# Solo cuentan como fallo los errores de infraestructura (red, plazos, 5xx).
+# Un error que responde la BD (constraint, fila inexistente...) no se
+# reintenta y para el breaker cuenta como éxito: Supabase está respondiendo.
+
+class ServiceUnavailableError(Exception):
+    """El circuit breaker está abierto: no se intenta la llamada."""
+    pass
+
+class DeadlineExceededError(TimeoutError):
+    """Un intento superó su plazo."""
+    pass
+
+# Códigos de PostgREST que indican que no pudo hablar con Postgres
+_POSTGREST_UNAVAILABLE_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+def is_transient(error: BaseException) -> bool:
+    """¿Es un fallo de infraestructura (reintentable, cuenta para el breaker)?"""
+    if isinstance(error, DeadlineExceededError):
+        return True
+    # httpx se importa con el cliente Supabase: si aún no está cargado, el
+    # error no puede venir de él (así este módulo no lo importa al arrancar)
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    # postgrest.APIError: `code` es el código PGRST/SQLSTATE o, si la respuesta
+    # no era JSON (p. ej. un 502 del gateway), el status HTTP
+    code = getattr(error, "code", None)
+    if code in _POSTGREST_UNAVAILABLE_CODES:
+        return True
+    # storage3.StorageException lleva el status en el dict de sus args
+    if error.args and isinstance(error.args[0], dict):
+        code = error.args[0].get("statusCode", code)
+    try:
+        return int(code) >= 500
+    except (TypeError, ValueError):
+        return False
+
+class CircuitBreaker:
+    """
+    Breaker clásico de tres estados. "closed": todo pasa. Tras
+    `failure_threshold` fallos seguidos pasa a "open" y rechaza llamadas
+    durante `reset_timeout` segundos; después pasa a "half_open" y deja pasar
+    una sola llamada de prueba, que lo cierra si va bien o lo reabre si falla.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.stats: Dict[str, int] = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Circuit breaker %s: cerrado de nuevo", self.name)
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                self.stats["opened"] += 1
+                logger.warning("Circuit breaker %s: abierto tras %s fallos seguidos", self.name, self._failures)
+            # Un fallo en half_open reinicia la espera
+            self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def retry_after(self) -> int:
+        """Segundos hasta la próxima prueba (para la cabecera Retry-After)."""
+        if self._opened_at is None:
+            return 0
+        return max(1, int(self.reset_timeout - (time.monotonic() - self._opened_at) + 0.999))
+
+class ResiliencePolicy:
+    """Aplica plazo, reintentos, breaker y hedging a una función asíncrona."""
+
+    def __init__(self, name: str, breaker: CircuitBreaker) -> None:
+        self.name = name
+        self.breaker = breaker
+        self.stats: Dict[str, int] = {"calls": 0, "retries": 0, "timeouts": 0, "hedged": 0, "hedge_wins": 0}
+
+    async def call(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        *,
+        idempotent: bool,
+        timeout: float,
+    ) -> T:
+        self.stats["calls"] += 1
+        retries = settings.SUPABASE_READ_RETRIES if idempotent else 0
+        hedge_delay = settings.SUPABASE_HEDGE_DELAY if idempotent else None
+
+        for attempt_number in range(retries + 1):
+            if not self.breaker.allow():
+                raise ServiceUnavailableError(f"Servicio {self.name} no disponible temporalmente")
+            try:
+                if hedge_delay:
+                    result = await self._hedged(attempt, timeout, hedge_delay)
+                else:
+                    result = await self._with_deadline(attempt, timeout)
+            except asyncio.CancelledError:
+                # Quien llamó se fue: si era la prueba del breaker, otra podrá hacerla
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt_number == retries:
+                    raise
+                self.stats["retries"] += 1
+                # Backoff exponencial con "full jitter"
+                delay = random.uniform(
+                    0, min(settings.SUPABASE_RETRY_MAX_DELAY, settings.SUPABASE_RETRY_BASE_DELAY * 2 ** attempt_number)
+                )
+                logger.warning("%s: intento %s fallido (%r), reintento en %.3fs", self.name, attempt_number + 1, e, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+        raise AssertionError("inalcanzable")
+
+    async def _with_deadline(self, attempt: Callable[[], Awaitable[T]], timeout: float) -> T:
+        try:
+            with anyio.fail_after(timeout):
+                return await attempt()
+        except TimeoutError as e:
+            self.stats["timeouts"] += 1
+            raise DeadlineExceededError(f"{self.name}: sin respuesta en {timeout}s") from e
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]], timeout: float, hedge_delay: float) -> T:
+        first = asyncio.ensure_future(self._with_deadline(attempt, timeout))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                # La primera va lenta: lanzamos una segunda y gana la que acabe bien antes
+                self.stats["hedged"] += 1
+                pending.add(asyncio.ensure_future(self._with_deadline(attempt, timeout)))
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,56 @@
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Coalescencia de lecturas concurrentes idénticas ("single-flight").
+
+    La primera llamada con una clave lanza `func` en su propia tarea; las que
+    llegan con la misma clave mientras sigue en curso esperan esa misma tarea y
+    reciben su resultado (o su excepción). Nada se guarda al terminar: para eso
+    está la caché. El resultado es compartido y debe tratarse como solo lectura.
+
+    Las claves deben identificar por completo la lectura (usuario, generación
+    de la caché, parámetros): así una escritura, que cambia la generación, no
+    se une a una lectura iniciada antes que ella.
+
+    La tarea no pertenece a ninguna petición: si quien la inició se cancela
+    (el cliente corta la conexión), las demás siguen esperándola sin problema.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        # calls: llamadas totales; executed: las que llegaron a ejecutar `func`;
+        # coalesced: las que se resolvieron con una ejecución ya en curso
+        self.stats: Dict[str, int] = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            logger.debug("SingleFlight %s: coalescida la lectura %s", self.name, key)
+        else:
+            self.stats["executed"] += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        # shield: cancelar a quien espera no cancela la lectura compartida
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marca la excepción como recuperada aunque todos los que esperaban se
+        # hayan cancelado, para que asyncio no avise de "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
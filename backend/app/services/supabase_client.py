@@ -1,42 +1,242 @@
-from supabase import create_client, Client
+from fastapi import HTTPException, status
+from app.core import metrics
 from app.core.config import settings
-# import httpx # No es necesario importar httpx aquí si no lo usamos explícitamente
+from app.core import tracing
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
+import asyncio
+import functools
+import threading
+import time
+import anyio
 import logging
 
+from app.services.resilience import CircuitBreaker, ResiliencePolicy
+
+# supabase (con postgrest, storage3, gotrue...) y httpx se importan al crear el
+# cliente, no al importar la app: en un arranque en frío ahorra ~250 ms antes
+# de poder atender peticiones. Para las anotaciones, `Client` es un alias.
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
+else:
+    Client = Any
+
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+def _build_pooled_session(session: "httpx.Client", timeout: float) -> "httpx.Client":
+    """
+    Crea un nuevo cliente httpx con la misma configuración que `session`
+    (base_url, headers) pero con límites de pool y keep-alive configurables y
+    el timeout indicado. supabase-py v1 no permite pasar `limits`, así que
+    reemplazamos la sesión que crea por defecto.
+    """
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+    )
+    # Conservamos la clase original (SyncClient de postgrest/storage3) porque
+    # añade el método `aclose` que usan esas librerías.
+    pooled = type(session)(
+        base_url=session.base_url,
+        headers=session.headers,
+        # El timeout de httpx acota cuánto sigue vivo un thread cuyo intento
+        # ya se abandonó por superar su plazo (ver services/resilience.py)
+        timeout=httpx.Timeout(timeout),
+        limits=limits,
+    )
+    session.close()
+    return pooled
+
 def get_supabase_client() -> Client:
     """Crea y retorna una instancia del cliente Supabase."""
+    if settings.SUPABASE_BACKEND == "memory":
+        # Sustituto en memoria para desarrollo local y benchmarks
+        from app.services.memory_backend import MemorySupabaseClient
+        logger.warning("SUPABASE_BACKEND=memory: los datos se guardan solo en memoria de este proceso")
+        return MemorySupabaseClient(settings.SUPABASE_URL, latency=settings.MEMORY_BACKEND_LATENCY)  # type: ignore[return-value]
+    from supabase import create_client
+
     try:
         # Usamos la inicialización más simple, que funcionó en la prueba
         supabase_client: Client = create_client(
             settings.SUPABASE_URL,
             settings.SUPABASE_KEY
         )
+        # PostgREST y Storage usan sesiones httpx separadas; ambas se comparten
+        # entre todos los threads del pool, así que ajustamos sus límites.
+        supabase_client.postgrest.session = _build_pooled_session(
+            supabase_client.postgrest.session, settings.SUPABASE_CALL_TIMEOUT
+        )
+        storage_session = _build_pooled_session(supabase_client.storage.session, settings.SUPABASE_STORAGE_TIMEOUT)
+        supabase_client.storage.session = storage_session
+        supabase_client.storage._client = storage_session
         logger.info("Cliente Supabase inicializado exitosamente (simple).")
         return supabase_client
     except Exception as e:
-        logger.error(f"Error al inicializar el cliente Supabase: {e}")
-        import traceback
-        traceback.print_exc() # Imprimir stacktrace para depuración
+        logger.exception("Error al inicializar el cliente Supabase: %s", e)
         raise ConnectionError(f"No se pudo inicializar el cliente Supabase: {e}") from e
 
-# Crear una instancia global del cliente para ser usada en la aplicación
-try:
-    supabase_client_instance: Client = get_supabase_client()
-except ConnectionError as e:
-    logger.critical(f"FALLO CRÍTICO: No se pudo crear la instancia del cliente Supabase al inicio: {e}")
-    # En un caso real, podríamos querer que la aplicación no inicie si no puede conectarse
-    # sys.exit(1) 
-    supabase_client_instance = None # O manejarlo de otra forma
+# Instancia del worker. Se crea en el lifespan de la app (una por worker, ya
+# dentro del proceso que atiende peticiones, también con gunicorn --preload)
+supabase_client_instance: Optional[Client] = None
+_client_initialized = False
+_client_lock = threading.Lock()
+
+def init_supabase_client() -> Optional[Client]:
+    """
+    Crea el cliente del worker una sola vez (bloqueante: importa supabase).
+    Si falla, las peticiones responderán 503.
+    """
+    global supabase_client_instance, _client_initialized
+    with _client_lock:
+        if _client_initialized:
+            return supabase_client_instance
+        try:
+            supabase_client_instance = get_supabase_client()
+        except ConnectionError as e:
+            logger.critical("FALLO CRÍTICO: No se pudo crear la instancia del cliente Supabase al inicio: %s", e)
+            supabase_client_instance = None
+        _client_initialized = True
+        return supabase_client_instance
+
+async def warm_up_supabase_client(client: Client, connections: int) -> None:
+    """
+    Abre `connections` conexiones keep-alive con consultas mínimas en paralelo,
+    para que las primeras peticiones no paguen el handshake TLS. Un fallo solo
+    se registra: el worker arranca igualmente.
+    """
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(execute_query(client.table("pets").select("id").limit(1), idempotent=True) for _ in range(connections)),
+        return_exceptions=True,
+    )
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        logger.warning("Calentamiento de Supabase: %s de %s consultas fallaron: %r", len(failures), connections, failures[0])
+    else:
+        logger.info("Calentamiento de Supabase: %s conexiones en %.3fs", connections, metrics.time_since(start))
+
+def close_supabase_client() -> None:
+    """Cierra las sesiones HTTP del cliente (al apagar, cuando ya no quedan peticiones)."""
+    global supabase_client_instance
+    client, supabase_client_instance = supabase_client_instance, None
+    if client is None:
+        return
+    for service in ("postgrest", "storage"):
+        session = getattr(getattr(client, service, None), "session", None)
+        if session is not None:
+            session.close()
+    logger.info("Sesiones del cliente Supabase cerradas")
 
 # Función para obtener la instancia (útil para dependencias en FastAPI)
 def get_db() -> Client:
+    if not _client_initialized:
+        # Petición que llega antes de que el lifespan termine de crear el
+        # cliente, o app sin lifespan (scripts, benchmarks, TestClient sin
+        # `with`). FastAPI ejecuta esta dependencia en un thread, así que
+        # esperar aquí no bloquea el event loop
+        init_supabase_client()
     if supabase_client_instance is None:
         # Si falló la inicialización al inicio, lanzamos un error aquí
         # para que las peticiones fallen apropiadamente.
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Servicio de base de datos no disponible. Contacte al administrador."
         )
-    return supabase_client_instance 
\ No newline at end of file
+    return supabase_client_instance
+
+# --- EJECUCIÓN NO BLOQUEANTE ---
+# supabase-py v1 solo ofrece un cliente síncrono. Para no bloquear el event loop
+# de uvicorn, cada llamada se ejecuta en el pool de threads de anyio, limitado
+# por un CapacityLimiter propio (así no compite con el resto de la app).
+_db_limiter: Optional[anyio.CapacityLimiter] = None
+
+def _get_db_limiter() -> anyio.CapacityLimiter:
+    # El limiter debe crearse dentro del event loop, por eso es perezoso
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = anyio.CapacityLimiter(settings.SUPABASE_MAX_CONCURRENCY)
+    return _db_limiter
+
+async def run_in_db_pool(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Ejecuta una llamada bloqueante al cliente Supabase en el pool de threads."""
+    if kwargs:
+        func = functools.partial(func, **kwargs)
+    # abandon_on_cancel: si se supera el plazo o el cliente corta, la petición
+    # no espera al thread (que termina solo, acotado por el timeout de httpx)
+    return await anyio.to_thread.run_sync(func, *args, limiter=_get_db_limiter(), abandon_on_cancel=True)
+
+# --- RESILIENCIA ---
+# Un breaker y una política por servicio: si Storage falla, las consultas a
+# PostgREST siguen funcionando y viceversa.
+postgrest_policy = ResiliencePolicy(
+    "postgrest",
+    CircuitBreaker(
+        "postgrest", settings.SUPABASE_BREAKER_FAILURE_THRESHOLD, settings.SUPABASE_BREAKER_RESET_SECONDS
+    ),
+)
+storage_policy = ResiliencePolicy(
+    "storage",
+    CircuitBreaker(
+        "storage", settings.SUPABASE_BREAKER_FAILURE_THRESHOLD, settings.SUPABASE_BREAKER_RESET_SECONDS
+    ),
+)
+
+for _policy in (postgrest_policy, storage_policy):
+    metrics.supabase_resilience_events.add_source(
+        lambda policy=_policy: {**policy.stats, **policy.breaker.stats}, _policy.name
+    )
+
+_CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _collect_circuit_state() -> None:
+    for policy in (postgrest_policy, storage_policy):
+        metrics.supabase_circuit_state.set(_CIRCUIT_STATES[policy.breaker.state], policy.name)
+
+metrics.registry.add_collector(_collect_circuit_state)
+
+# Operación de PostgREST según el método HTTP del query builder
+_QUERY_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+def _query_operation(query: Any) -> str:
+    method = getattr(query, "http_method", None)
+    if method == "POST" and "merge-duplicates" in str(getattr(query, "headers", {}).get("Prefer", "")):
+        return "upsert"
+    return _QUERY_OPERATIONS.get(method, "other")
+
+async def _timed(operation: str, call: Callable[[], Any], target: Optional[str] = None) -> Any:
+    """Registra latencia, errores y un span de traza de una llamada a Supabase por operación."""
+    start = time.perf_counter()
+    try:
+        with tracing.start_span(f"supabase.{operation}", {"db.target": target} if target else None):
+            return await call()
+    except Exception as e:
+        metrics.supabase_request_errors.inc(operation, type(e).__name__)
+        raise
+    finally:
+        metrics.supabase_request_duration.observe(metrics.time_since(start), operation)
+
+async def execute_query(query: Any, idempotent: Optional[bool] = None) -> Any:
+    """
+    Ejecuta un query builder de postgrest (`db.table(...)...`) sin bloquear
+    el event loop y devuelve su respuesta (`.data`, `.count`).
+    Las lecturas (GET) se consideran idempotentes y se reintentan.
+    """
+    if idempotent is None:
+        idempotent = getattr(query, "http_method", None) in ("GET", "HEAD")
+    return await _timed(_query_operation(query), lambda: postgrest_policy.call(
+        lambda: run_in_db_pool(query.execute), idempotent=idempotent, timeout=settings.SUPABASE_CALL_TIMEOUT
+    ), target=getattr(query, "path", None))
+
+async def run_storage_call(
+    func: Callable[..., T], *args: Any, operation: str = "storage", idempotent: bool = False
+) -> T:
+    """Ejecuta una llamada bloqueante a Supabase Storage con la política de Storage."""
+    return await _timed(operation, lambda: storage_policy.call(
+        lambda: run_in_db_pool(func, *args), idempotent=idempotent, timeout=settings.SUPABASE_STORAGE_TIMEOUT
+    ))
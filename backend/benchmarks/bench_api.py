@@ -0,0 +1,209 @@
+"""
+Benchmark de la API de mascotas contra el backend en memoria.
+
+Lanza la app en el mismo proceso (sin red ni uvicorn) con SUPABASE_BACKEND=memory,
+siembra mascotas para varios usuarios y mide, por endpoint de /api/pets,
+peticiones por segundo y percentiles de latencia con N peticiones concurrentes.
+Con --latency cada llamada a "Supabase" espera esos milisegundos, para ver
+cómo se comporta la API cuando la base de datos está lejos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_api [--requests 500] [--concurrency 20] [--latency 5]
+                                   [--cache memory|none] [--only list,read] [--json resultados.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+# El backend y la caché se eligen al importar la app: los argumentos se leen antes
+parser = argparse.ArgumentParser(description="Benchmark de /api/pets con el backend en memoria")
+parser.add_argument("--requests", type=int, default=500, help="Peticiones por escenario")
+parser.add_argument("--concurrency", type=int, default=20, help="Peticiones en paralelo")
+parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por llamada a Supabase, en ms")
+parser.add_argument("--users", type=int, default=20, help="Usuarios distintos")
+parser.add_argument("--pets", type=int, default=50, help="Mascotas por usuario")
+parser.add_argument("--cache", choices=["memory", "none"], default="memory", help="Backend de la caché de lecturas")
+parser.add_argument("--only", default="", help="Escenarios a ejecutar, separados por comas")
+parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo (para comparar entre versiones)")
+args = parser.parse_args()
+
+os.environ["SUPABASE_BACKEND"] = "memory"
+os.environ["MEMORY_BACKEND_LATENCY"] = str(args.latency / 1000)
+os.environ["CACHE_BACKEND"] = args.cache
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Valores por defecto para poder ejecutar el benchmark sin un .env real
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+
+import httpx
+from jose import jwt
+
+from app.core.config import settings
+from app.main import app
+from app.services.pet_service import encode_watermark
+from app.services.supabase_client import get_db
+
+
+def make_token(user_id: str) -> str:
+    payload = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600, "role": "authenticated"}
+    return jwt.encode(payload, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+
+def seed(owners: List[str], pets_per_user: int) -> Dict[str, List[str]]:
+    """Inserta las mascotas directamente en el backend en memoria. Devuelve los ids por usuario."""
+    db = get_db()
+    pets: Dict[str, List[str]] = {}
+    for owner_id in owners:
+        rows = [
+            {"owner_id": owner_id, "name": f"Mascota {i}", "species": "Perro" if i % 2 else "Gato", "breed": "Mestizo", "birthdate": "2020-05-17"}
+            for i in range(pets_per_user)
+        ]
+        response = db.table("pets").insert(rows).execute()
+        pets[owner_id] = [row["id"] for row in response.data]
+    return pets
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, build: Callable[[int], Dict[str, Any]], total: int, concurrency: int
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in counter:
+            request = build(index)
+            start = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1e3,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p95_ms": percentile(latencies, 0.95) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+    }
+
+
+async def main() -> None:
+    owners = [str(uuid.uuid4()) for _ in range(args.users)]
+    pets = seed(owners, args.pets)
+    # Mascotas aparte para el escenario de borrado (una por petición)
+    deletable = seed(owners, -(-args.requests // args.users))
+    tokens = {owner: {"Authorization": f"Bearer {make_token(owner)}"} for owner in owners}
+    delete_queue = [(owner, pet_id) for owner, ids in deletable.items() for pet_id in ids]
+    rng = random.Random(42)
+    # Sincronización incremental de un cliente al día (marca de agua de ahora)
+    now = datetime.now(timezone.utc).isoformat()
+    recent_watermark = encode_watermark((now, str(uuid.UUID(int=0))), (now, str(uuid.UUID(int=0))))
+
+    def any_pet() -> Dict[str, str]:
+        owner = rng.choice(owners)
+        return {"owner": owner, "pet_id": rng.choice(pets[owner])}
+
+    def list_pets(_: int) -> Dict[str, Any]:
+        owner = rng.choice(owners)
+        return {"method": "GET", "url": "/api/pets/?limit=20", "headers": tokens[owner]}
+
+    def list_fields(_: int) -> Dict[str, Any]:
+        owner = rng.choice(owners)
+        return {"method": "GET", "url": "/api/pets/?limit=20&fields=id,name,photo_url", "headers": tokens[owner]}
+
+    def read_pet(_: int) -> Dict[str, Any]:
+        target = any_pet()
+        return {"method": "GET", "url": f"/api/pets/{target['pet_id']}", "headers": tokens[target["owner"]]}
+
+    def create_pet(index: int) -> Dict[str, Any]:
+        owner = rng.choice(owners)
+        body = {"name": f"Nueva {index}", "species": "Gato", "birthdate": "2021-03-04"}
+        return {"method": "POST", "url": "/api/pets/", "json": body, "headers": tokens[owner]}
+
+    def update_pet(index: int) -> Dict[str, Any]:
+        target = any_pet()
+        return {"method": "PUT", "url": f"/api/pets/{target['pet_id']}", "json": {"name": f"Editada {index}"}, "headers": tokens[target["owner"]]}
+
+    def delete_pet(index: int) -> Dict[str, Any]:
+        owner, pet_id = delete_queue[index]
+        return {"method": "DELETE", "url": f"/api/pets/{pet_id}", "headers": tokens[owner]}
+
+    def summary(_: int) -> Dict[str, Any]:
+        owner = rng.choice(owners)
+        return {"method": "GET", "url": "/api/pets/summary", "headers": tokens[owner]}
+
+    def search(_: int) -> Dict[str, Any]:
+        owner = rng.choice(owners)
+        return {"method": "GET", "url": f"/api/pets/search?q={rng.choice(['mascota 1', 'perro', 'gato mest', 'mascta'])}&limit=20", "headers": tokens[owner]}
+
+    def changes(_: int) -> Dict[str, Any]:
+        owner = rng.choice(owners)
+        return {"method": "GET", "url": "/api/pets/changes", "params": {"since": recent_watermark}, "headers": tokens[owner]}
+
+    def export_pets(_: int) -> Dict[str, Any]:
+        owner = rng.choice(owners)
+        return {"method": "GET", "url": "/api/pets/export?format=ndjson", "headers": tokens[owner]}
+
+    scenarios = {
+        "list": list_pets,
+        "list_fields": list_fields,
+        "read": read_pet,
+        "create": create_pet,
+        "update": update_pet,
+        "delete": delete_pet,
+        "summary": summary,
+        "search": search,
+        "changes": changes,
+        "export": export_pets,
+    }
+    selected = [name for name in args.only.split(",") if name] or list(scenarios)
+    unknown = set(selected) - set(scenarios)
+    if unknown:
+        sys.exit(f"Escenarios desconocidos: {', '.join(sorted(unknown))}. Disponibles: {', '.join(scenarios)}")
+
+    print(
+        f"Peticiones: {args.requests}  Concurrencia: {args.concurrency}  Latencia simulada: {args.latency} ms  "
+        f"Caché: {args.cache}  Usuarios: {args.users} x {args.pets} mascotas"
+    )
+    print(f"{'escenario':<12} {'req/s':>9} {'media':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errores':>8}")
+    results: Dict[str, Dict[str, float]] = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for name in selected:
+            total = min(args.requests, len(delete_queue)) if name == "delete" else args.requests
+            result = await run_scenario(client, scenarios[name], total, args.concurrency)
+            results[name] = result
+            print(
+                f"{name:<12} {result['rps']:9.1f} {result['mean_ms']:7.2f}ms {result['p50_ms']:7.2f}ms "
+                f"{result['p95_ms']:7.2f}ms {result['p99_ms']:7.2f}ms {result['errors']:8d}"
+            )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as output:
+            json.dump({"params": vars(args), "results": results}, output, indent=2)
+        print(f"Resultados guardados en {args.json_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Benchmark del coste por petición de la autenticación (get_current_user).
+
+Compara tres caminos sobre el mismo token:
+  1. jose + Pydantic en cada petición (comportamiento anterior)
+  2. Verificador HS256 directo (fallo de caché)
+  3. Hit en la caché de tokens verificados
+
+Uso (desde backend/):
+    python -m benchmarks.bench_auth [iteraciones]
+"""
+import os
+import sys
+import time
+
+# Valores por defecto para poder ejecutar el benchmark sin un .env real
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+from app.core import auth
+from app.core.config import settings
+
+
+def make_token() -> str:
+    payload = {
+        "sub": "146f3e41-772b-4f02-ad04-5e679e386a90",
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+        "role": "authenticated",
+        "email": "bench@example.com",
+    }
+    return jwt.encode(payload, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+
+def run_sync(coro):
+    """Ejecuta una corrutina que no suspende (get_current_user no hace I/O) sin event loop."""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("La corrutina se suspendió de forma inesperada")
+
+
+def bench(label: str, func, iterations: int) -> float:
+    func()  # calentamiento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    per_call_us = (time.perf_counter() - start) / iterations * 1e6
+    print(f"{label:<40} {per_call_us:10.2f} µs/petición")
+    return per_call_us
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    token = make_token()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    def legacy():
+        payload = jwt.decode(token, settings.SUPABASE_JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+        token_data = auth.TokenPayload(**payload)
+        return {"id": token_data.sub, **payload}
+
+    def cache_miss():
+        auth.token_cache.clear()
+        return run_sync(auth.get_current_user(credentials))
+
+    def cache_hit():
+        return run_sync(auth.get_current_user(credentials))
+
+    print(f"Iteraciones: {iterations}")
+    before = bench("jose.decode + TokenPayload (antes)", legacy, iterations)
+    bench("get_current_user, fallo de caché", cache_miss, iterations)
+    after = bench("get_current_user, hit de caché", cache_hit, iterations)
+    print(f"Aceleración en hit de caché: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
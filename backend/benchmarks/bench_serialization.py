@@ -0,0 +1,95 @@
+"""
+Benchmark de la serialización de un listado de mascotas.
+
+Compara, sobre las mismas filas tal como las devuelve PostgREST:
+  1. response_model=List[Pet] + JSONResponse (camino por defecto de FastAPI)
+  2. RESPONSE_SERIALIZATION=fast con RESPONSE_VALIDATE_FAST (depuración)
+  3. RESPONSE_SERIALIZATION=fast (filas codificadas directamente)
+
+Uso (desde backend/):
+    python -m benchmarks.bench_serialization [filas] [iteraciones]
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+# Valores por defecto para poder ejecutar el benchmark sin un .env real
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core import serialization
+from app.core.config import settings
+from app.models.pet import Pet
+
+
+def make_rows(count: int) -> List[dict]:
+    """Filas con la forma exacta de la respuesta de PostgREST (todo strings)."""
+    owner_id = str(uuid.uuid4())
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "owner_id": owner_id,
+            "name": f"Mascota {i}",
+            "species": "Perro" if i % 2 else "Gato",
+            "breed": "Mestizo",
+            "birthdate": "2020-05-17",
+            "gender": "Hembra",
+            "photo_url": f"https://example.supabase.co/storage/v1/object/public/pet-photos/user_x/{i}/full.webp",
+            "created_at": (base + timedelta(minutes=i)).isoformat(),
+            "updated_at": None,
+        }
+        for i in range(count)
+    ]
+
+
+def bench(label: str, func, iterations: int) -> float:
+    func()  # calentamiento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    per_call_ms = (time.perf_counter() - start) / iterations * 1e3
+    print(f"{label:<48} {per_call_ms:9.3f} ms/respuesta")
+    return per_call_ms
+
+
+def main() -> None:
+    rows_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rows = make_rows(rows_count)
+    field = create_response_field(name="Response_read_pets", type_=List[Pet])
+    loop = asyncio.new_event_loop()
+
+    def model_path():
+        # Lo mismo que hace FastAPI con response_model: validar, volcar y codificar
+        content = loop.run_until_complete(serialize_response(field=field, response_content=rows))
+        return JSONResponse(content).body
+
+    def fast_validated():
+        settings.RESPONSE_VALIDATE_FAST = True
+        return serialization.fast_response(rows, Pet, many=True).body
+
+    def fast():
+        settings.RESPONSE_VALIDATE_FAST = False
+        return serialization.fast_response(rows, Pet, many=True).body
+
+    encoder = "orjson" if serialization.orjson is not None else "json estándar"
+    print(f"Filas: {rows_count}  Iteraciones: {iterations}  Codificador rápido: {encoder}")
+    before = bench("response_model=List[Pet] + JSONResponse", model_path, iterations)
+    bench("fast + RESPONSE_VALIDATE_FAST", fast_validated, iterations)
+    after = bench("fast", fast, iterations)
+    print(f"Aceleración: x{before / after:.1f}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark del arranque en frío de la API.
+
+Lanza varias veces un intérprete nuevo que importa app.main, arranca el
+lifespan y atiende dos peticiones GET /api/pets/ (llamando a la app ASGI
+directamente, sin servidor ni cliente HTTP que sumen su propio arranque).
+Informa la mediana de cada fase:
+  - intérprete: desde lanzar el proceso hasta que empieza el script
+  - import: `import app.main`
+  - lifespan: hasta que el worker puede aceptar peticiones
+  - 1ª petición / 2ª petición: la primera incluye crear el cliente si aún no está
+  - total: desde lanzar el proceso hasta la primera respuesta
+
+Por defecto usa el backend en memoria (SUPABASE_BACKEND=memory) para que el
+resultado no dependa de la red; --latency simula la de Supabase.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_startup [--runs 5] [--latency 0] [--backend memory|supabase] [--importtime 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from jose import jwt
+
+# Se ejecuta en cada proceso hijo. Solo usa la librería estándar antes de
+# importar la app, para no sumar imports ajenos a la medición.
+CHILD = r"""
+import time
+started = time.time()
+import asyncio, json, os, sys
+
+async def request(app, path, token):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = None
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+    await app(scope, receive, send)
+    return status
+
+async def main():
+    t0 = time.perf_counter()
+    from app.main import app
+    t1 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        t2 = time.perf_counter()
+        first = await request(app, "/api/pets/", os.environ["BENCH_TOKEN"])
+        t3 = time.perf_counter()
+        first_done = time.time()
+        second = await request(app, "/api/pets/", os.environ["BENCH_TOKEN"])
+        t4 = time.perf_counter()
+    print(json.dumps({
+        "started": started, "first_done": first_done, "import": t1 - t0, "lifespan": t2 - t1,
+        "first_request": t3 - t2, "second_request": t4 - t3, "statuses": [first, second],
+    }))
+
+asyncio.run(main())
+"""
+
+PHASES = [
+    ("intérprete", "interpreter"),
+    ("import app.main", "import"),
+    ("lifespan", "lifespan"),
+    ("1ª petición", "first_request"),
+    ("2ª petición", "second_request"),
+    ("total hasta 1ª respuesta", "total"),
+]
+
+
+def child_env(args: argparse.Namespace, token: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "https://example.supabase.co")
+    env.setdefault("SUPABASE_KEY", "bench.bench.bench")
+    env.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["SUPABASE_BACKEND"] = args.backend
+    env["MEMORY_BACKEND_LATENCY"] = str(args.latency / 1000)
+    env["BENCH_TOKEN"] = token
+    return env
+
+
+def run_once(env: dict) -> dict:
+    spawned = time.time()
+    result = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"El proceso hijo falló:\n{result.stderr}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["interpreter"] = timings["started"] - spawned
+    timings["total"] = timings["first_done"] - spawned
+    return timings
+
+
+def show_importtime(env: dict, top: int) -> None:
+    """Los `top` módulos con más tiempo de import acumulado (python -X importtime)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], env=env, capture_output=True, text=True)
+    rows = []
+    # Formato: "import time: <self us> | <cumulative us> | <módulo>"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.strip()))
+    print("\nMódulos con más tiempo de import acumulado:")
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Arranque en frío de la API")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos a lanzar (se informa la mediana)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por llamada a Supabase, en ms")
+    parser.add_argument("--backend", choices=["memory", "supabase"], default="memory", help="Backend de datos")
+    parser.add_argument("--importtime", type=int, default=0, help="Muestra los N imports más lentos")
+    args = parser.parse_args()
+
+    secret = os.environ.get("SUPABASE_JWT_SECRET", "bench-secret")
+    payload = {"sub": "146f3e41-772b-4f02-ad04-5e679e386a90", "aud": "authenticated", "exp": int(time.time()) + 3600}
+    env = child_env(args, jwt.encode(payload, secret, algorithm="HS256"))
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    statuses = {tuple(run["statuses"]) for run in runs}
+    print(f"Procesos: {args.runs}  Backend: {args.backend}  Latencia simulada: {args.latency} ms  Estados: {sorted(statuses)}")
+    for label, key in PHASES:
+        values = [run[key] * 1000 for run in runs]
+        print(f"{label:<26} {statistics.median(values):8.1f} ms  (min {min(values):.1f}, max {max(values):.1f})")
+
+    if args.importtime:
+        show_importtime(env, args.importtime)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Configuración de gunicorn para producción (Linux/macOS).
+
+Uso (desde backend/):
+    gunicorn -c gunicorn_conf.py app.main:app
+
+El proceso maestro importa la app una sola vez (preload) y hace fork de los
+workers uvicorn, que comparten en memoria el código ya cargado. Cada worker
+crea su cliente Supabase y calienta sus conexiones en el lifespan de la app.
+Al recibir SIGTERM, gunicorn deja de aceptar conexiones, espera hasta
+`graceful_timeout` a las peticiones en curso y luego se ejecuta el cierre del
+lifespan (sesiones HTTP, pool de imágenes, caché, logs).
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Un worker por núcleo: cada uno tiene su event loop y su pool de threads para Supabase
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+preload_app = True
+
+# Segundos que un worker puede estar sin responder al maestro antes de reiniciarse
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Algo más que el keep-alive habitual de un balanceador, para que cierre él primero
+keepalive = int(os.getenv("KEEPALIVE_TIMEOUT", "75"))
+
+# Reinicia cada worker tras N peticiones (con algo de azar para no reiniciarlos
+# todos a la vez) y acota así el crecimiento de memoria; 0 lo desactiva
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# La app escribe sus propios logs de acceso (estructurados, con request_id)
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server):
+    # La app importa supabase al crear el cliente (en el lifespan de cada
+    # worker). Importarlo en el maestro hace que los workers lo hereden ya
+    # cargado y compartan esa memoria, como el resto de la app precargada
+    import supabase  # noqa: F401
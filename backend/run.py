@@ -1,5 +1,7 @@
 import uvicorn
 import os
+import shutil
+import sys
 from dotenv import load_dotenv
 
 if __name__ == "__main__":
@@ -11,6 +13,28 @@ if __name__ == "__main__":
     # Obtener configuración del host y puerto
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", "8000"))
+    # Modo producción con `python run.py --prod` o ENVIRONMENT=production
+    production = "--prod" in sys.argv or os.getenv("ENVIRONMENT") == "production"
+
+    if production:
+        gunicorn = shutil.which("gunicorn")
+        if gunicorn and os.name == "posix":
+            # Varios workers con la app precargada (ver gunicorn_conf.py)
+            print(f"Iniciando servidor de producción (gunicorn) en {host}:{port}...")
+            os.execv(gunicorn, [gunicorn, "-c", "gunicorn_conf.py", "app.main:app"])
+        # Sin gunicorn (p. ej. Windows): varios workers uvicorn, sin precarga
+        workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+        print(f"Iniciando servidor de producción (uvicorn, {workers} workers) en {host}:{port}...")
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=port,
+            workers=workers,
+            timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+            log_level="info",
+        )
+        sys.exit(0)
+
     
     print(f"Iniciando servidor en {host}:{port}...")
     
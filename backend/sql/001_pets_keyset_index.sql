@@ -0,0 +1,5 @@
+-- Índice para la paginación por cursor de GET /api/pets/
+-- Cubre el filtro por propietario y el orden (created_at, id), de modo que
+-- cada página es un recorrido acotado del índice sin importar su posición.
+create index if not exists pets_owner_created_at_id_idx
+    on public.pets (owner_id, created_at, id);
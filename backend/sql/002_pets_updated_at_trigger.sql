@@ -0,0 +1,16 @@
+-- Mantiene updated_at al día aunque la fila se modifique fuera de la API
+-- (panel de Supabase, scripts). Los ETags de GET /api/pets/ dependen de él.
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists pets_set_updated_at on public.pets;
+create trigger pets_set_updated_at
+    before update on public.pets
+    for each row execute function public.set_updated_at();
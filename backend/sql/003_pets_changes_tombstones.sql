@@ -0,0 +1,73 @@
+-- Sincronización incremental (GET /api/pets/changes?since=).
+--
+-- 1. updated_at pasa a ser la marca de agua de cada fila: también se fija al
+--    insertar (antes quedaba en null hasta la primera actualización), así los
+--    cambios se leen con un solo filtro y orden por (updated_at, id).
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists pets_set_updated_at on public.pets;
+create trigger pets_set_updated_at
+    before insert or update on public.pets
+    for each row execute function public.set_updated_at();
+
+update public.pets set updated_at = created_at where updated_at is null;
+
+create index if not exists pets_owner_updated_at_id_idx
+    on public.pets (owner_id, updated_at, id);
+
+-- 2. Las mascotas se borran de verdad: cada borrado deja una lápida con la
+--    que los clientes retiran la mascota de su copia local.
+create table if not exists public.pet_tombstones (
+    pet_id uuid primary key,
+    owner_id uuid not null,
+    deleted_at timestamptz not null default now()
+);
+
+create index if not exists pet_tombstones_owner_deleted_at_idx
+    on public.pet_tombstones (owner_id, deleted_at, pet_id);
+
+-- PostgREST expone el esquema public a anon y authenticated: con RLS y solo
+-- una política de lectura, cada usuario ve sus propias lápidas y nadie puede
+-- crearlas ni borrarlas desde la API (las escribe el trigger de abajo).
+alter table public.pet_tombstones enable row level security;
+
+drop policy if exists "pet_tombstones_select_own" on public.pet_tombstones;
+create policy "pet_tombstones_select_own"
+    on public.pet_tombstones
+    for select
+    using (owner_id = auth.uid());
+
+-- security definer: el trigger escribe aunque quien borra no tenga permisos
+-- de escritura sobre pet_tombstones
+create or replace function public.record_pet_tombstone()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    insert into public.pet_tombstones (pet_id, owner_id, deleted_at)
+    values (old.id, old.owner_id, now())
+    on conflict (pet_id) do update set owner_id = excluded.owner_id, deleted_at = excluded.deleted_at;
+    return old;
+end;
+$$;
+
+drop trigger if exists pets_record_tombstone on public.pets;
+create trigger pets_record_tombstone
+    after delete on public.pets
+    for each row execute function public.record_pet_tombstone();
+
+-- Las lápidas solo hacen falta mientras algún cliente pueda sincronizar desde
+-- antes del borrado: la API rechaza (410) marcas de agua más antiguas que
+-- TOMBSTONE_RETENTION_DAYS. Con pg_cron, por ejemplo:
+--   select cron.schedule('purge-pet-tombstones', '0 4 * * *',
+--     $$delete from public.pet_tombstones where deleted_at < now() - interval '30 days'$$);
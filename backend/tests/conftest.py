@@ -0,0 +1,57 @@
+import os
+import time
+import uuid
+
+import pytest
+from jose import jwt
+
+# Antes de importar la app: backend de datos en memoria (app/services/memory_backend.py)
+# y un secreto de JWT propio para firmar los tokens de prueba
+os.environ.update(
+    SUPABASE_BACKEND="memory",
+    SUPABASE_URL="https://tests.supabase.co",
+    SUPABASE_KEY="tests.tests.tests",
+    SUPABASE_JWT_SECRET="tests-secret",
+    CACHE_BACKEND="memory",
+    CHANGES_SAFETY_LAG_SECONDS="0",
+    LOG_LEVEL="WARNING",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+PETS_URL = "/api/pets"
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Un solo lifespan (y una sola base en memoria) para toda la sesión:
+    # cada test usa sus propios usuarios, así no se pisan los datos
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def auth_headers(user_id: str) -> dict:
+    payload = {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600}
+    return {"Authorization": f"Bearer {jwt.encode(payload, 'tests-secret', algorithm='HS256')}"}
+
+
+@pytest.fixture
+def user():
+    """Cabeceras de un usuario nuevo (sin mascotas)."""
+    return auth_headers(str(uuid.uuid4()))
+
+
+@pytest.fixture
+def other_user():
+    return auth_headers(str(uuid.uuid4()))
+
+
+@pytest.fixture
+def create_pet(client):
+    def create(headers: dict, **fields) -> dict:
+        response = client.post(f"{PETS_URL}/", json={"name": "Lucy", "species": "Perro", **fields}, headers=headers)
+        assert response.status_code == 201, response.text
+        return response.json()
+    return create
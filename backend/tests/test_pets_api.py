@@ -0,0 +1,239 @@
+"""
+Pruebas de la API de mascotas contra el backend en memoria
+(SUPABASE_BACKEND=memory, ver conftest.py). Desde backend/:
+
+    python -m pytest -q
+"""
+import base64
+import json
+import uuid
+
+PETS_URL = "/api/pets"
+MISSING_ID = "33333333-3333-3333-3333-333333333333"
+
+
+# --- Una mascota: 404 vs 403 con una sola escritura filtrada por owner_id ---
+
+def test_update_pet_not_found_vs_forbidden(client, user, other_user, create_pet):
+    pet = create_pet(other_user)
+
+    assert client.put(f"{PETS_URL}/{pet['id']}", json={"name": "X"}, headers=user).status_code == 403
+    assert client.put(f"{PETS_URL}/{MISSING_ID}", json={"name": "X"}, headers=user).status_code == 404
+
+    response = client.put(f"{PETS_URL}/{pet['id']}", json={"name": "Nala"}, headers=other_user)
+    assert response.status_code == 200
+    assert response.json()["name"] == "Nala"
+
+
+def test_delete_pet_not_found_vs_forbidden(client, user, other_user, create_pet):
+    pet = create_pet(other_user)
+
+    assert client.delete(f"{PETS_URL}/{pet['id']}", headers=user).status_code == 403
+    assert client.delete(f"{PETS_URL}/{MISSING_ID}", headers=user).status_code == 404
+    assert client.delete(f"{PETS_URL}/{pet['id']}", headers=other_user).status_code == 204
+    assert client.delete(f"{PETS_URL}/{pet['id']}", headers=other_user).status_code == 404
+
+
+# --- Lotes: un estado por elemento ---
+
+def test_bulk_create_reports_each_item(client, user):
+    items = [{"name": "Uno", "species": "Gato"}, {"name": ""}, {"name": "Dos", "species": "Perro"}]
+    response = client.post(f"{PETS_URL}/bulk", json=items, headers=user)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [201, 422, 201]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert len(client.get(f"{PETS_URL}/", headers=user).json()) == 2
+
+
+def test_bulk_update_reports_each_item(client, user, other_user, create_pet):
+    mine = [create_pet(user, name=f"P{i}") for i in range(3)]
+    foreign = create_pet(other_user)
+    items = [
+        {"id": mine[0]["id"], "name": "A"},
+        {"id": mine[1]["id"], "name": "A"},
+        {"id": mine[2]["id"], "breed": "Mestizo"},
+        {"id": foreign["id"], "name": "A"},
+        {"id": MISSING_ID, "name": "A"},
+        {"id": mine[0]["id"]},
+        {"name": "sin id"},
+    ]
+    response = client.patch(f"{PETS_URL}/bulk", json=items, headers=user)
+
+    assert response.status_code == 200
+    results = sorted(response.json()["results"], key=lambda result: result["index"])
+    assert [result["status"] for result in results] == [200, 200, 200, 403, 404, 400, 422]
+    assert [result["pet"]["name"] for result in results[:2]] == ["A", "A"]
+    assert results[2]["pet"]["breed"] == "Mestizo"
+    assert client.get(f"{PETS_URL}/{foreign['id']}", headers=other_user).json()["name"] == "Lucy"
+
+
+def test_bulk_update_ignores_columns_outside_pet_update(client, user, create_pet):
+    pet = create_pet(user)
+    items = [{"id": pet["id"], "name": "Nueva", "owner_id": str(uuid.uuid4()), "created_at": "2000-01-01T00:00:00+00:00"}]
+    response = client.patch(f"{PETS_URL}/bulk", json=items, headers=user)
+
+    assert response.json()["results"][0]["status"] == 200
+    stored = client.get(f"{PETS_URL}/{pet['id']}", headers=user).json()
+    assert stored["name"] == "Nueva"
+    assert stored["owner_id"] == pet["owner_id"]
+    assert stored["created_at"] == pet["created_at"]
+
+
+def test_bulk_update_does_not_recreate_deleted_pets(client, user, create_pet):
+    pet = create_pet(user)
+    assert client.delete(f"{PETS_URL}/{pet['id']}", headers=user).status_code == 204
+
+    response = client.patch(f"{PETS_URL}/bulk", json=[{"id": pet["id"], "name": "Zombi"}], headers=user)
+
+    assert response.json()["results"][0]["status"] == 404
+    assert client.get(f"{PETS_URL}/{pet['id']}", headers=user).status_code == 404
+
+
+def test_bulk_delete_reports_each_item(client, user, other_user, create_pet):
+    mine = create_pet(user)
+    foreign = create_pet(other_user)
+    response = client.request("DELETE", f"{PETS_URL}/bulk", json=[mine["id"], foreign["id"], MISSING_ID], headers=user)
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [204, 403, 404]
+    assert client.get(f"{PETS_URL}/{foreign['id']}", headers=other_user).status_code == 200
+
+
+# --- Paginación por cursor ---
+
+def test_cursor_pagination_round_trip(client, user, create_pet):
+    created = {create_pet(user, name=f"P{i}")["id"] for i in range(5)}
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get(f"{PETS_URL}/", params=params, headers=user)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(pet["id"] for pet in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    assert len(seen) == len(set(seen)) == 5
+    assert set(seen) == created
+
+
+def test_malformed_cursor_is_rejected(client, user, create_pet):
+    create_pet(user)
+    # Un created_at que intenta cerrar las comillas del filtro `or` de PostgREST
+    injected = json.dumps(['2024-01-01T00:00:00+00:00",id.gt.x)', MISSING_ID]).encode()
+    for cursor in ("no-es-un-cursor", base64.urlsafe_b64encode(injected).decode().rstrip("=")):
+        response = client.get(f"{PETS_URL}/", params={"cursor": cursor}, headers=user)
+        assert response.status_code == 400
+
+
+# --- ETag / If-None-Match ---
+
+def test_list_etag_not_modified_until_a_write(client, user, create_pet):
+    pet = create_pet(user)
+    first = client.get(f"{PETS_URL}/", headers=user)
+    etag = first.headers["ETag"]
+
+    cached = client.get(f"{PETS_URL}/", headers={**user, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+    client.put(f"{PETS_URL}/{pet['id']}", json={"name": "Otra"}, headers=user)
+    changed = client.get(f"{PETS_URL}/", headers={**user, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_pet_etag_not_modified(client, user, create_pet):
+    pet = create_pet(user)
+    etag = client.get(f"{PETS_URL}/{pet['id']}", headers=user).headers["ETag"]
+
+    assert client.get(f"{PETS_URL}/{pet['id']}", headers={**user, "If-None-Match": etag}).status_code == 304
+    assert client.get(f"{PETS_URL}/{pet['id']}", headers={**user, "If-None-Match": '"otro"'}).status_code == 200
+
+
+# --- Sincronización incremental con lápidas ---
+
+def _sync(client, headers, since=None):
+    """Recorre /changes hasta has_more=False; devuelve (cambiadas, borradas, marca de agua)."""
+    changed, deleted = {}, set()
+    while True:
+        params = {"limit": 2, **({"since": since} if since else {})}
+        response = client.get(f"{PETS_URL}/changes", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        changed.update({pet["id"]: pet for pet in body["changed"]})
+        deleted.update(tombstone["id"] for tombstone in body["deleted"])
+        since = body["watermark"]
+        if not body["has_more"]:
+            return changed, deleted, since
+
+
+def test_changes_with_tombstones(client, user, other_user, create_pet):
+    pets = [create_pet(user, name=f"P{i}") for i in range(4)]
+    create_pet(other_user)
+
+    changed, deleted, watermark = _sync(client, user)
+    assert set(changed) == {pet["id"] for pet in pets}
+    assert deleted == set()
+
+    client.put(f"{PETS_URL}/{pets[0]['id']}", json={"name": "Editada"}, headers=user)
+    client.delete(f"{PETS_URL}/{pets[1]['id']}", headers=user)
+    client.request("DELETE", f"{PETS_URL}/bulk", json=[pets[2]["id"]], headers=user)
+    added = create_pet(user, name="Nueva")
+
+    changed, deleted, watermark = _sync(client, user, watermark)
+    assert set(changed) == {pets[0]["id"], added["id"]}
+    assert changed[pets[0]["id"]]["name"] == "Editada"
+    assert deleted == {pets[1]["id"], pets[2]["id"]}
+
+    # Las lápidas de un usuario no se entregan a otro
+    _, other_deleted, _ = _sync(client, other_user)
+    assert other_deleted == set()
+
+
+def test_changes_rejects_invalid_watermark(client, user):
+    response = client.get(f"{PETS_URL}/changes", params={"since": "no-es-una-marca"}, headers=user)
+    assert response.status_code == 400
+
+
+# --- Búsqueda ---
+
+def test_search_index_rebuilds_after_ttl(client, user, create_pet):
+    from app.services import pet_service
+    from app.services.supabase_client import init_supabase_client
+
+    pet = create_pet(user, name="Firulais")
+    assert [found["id"] for found in client.get(f"{PETS_URL}/search", params={"q": "firu"}, headers=user).json()] == [pet["id"]]
+
+    # Escritura hecha por "otro worker": directa a la BD, sin pasar por invalidate_owner_cache
+    init_supabase_client().table("pets").update({"name": "Canela"}).eq("id", pet["id"]).execute()
+    assert client.get(f"{PETS_URL}/search", params={"q": "canela"}, headers=user).json() == []
+
+    pet_service.search_indexes.get(pet["owner_id"]).expires_at = 0
+    assert [found["id"] for found in client.get(f"{PETS_URL}/search", params={"q": "canela"}, headers=user).json()] == [pet["id"]]
+
+
+# --- Fotos ---
+
+# PNG de 1x1 píxel
+_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=="
+)
+
+
+def test_upload_photo_storage_timeout_is_503(client, user, monkeypatch):
+    from app.services import pet_service
+    from app.services.resilience import DeadlineExceededError
+
+    async def timed_out(*args, **kwargs):
+        raise DeadlineExceededError("storage_upload")
+
+    monkeypatch.setattr(pet_service, "run_storage_call", timed_out)
+    response = client.post(f"{PETS_URL}/upload_photo", files={"file": ("lucy.png", _PNG, "image/png")}, headers=user)
+
+    assert response.status_code == 503
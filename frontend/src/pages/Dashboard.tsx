@@ -2,12 +2,16 @@ import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import Layout from '../components/Layout';
 import { useAuth } from '../context/AuthContext';
-import { Pet, petService } from '../services/petService';
+import { Pet, PetSummary, petService, thumbnailUrl } from '../services/petService';
 import { UserProfile, profileService } from '../services/profileService';
 
+// Mascotas que se muestran como tarjetas; el resto se ve en /pets
+const DASHBOARD_PETS = 6;
+
 export default function Dashboard() {
   const { user } = useAuth();
   const [pets, setPets] = useState<Pet[]>([]);
+  const [summary, setSummary] = useState<PetSummary | null>(null);
   const [profile, setProfile] = useState<UserProfile | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -32,9 +36,13 @@ export default function Dashboard() {
           setProfile(newProfile);
         }
         
-        // Obtener las mascotas del usuario
-        const userPets = await petService.getPets(user.id);
-        setPets(userPets);
+        // Resumen calculado en el servidor y solo las primeras mascotas para las tarjetas
+        const [petSummary, firstPets] = await Promise.all([
+          petService.getSummary(),
+          petService.getPetsPage(DASHBOARD_PETS),
+        ]);
+        setSummary(petSummary);
+        setPets(firstPets);
       } catch (err) {
         console.error('Error fetching data:', err);
         setError('Error al cargar los datos. Por favor, intenta nuevamente.');
@@ -79,6 +87,46 @@ export default function Dashboard() {
           </p>
         </div>
 
+        {/* Totales y próximos cumpleaños */}
+        {summary && summary.total > 0 && (
+          <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
+            <div className="bg-white shadow-sm rounded-lg p-6">
+              <p className="text-sm text-gray-500">Mascotas registradas</p>
+              <p className="text-3xl font-bold text-gray-900">{summary.total}</p>
+            </div>
+            <div className="bg-white shadow-sm rounded-lg p-6">
+              <p className="text-sm text-gray-500 mb-2">Por especie</p>
+              <ul className="space-y-1">
+                {Object.entries(summary.by_species).map(([species, count]) => (
+                  <li key={species} className="flex justify-between text-gray-700">
+                    <span>{species}</span>
+                    <span className="font-medium">{count}</span>
+                  </li>
+                ))}
+              </ul>
+            </div>
+            <div className="bg-white shadow-sm rounded-lg p-6">
+              <p className="text-sm text-gray-500 mb-2">Próximos cumpleaños</p>
+              {summary.upcoming_birthdays.length === 0 ? (
+                <p className="text-gray-500">Ninguno en los próximos 30 días.</p>
+              ) : (
+                <ul className="space-y-1">
+                  {summary.upcoming_birthdays.map((birthday) => (
+                    <li key={birthday.id} className="flex justify-between text-gray-700">
+                      <Link to={`/pets/${birthday.id}`} className="hover:underline">
+                        {birthday.name} ({birthday.age} {birthday.age === 1 ? 'año' : 'años'})
+                      </Link>
+                      <span className="font-medium">
+                        {birthday.days_until === 0 ? '¡Hoy!' : `en ${birthday.days_until} días`}
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </div>
+          </div>
+        )}
+
         {/* Resumen de mascotas */}
         <div className="bg-white shadow-sm rounded-lg p-6">
           <div className="flex justify-between items-center mb-4">
@@ -113,7 +161,7 @@ export default function Dashboard() {
                     <div className="flex-shrink-0 h-12 w-12 rounded-full bg-primary-100 flex items-center justify-center">
                       {pet.photo_url ? (
                         <img
-                          src={pet.photo_url}
+                          src={thumbnailUrl(pet.photo_url)}
                           alt={pet.name}
                           className="h-12 w-12 rounded-full object-cover"
                         />
@@ -130,6 +178,13 @@ export default function Dashboard() {
               ))}
             </div>
           )}
+          {summary && summary.total > pets.length && (
+            <div className="mt-4 text-right">
+              <Link to="/pets" className="text-primary-700 hover:underline text-sm">
+                Ver las {summary.total} mascotas
+              </Link>
+            </div>
+          )}
         </div>
 
         {/* Enlaces rápidos */}
@@ -2,13 +2,16 @@ import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import Layout from '../components/Layout';
 import { useAuth } from '../context/AuthContext';
-import { Pet, petService } from '../services/petService';
+import { Pet, petService, thumbnailUrl } from '../services/petService';
 
 export default function PetList() {
   const { user } = useAuth();
   const [pets, setPets] = useState<Pet[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [query, setQuery] = useState('');
+  // Resultados de la búsqueda en el servidor (null = sin búsqueda, se muestran todas)
+  const [results, setResults] = useState<Pet[] | null>(null);
 
   useEffect(() => {
     if (!user) return;
@@ -29,6 +32,30 @@ export default function PetList() {
     fetchPets();
   }, [user]);
 
+  useEffect(() => {
+    const text = query.trim();
+    if (!text) {
+      setResults(null);
+      return;
+    }
+    // Esperamos a que el usuario deje de escribir antes de consultar
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const found = await petService.searchPets(text);
+        if (!cancelled) setResults(found);
+      } catch (err) {
+        console.error('Error searching pets:', err);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
+  const visiblePets = results ?? pets;
+
   const handleDelete = async (id?: string) => {
     if (!id || !window.confirm('¿Estás seguro de que deseas eliminar esta mascota?')) {
       return;
@@ -37,6 +64,7 @@ export default function PetList() {
     try {
       await petService.deletePet(id);
       setPets(pets.filter(pet => pet.id !== id));
+      setResults(results && results.filter(pet => pet.id !== id));
     } catch (err) {
       console.error('Error deleting pet:', err);
       setError('Error al eliminar la mascota. Por favor, intenta nuevamente.');
@@ -69,7 +97,23 @@ export default function PetList() {
           </div>
         )}
 
-        {pets.length === 0 ? (
+        {pets.length > 0 && (
+          <div className="mb-4">
+            <input
+              type="search"
+              value={query}
+              onChange={(e) => setQuery(e.target.value)}
+              placeholder="Buscar por nombre, especie o raza..."
+              className="w-full rounded-md border border-gray-300 px-3 py-2 text-sm"
+            />
+          </div>
+        )}
+
+        {results && results.length === 0 ? (
+          <div className="text-center py-12">
+            <p className="text-gray-500">No se encontraron mascotas para "{query.trim()}".</p>
+          </div>
+        ) : pets.length === 0 ? (
           <div className="text-center py-12">
             <p className="text-gray-500 mb-4">No tienes mascotas registradas.</p>
             <Link to="/pets/new" className="btn-primary">
@@ -96,13 +140,13 @@ export default function PetList() {
                 </tr>
               </thead>
               <tbody className="divide-y divide-gray-200 bg-white">
-                {pets.map((pet) => (
+                {visiblePets.map((pet) => (
                   <tr key={pet.id}>
                     <td className="whitespace-nowrap py-4 pl-4 pr-3 text-sm sm:pl-6">
                       <div className="flex items-center">
                         <div className="h-10 w-10 flex-shrink-0">
                           {pet.photo_url ? (
-                            <img className="h-10 w-10 rounded-full object-cover" src={pet.photo_url} alt={pet.name} />
+                            <img className="h-10 w-10 rounded-full object-cover" src={thumbnailUrl(pet.photo_url)} alt={pet.name} />
                           ) : (
                             <div className="h-10 w-10 rounded-full bg-primary-100 flex items-center justify-center text-lg">
                               🐾
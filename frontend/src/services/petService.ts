@@ -1,4 +1,4 @@
-// import { supabase } from './supabase'; // Ya no es necesario aquí si apiClient lo maneja
+import { supabase } from './supabase'; // Para saber de qué usuario es la copia local
 import apiClient from './apiClient'; // Importamos nuestra instancia de Axios
 
 export interface Pet {
@@ -14,24 +14,120 @@ export interface Pet {
   updated_at?: string;
 }
 
+// Resumen calculado por la API (GET /pets/summary) para el dashboard
+export interface UpcomingBirthday {
+  id: string;
+  name: string;
+  species: string;
+  birthdate: string;
+  next_birthday: string;
+  days_until: number;
+  age: number;
+}
+
+export interface PetSummary {
+  total: number;
+  by_species: Record<string, number>;
+  by_gender: Record<string, number>;
+  upcoming_birthdays: UpcomingBirthday[];
+}
+
+// Respuesta de GET /pets/changes (sincronización incremental)
+interface PetChanges {
+  changed: Pet[];
+  deleted: { id: string; deleted_at: string }[];
+  watermark: string;
+  has_more: boolean;
+}
+
+// Copia local de las mascotas del usuario y marca de agua de la última sincronización
+let syncState: { userId: string; watermark?: string; pets: Map<string, Pet> } | null = null;
+
+// Las fotos subidas guardan en photo_url la variante "full" (.../full.webp);
+// para tarjetas y listados usamos la miniatura de la misma carpeta.
+export function thumbnailUrl(photoUrl?: string): string | undefined {
+  if (!photoUrl) return photoUrl;
+  return photoUrl.endsWith('/full.webp') ? photoUrl.replace(/\/full\.webp$/, '/thumb.webp') : photoUrl;
+}
+
 // Ya no necesitamos API_BASE_URL aquí, lo define apiClient
 // const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api';
 
 export const petService = {
-  // Obtener todas las mascotas usando apiClient
-  async getPets(): Promise<Pet[]> { 
+  // Obtener todas las mascotas: se mantiene una copia local y solo se piden
+  // los cambios desde la última sincronización (GET /pets/changes)
+  async getPets(): Promise<Pet[]> {
     console.log("petService: llamando a getPets (axios)...");
     try {
-      // Petición GET a /pets/ (la base URL y token los añade apiClient)
-      const response = await apiClient.get<Pet[]>('/pets/'); 
-      // Axios devuelve los datos directamente en response.data
-      console.log("petService: Mascotas recibidas (axios):", response.data);
-      return response.data;
+      const { data: { session } } = await supabase.auth.getSession();
+      const userId = session?.user.id ?? '';
+      if (!syncState || syncState.userId !== userId) {
+        syncState = { userId, pets: new Map() };
+      }
+      const state = syncState;
+      let hasMore = true;
+      while (hasMore) {
+        const response = await apiClient.get<PetChanges>('/pets/changes', {
+          params: state.watermark ? { since: state.watermark } : {},
+          // 410: la marca de agua caducó, hay que sincronizar desde cero
+          validateStatus: (status) => status === 200 || status === 410,
+        });
+        if (response.status === 410) {
+          state.watermark = undefined;
+          state.pets.clear();
+          continue;
+        }
+        response.data.deleted.forEach((tombstone) => state.pets.delete(tombstone.id));
+        response.data.changed.forEach((pet) => state.pets.set(pet.id as string, pet));
+        state.watermark = response.data.watermark;
+        hasMore = response.data.has_more;
+      }
+      const pets = [...state.pets.values()].sort((a, b) =>
+        (a.created_at ?? '').localeCompare(b.created_at ?? '') || (a.id ?? '').localeCompare(b.id ?? ''),
+      );
+      console.log("petService: Mascotas sincronizadas (axios):", pets);
+      return pets;
     } catch (error) {
       console.error('petService: Error en getPets (axios):', error);
       // El interceptor de respuesta ya debería haber formateado el error
       throw error; // Relanzar el error formateado
-      // return []; // O devolver vacío si preferimos no propagar
+    }
+  },
+
+  // Solo la primera página de mascotas (para vistas que no necesitan todas)
+  async getPetsPage(limit: number): Promise<Pet[]> {
+    try {
+      const response = await apiClient.get<Pet[]>('/pets/', {
+        params: { limit, fields: 'id,name,species,breed,photo_url' },
+      });
+      return response.data;
+    } catch (error) {
+      console.error('petService: Error en getPetsPage (axios):', error);
+      throw error;
+    }
+  },
+
+  // Buscar mascotas por nombre, especie o raza (ordenadas por relevancia)
+  async searchPets(query: string, limit = 50): Promise<Pet[]> {
+    try {
+      const response = await apiClient.get<Pet[]>('/pets/search', { params: { q: query, limit } });
+      return response.data;
+    } catch (error) {
+      console.error('petService: Error en searchPets (axios):', error);
+      throw error;
+    }
+  },
+
+  // Resumen de las mascotas (totales y próximos cumpleaños) sin traer el listado
+  async getSummary(days?: number): Promise<PetSummary> {
+    try {
+      const response = await apiClient.get<PetSummary>('/pets/summary', {
+        params: days !== undefined ? { days } : {},
+      });
+      return response.data;
+    } catch (error) {
+      console.error('petService: Error en getSummary (axios):', error);
+      throw error;
     }
   },
 